@@ -43,6 +43,7 @@ class FactualAuditJEPA:
         else:
             logger.info(f"Building JEPA World Model from {self.context_dir}...")
         
+        pending = []
         for root, _, files in os.walk(self.context_dir):
             for file in files:
                 if file.endswith(('.md', '.txt')):
@@ -57,18 +58,26 @@ class FactualAuditJEPA:
                         for section in sections:
                             clean_section = section.strip()
                             if not clean_section: continue
-                            vector = self.vector_engine.embed_query(clean_section[:1000])
-                            
-                            fact_id = f"{file}:{clean_section[:40]}"
-                            self.facts.append({
-                                "source": file,
-                                "content": clean_section,
-                                "vector": vector
-                            })
-                            self.world_map[fact_id] = vector
+                            pending.append((file, clean_section))
                     except Exception as e:
                         logger.error(f"Error indexing fact {file}: {e}")
         
+        # All facts are embedded in one batched call
+        if pending:
+            try:
+                vectors = self.vector_engine.embed_batch([section[:1000] for _, section in pending])
+            except Exception as e:
+                logger.error(f"Error embedding facts: {e}")
+                vectors = []
+            for (file, clean_section), vector in zip(pending, vectors):
+                fact_id = f"{file}:{clean_section[:40]}"
+                self.facts.append({
+                    "source": file,
+                    "content": clean_section,
+                    "vector": vector
+                })
+                self.world_map[fact_id] = vector
+        
         if hasattr(logger, 'jepa_flow'):
             logger.jepa_flow("WORLD-MODEL", f"Synchronized: {len(self.facts)} facts indexed.")
         else:
@@ -90,14 +99,12 @@ class FactualAuditJEPA:
             }
 
         # 1. Semantic Embedding of Query and Proposal
-        query_vec = self.vector_engine.embed_query(query)
-        proposal_vec = self.vector_engine.embed_query(proposal)
+        query_vec, proposal_vec = self.vector_engine.embed_batch([query, proposal])
         
         # 2. Retrieve anchor facts (The logical bounds)
-        anchors = []
-        for fact in self.facts:
-            sim = self.vector_engine.cosine_similarity(query_vec, fact["vector"])
-            anchors.append((sim, fact))
+        fact_vectors = np.stack([fact["vector"] for fact in self.facts])
+        similarities = self.vector_engine.cosine_similarities(query_vec, fact_vectors)
+        anchors = list(zip(similarities.tolist(), self.facts))
         
         anchors.sort(key=lambda x: x[0], reverse=True)
         top_anchors = [a for a in anchors[:3] if a[0] > 0.5]
@@ -59,15 +59,12 @@ class ProjectGrounding:
             return "No se encontró evidencia factual en data/project_context/."
 
         try:
-            query_vector = self.vector_engine.embed_query(query)
-            scored_chunks = []
-            
-            for doc in self.context_cache:
-                # Comparamos semánticamente la query con el contenido
-                # En v9 avanzado esto se hace por chunks vectorizados en MP4
-                doc_vector = self.vector_engine.embed_query(doc["content"][:2000]) # Grounding inicial
-                similarity = self.vector_engine.cosine_similarity(query_vector, doc_vector)
-                scored_chunks.append((similarity, doc))
+            # Comparamos semánticamente la query con el contenido (una sola llamada al modelo)
+            # En v9 avanzado esto se hace por chunks vectorizados en MP4
+            texts = [query] + [doc["content"][:2000] for doc in self.context_cache]  # Grounding inicial
+            vectors = self.vector_engine.embed_batch(texts)
+            similarities = self.vector_engine.cosine_similarities(vectors[0], vectors[1:])
+            scored_chunks = list(zip(similarities.tolist(), self.context_cache))
             
             scored_chunks.sort(key=lambda x: x[0], reverse=True)
             top_docs = scored_chunks[:top_k]
@@ -32,6 +32,7 @@ import sys
 import os
 import re
 import asyncio
+import threading
 from pathlib import Path
 from typing import Optional, List, Dict, Any, Set
 
@@ -69,6 +70,8 @@ mcp = FastMCP("AGI-Context-Vortex")
 # Singleton instances
 # ============================================
 _v6_server = None
+_v6_server_lock = threading.Lock()
+_boot_thread: Optional[threading.Thread] = None
 _orchestrator = None
 
 BASE_DIR = Path(
@@ -145,42 +148,44 @@ def get_v6_server():
     """Get or create singleton instance of MCPServerV6"""
     global _v6_server
     if _v6_server is None:
-        try:
-            # Importar de forma segura para evitar problemas circulares
-            # Precargar módulos de storage para evitar importación circular
+        with _v6_server_lock:
+            if _v6_server is not None:
+                return _v6_server
             try:
-                from storage import vector_engine
-                print("Storage modules pre-loaded successfully", file=sys.stderr)
-            except ImportError as e:
-                print(f"Warning: Storage modules loading issue: {e}", file=sys.stderr)
+                # Importar de forma segura para evitar problemas circulares
+                # Precargar módulos de storage para evitar importación circular
+                try:
+                    from storage import vector_engine
+                    print("Storage modules pre-loaded successfully", file=sys.stderr)
+                except ImportError as e:
+                    print(f"Warning: Storage modules loading issue: {e}", file=sys.stderr)
             
-            # Usar importlib para importar dinámicamente y evitar problemas de inicialización
-            import importlib.util
-            import sys
+                # Usar importlib para importar dinámicamente y evitar problemas de inicialización
+                import importlib.util
             
-            # Verificar si el módulo ya está en sys.modules
-            if 'v6' in sys.modules:
-                v6_module = sys.modules['v6']
-            else:
-                # Cargar el módulo dinámicamente
-                spec = importlib.util.spec_from_file_location(
-                    "v6", 
-                    os.path.join(os.path.dirname(__file__), "v6.py")
-                )
-                if spec and spec.loader:
-                    v6_module = importlib.util.module_from_spec(spec)
-                    spec.loader.exec_module(v6_module)
-                    sys.modules['v6'] = v6_module
+                # Verificar si el módulo ya está en sys.modules
+                if 'v6' in sys.modules:
+                    v6_module = sys.modules['v6']
                 else:
-                    raise ImportError("No se pudo cargar el módulo v6")
+                    # Cargar el módulo dinámicamente
+                    spec = importlib.util.spec_from_file_location(
+                        "v6", 
+                        os.path.join(os.path.dirname(__file__), "v6.py")
+                    )
+                    if spec and spec.loader:
+                        v6_module = importlib.util.module_from_spec(spec)
+                        spec.loader.exec_module(v6_module)
+                        sys.modules['v6'] = v6_module
+                    else:
+                        raise ImportError("No se pudo cargar el módulo v6")
             
-            MCPServerV6 = getattr(v6_module, 'MCPServerV6')
-            _v6_server = MCPServerV6()
-        except Exception as e:
-            print(f"Warning: Could not import MCPServerV6: {e}", file=sys.stderr)
-            import traceback
-            traceback.print_exc()
-            _v6_server = None
+                MCPServerV6 = getattr(v6_module, 'MCPServerV6')
+                _v6_server = MCPServerV6()
+            except Exception as e:
+                print(f"Warning: Could not import MCPServerV6: {e}", file=sys.stderr)
+                import traceback
+                traceback.print_exc()
+                _v6_server = None
     return _v6_server
 
 def get_orchestrator():
@@ -245,6 +250,65 @@ def visual_tool_decorator(tool_func):
     return wrapper
 
 
+# ============================================
+# Health / Readiness (load balancer)
+# ============================================
+
+def get_readiness() -> Dict[str, Any]:
+    """
+    Readiness of the server without blocking on its initialization.
+
+    States: 'starting' (MCPServerV6 still being created), then the embedding
+    model states 'loading' -> 'warming' -> 'ready' (or 'failed').
+    """
+    if _v6_server is None:
+        return {'state': 'starting', 'ready': False}
+    return _v6_server.get_readiness()
+
+
+def start_background_boot() -> threading.Thread:
+    """Create the v6 server (which starts the model warmup) without delaying the HTTP listener"""
+    global _boot_thread
+    _boot_thread = threading.Thread(target=get_v6_server, name="v6-boot", daemon=True)
+    _boot_thread.start()
+    return _boot_thread
+
+
+async def _call_v6_tool(name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run an MCPServerV6 tool off the event loop, so /health and /ready keep answering
+    while it waits for the model warmup.
+
+    While the background boot is still creating the server, answers 'starting'
+    right away instead of queueing on its lock.
+    """
+    if _v6_server is None and _boot_thread is not None and _boot_thread.is_alive():
+        readiness = get_readiness()
+        return {
+            'content': [{'type': 'text', 'text': f"Server is starting ({readiness['state']}); retry {name} shortly"}],
+            '_meta': {'warming_up': True, 'readiness': readiness}
+        }
+    server = await asyncio.to_thread(get_v6_server)
+    if server is None:
+        raise RuntimeError("MCPServerV6 is not available")
+    return await asyncio.to_thread(server._handle_tools_call, {'name': name, 'arguments': arguments})
+
+
+@mcp.custom_route("/health", methods=["GET"])
+async def health(request):
+    """Liveness: the process is up and serving HTTP (always 200), with the readiness state."""
+    from starlette.responses import JSONResponse
+    return JSONResponse({'status': 'ok', **get_readiness()})
+
+
+@mcp.custom_route("/ready", methods=["GET"])
+async def ready(request):
+    """Readiness: 200 once the embedding model is loaded and warmed, 503 before that."""
+    from starlette.responses import JSONResponse
+    readiness = get_readiness()
+    return JSONResponse(readiness, status_code=200 if readiness.get('ready') else 503)
+
+
 # ============================================
 # V5 Tools (Core Retrieval)
 # ============================================
@@ -258,7 +322,11 @@ async def ping() -> str:
 
 @mcp.tool()
 @visual_tool_decorator
-async def get_context(query: str, top_k: int = 5, min_score: float = 0.5, session_id: Optional[str] = None) -> str:
+async def get_context(query: str, top_k: int = 5, min_score: float = 0.5, session_id: Optional[str] = None,
+                      path_prefix: Optional[str] = None, extensions: Optional[List[str]] = None,
+                      language: Optional[str] = None, section: Optional[str] = None,
+                      wait_timeout_s: Optional[float] = None, fan_out: Optional[int] = None,
+                      debug: Optional[bool] = None) -> str:
     """
     Retrieve context from memory with provenance.
     
@@ -267,6 +335,13 @@ async def get_context(query: str, top_k: int = 5, min_score: float = 0.5, sessio
         top_k: Number of results to return (default: 5)
         min_score: Minimum relevance score (default: 0.5)
         session_id: Optional session ID for v6 session-aware queries
+        path_prefix: Only search chunks under this file subtree
+        extensions: Only search chunks from files with these extensions (e.g. ['.py', '.md'])
+        language: Only search chunks in this language (python, markdown, ...)
+        section: Only search chunks whose section title contains this text
+        wait_timeout_s: Max seconds to wait for the model warmup (0 = answer "warming up" immediately)
+        fan_out: Query expansions also searched and fused with RRF (default from config; 0 = off)
+        debug: Append per-stage timings (ms) to the response
     
     Returns:
         Context results with provenance information
@@ -289,16 +364,19 @@ async def get_context(query: str, top_k: int = 5, min_score: float = 0.5, sessio
         if _tool_logger:
             _tool_logger.v9_flow("RETRIEVAL", f"Query: {query[:40]}...")
         
-        server = get_v6_server()
         # v9: Unificar via _handle_tools_call para activar logs de flujo
-        result = server._handle_tools_call({
-            'name': 'get_context',
-            'arguments': {
-                'query': query,
-                'top_k': top_k,
-                'min_score': min_score,
-                'session_id': session_id
-            }
+        result = await _call_v6_tool('get_context', {
+            'query': query,
+            'top_k': top_k,
+            'min_score': min_score,
+            'session_id': session_id,
+            'path_prefix': path_prefix,
+            'extensions': extensions,
+            'language': language,
+            'section': section,
+            'wait_timeout_s': wait_timeout_s,
+            'fan_out': fan_out,
+            'debug': debug
         })
         
         duration = time.time() - start_time
@@ -306,7 +384,12 @@ async def get_context(query: str, top_k: int = 5, min_score: float = 0.5, sessio
         # Extraer texto del resultado unificado
         if 'content' in result and result['content']:
             response_text = result['content'][0].get('text', 'No context found')
-            
+
+            # Only the text reaches HTTP clients, so debug timings travel inside it
+            timings = result.get('_meta', {}).get('timings_ms')
+            if debug and timings:
+                response_text += "\n\nTimings (ms): " + ", ".join(f"{stage}={ms}" for stage, ms in timings.items())
+
             # Visual feedback de finalización
             if _visual_monitor:
                 _visual_monitor.tool_completed("get_context", f"Found {len(result['content'])} results", duration)
@@ -341,13 +424,9 @@ async def validate_response(response: str, evidence: list) -> str:
         Validation result with confidence assessment
     """
     try:
-        server = get_v6_server()
-        result = server._handle_tools_call({
-            'name': 'validate_response',
-            'arguments': {
-                'response': response,
-                'evidence': evidence
-            }
+        result = await _call_v6_tool('validate_response', {
+            'response': response,
+            'evidence': evidence
         })
         if 'content' in result and result['content']:
             return result['content'][0].get('text', 'Validation complete')
@@ -365,8 +444,7 @@ async def index_status() -> str:
         Current status including chunk count, query count, uptime, and advanced features status
     """
     try:
-        server = get_v6_server()
-        result = server._handle_tools_call({'name': 'index_status', 'arguments': {}})
+        result = await _call_v6_tool('index_status', {})
         text = ""
         if 'content' in result and result['content']:
             text = result['content'][0].get('text', '')
@@ -468,16 +546,12 @@ async def memory_tool(command: str, file_path: str, content: Optional[str] = Non
         if _tool_logger:
             _tool_logger.v9_flow("MEMORY", f"{command.upper()} on {file_path}")
             
-        server = get_v6_server()
         # v9: Unificar via _handle_tools_call para activar logs de flujo
-        result = server._handle_tools_call({
-            'name': 'memory_tool',
-            'arguments': {
-                'command': command,
-                'file_path': file_path,
-                'content': content,
-                'session_id': session_id
-            }
+        result = await _call_v6_tool('memory_tool', {
+            'command': command,
+            'file_path': file_path,
+            'content': content,
+            'session_id': session_id
         })
         
         if 'content' in result and result['content']:
@@ -500,15 +574,11 @@ async def skills_tool(command: str, skill_id: str, content: Optional[str] = None
         description: Short description for semantic search
     """
     try:
-        server = get_v6_server()
-        result = server._handle_tools_call({
-            'name': 'skills_tool',
-            'arguments': {
-                'command': command,
-                'skill_id': skill_id,
-                'content': content,
-                'description': description
-            }
+        result = await _call_v6_tool('skills_tool', {
+            'command': command,
+            'skill_id': skill_id,
+            'content': content,
+            'description': description
         })
         if 'content' in result and result['content']:
             return result['content'][0].get('text', 'Operación de skills completada')
@@ -523,11 +593,7 @@ async def ground_project_context(query: str) -> str:
     Use this to ensure compliance with project goals.
     """
     try:
-        server = get_v6_server()
-        result = server._handle_tools_call({
-            'name': 'ground_project_context',
-            'arguments': {'query': query}
-        })
+        result = await _call_v6_tool('ground_project_context', {'query': query})
         if 'content' in result and result['content']:
             return result['content'][0].get('text', 'No evidence found')
         return "No evidence found"
@@ -557,7 +623,7 @@ async def create_session(session_id: str, session_type: str = "general", strateg
         if _tool_logger:
             _tool_logger.session("Creating", session_id, type=session_type, strategy=strategy)
         
-        server = get_v6_server()
+        server = await asyncio.to_thread(get_v6_server)
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         result = loop.run_until_complete(
@@ -593,7 +659,7 @@ async def get_session_summary(session_id: str) -> str:
         Session summary with type, turn count, and entities mentioned
     """
     try:
-        server = get_v6_server()
+        server = await asyncio.to_thread(get_v6_server)
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         result = loop.run_until_complete(
@@ -616,7 +682,7 @@ async def list_sessions() -> str:
         List of active sessions with their turn counts
     """
     try:
-        server = get_v6_server()
+        server = await asyncio.to_thread(get_v6_server)
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         result = loop.run_until_complete(
@@ -642,7 +708,7 @@ async def delete_session(session_id: str) -> str:
         Confirmation of deletion
     """
     try:
-        server = get_v6_server()
+        server = await asyncio.to_thread(get_v6_server)
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         result = loop.run_until_complete(
@@ -676,7 +742,7 @@ async def index_code(directory: str, recursive: bool = True) -> str:
         if _tool_logger:
             _tool_logger.index(f"Indexing: {directory}", recursive=recursive)
         
-        server = get_v6_server()
+        server = await asyncio.to_thread(get_v6_server)
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         result = loop.run_until_complete(
@@ -712,7 +778,7 @@ async def search_entity(name: str, entity_type: str = "any") -> str:
         Matching entities with their locations and signatures
     """
     try:
-        server = get_v6_server()
+        server = await asyncio.to_thread(get_v6_server)
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         result = loop.run_until_complete(
@@ -891,7 +957,7 @@ async def get_system_status() -> str:
         
         # V6 Server Status
         try:
-            server = get_v6_server()
+            server = await asyncio.to_thread(get_v6_server)
             output += "📊 V7 Core Server: ✅ Running\n"
             status_result = server._index_status({})
             if 'content' in status_result and status_result['content']:
@@ -1054,7 +1120,7 @@ async def smart_session_init(project_path: Optional[str] = None, context: str =
         if _tool_logger:
             _tool_logger.tool("smart_session_init", project=project_path or "auto", context=context[:30] if context else "none")
         
-        orchestrator = get_smart_orchestrator()
+        orchestrator = await asyncio.to_thread(get_smart_orchestrator)
         if not orchestrator:
             return "Error: Smart orchestrator not available"
         
@@ -1113,7 +1179,7 @@ async def smart_query(query: str, project_path: Optional[str] = None) -> str:
         if _tool_logger:
             _tool_logger.tool("smart_query", query=query[:40])
         
-        orchestrator = get_smart_orchestrator()
+        orchestrator = await asyncio.to_thread(get_smart_orchestrator)
         if not orchestrator:
             return "Error: Smart orchestrator not available"
         
@@ -1158,7 +1224,7 @@ async def get_smart_status() -> str:
         - Current active session
     """
     try:
-        orchestrator = get_smart_orchestrator()
+        orchestrator = await asyncio.to_thread(get_smart_orchestrator)
         if not orchestrator:
             return "Error: Smart orchestrator not available"
         
@@ -1640,6 +1706,10 @@ if __name__ == "__main__":
         
         app = mcp.sse_app()
         
+        # Cargar servidor v6 + warmup del modelo en segundo plano (estado en /health y /ready)
+        start_background_boot()
+        main_logger.info("Warmup en segundo plano", health=f"http://127.0.0.1:{port}/ready")
+        
         # Iniciar thread de pulso visual para "vida" en la consola
         import threading
         import time
@@ -1677,6 +1747,7 @@ if __name__ == "__main__":
         print("=" * 60, file=sys.stderr)
         
         app = mcp.sse_app()
+        start_background_boot()
         uvicorn.run(app, host="127.0.0.1", port=port)
 
 
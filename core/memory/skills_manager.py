@@ -73,15 +73,13 @@ class SkillsManager:
         try:
             # Simulamos el grounding semántico usando el VectorEngine existente
             # En v9 real, aquí se implementará el predictor JEPA
-            scores = []
-            query_vector = self.vector_engine.embed_query(query)
-            
-            for skill_id in skill_ids:
-                # Si la skill tiene descripción en metadata, la usamos para el score
-                search_text = self.skills_cache[skill_id]["metadata"].get("description", skill_id)
-                skill_vector = self.vector_engine.embed_query(search_text)
-                similarity = self.vector_engine.cosine_similarity(query_vector, skill_vector)
-                scores.append((similarity, skill_id))
+            # Si la skill tiene descripción en metadata, la usamos para el score
+            search_texts = [self.skills_cache[skill_id]["metadata"].get("description", skill_id)
+                            for skill_id in skill_ids]
+            # Query y skills en una sola llamada al modelo
+            vectors = self.vector_engine.embed_batch([query] + search_texts)
+            similarities = self.vector_engine.cosine_similarities(vectors[0], vectors[1:])
+            scores = list(zip(similarities.tolist(), skill_ids))
             
             # Ordenar por similitud y tomar top_k
             scores.sort(key=lambda x: x[0], reverse=True)
@@ -0,0 +1,427 @@
+"""
+ANN Backends for MCP v6
+Nearest-neighbour indexes behind one interface, used by VectorEngine
+
+Backends (ann.backend in v6_config.json):
+    hnsw   - hnswlib graph (approximate, sub-linear search)
+    exact  - numpy matmul over the stored vectors (exact, no build cost);
+             can search the snapshot's mmapped vectors without copying
+    auto   - exact up to ann.exact_max_vectors vectors, hnsw above
+
+All backends use cosine similarity on integer labels and return cosine
+distances (1 - similarity). Label -> chunk id mapping stays in VectorEngine.
+"""
+
+import logging
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('hnsw', 'exact')
+
+# Magic of .npy files: how load_backend tells an exact index from an HNSW graph
+NPY_MAGIC = b'\x93NUMPY'
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """float32 copy with unit-length rows (zero rows stay zero)"""
+    vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+def _top_k(similarities: np.ndarray, labels: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Best k (labels, distances) per row of a similarity matrix, best first"""
+    k = min(k, similarities.shape[1])
+    if k < similarities.shape[1]:
+        top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(similarities.shape[1]), similarities.shape)
+    top_scores = np.take_along_axis(similarities, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+    return labels[top], 1.0 - np.take_along_axis(top_scores, order, axis=1)
+
+
+class ANNBackend:
+    """
+    Interface implemented by every backend
+
+    search_batch returns (labels, distances) arrays of shape (Q x k); rows
+    with fewer than k results are padded with label -1 / distance inf.
+    """
+    name = ''
+
+    def __init__(self, dimension: int, config: Optional[Dict] = None):
+        self.dimension = dimension
+        self.config = config or {}
+        # Capacity multiplier applied when the index has to grow
+        self.growth_factor = max(self.config.get('growth_factor', 1.5), 1.1)
+
+    def build(self, capacity: int):
+        """Create an empty index for about capacity vectors"""
+        raise NotImplementedError
+
+    def add(self, vectors: np.ndarray, labels: np.ndarray):
+        """Insert vectors under new labels, growing as needed"""
+        raise NotImplementedError
+
+    def delete(self, labels: Iterable[int]):
+        """Remove labels from search results"""
+        raise NotImplementedError
+
+    def search_batch(self, queries: np.ndarray, k: int, allowed: Optional[np.ndarray] = None,
+                     num_threads: int = -1) -> Tuple[np.ndarray, np.ndarray]:
+        """k nearest labels per query, optionally restricted to the allowed labels"""
+        raise NotImplementedError
+
+    def search(self, query: np.ndarray, k: int,
+               allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Single-query search: (labels, distances), unpadded"""
+        labels, distances = self.search_batch(query.reshape(1, -1), k, allowed, num_threads=1)
+        found = labels[0] >= 0
+        return labels[0][found], distances[0][found]
+
+    def get_vectors(self, labels: np.ndarray) -> np.ndarray:
+        """Stored (unit-length) float32 vectors of labels"""
+        raise NotImplementedError
+
+    def save(self, path: str):
+        """Serialize the index to a file that load() can reopen"""
+        raise NotImplementedError
+
+    def load(self, path: str, num_elements: int = 0):
+        """Load an index written by save()"""
+        raise NotImplementedError
+
+    def get_stats(self) -> Dict:
+        raise NotImplementedError
+
+    def _empty_result(self, count: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        return np.full((count, k), -1, dtype=np.int64), np.full((count, k), np.inf, dtype=np.float32)
+
+
+class HNSWBackend(ANNBackend):
+    """
+    hnswlib graph with growth, slot reuse after deletes and filtered search
+
+    Filtered search: subsets up to filter_exact_max labels are scored
+    exactly against their stored vectors; larger ones use the hnswlib
+    filter callback with ef widened by 1/selectivity (capped by
+    filter_max_ef), falling back to exact search when the walk cannot
+    collect enough matches.
+
+    ef is index-global in hnswlib, so queries never change it: a wider ef
+    for one call is obtained by asking for max(ef, k) neighbours (hnswlib
+    searches with max(ef, k) candidates) and keeping the best k. Concurrent
+    queries therefore never wait on each other.
+    """
+    name = 'hnsw'
+
+    def __init__(self, dimension: int, config: Optional[Dict] = None):
+        super().__init__(dimension, config)
+        self.M = self.config.get('M', 16)
+        self.ef_construction = self.config.get('ef_construction', 200)
+        self.ef_search = self.config.get('ef_search', 50)
+        self.filter_exact_max = self.config.get('filter_exact_max', 2000)
+        self.filter_max_ef = self.config.get('filter_max_ef', 2000)
+        # Threads for add_items (-1 = all cores); graph insertion runs in parallel, outside the GIL
+        self.build_threads = self.config.get('build_threads', -1)
+
+        self.index = None
+        self.live = 0
+        self.stats = {'filtered_hnsw': 0, 'filtered_exact': 0}
+
+    def build(self, capacity: int):
+        import hnswlib
+        self.index = hnswlib.Index(space='cosine', dim=self.dimension)
+        self.index.init_index(
+            max_elements=max(capacity, 1),
+            ef_construction=self.ef_construction,
+            M=self.M,
+            allow_replace_deleted=True
+        )
+        self.index.set_ef(self.ef_search)
+        self.live = 0
+
+    def set_ef(self, ef: int):
+        """Change the default query-time ef"""
+        self.ef_search = ef
+        if self.index is not None:
+            self.index.set_ef(ef)
+
+    def _ensure_capacity(self, additional: int):
+        """Grow the index ahead of need (slots of deleted items are reused first)"""
+        capacity = self.index.get_max_elements()
+        needed = self.live + additional
+        if needed > capacity:
+            new_capacity = max(needed, int(capacity * self.growth_factor))
+            self.index.resize_index(new_capacity)
+            logger.info(f"HNSW index resized from {capacity} to {new_capacity} elements")
+
+    def add(self, vectors: np.ndarray, labels: np.ndarray):
+        self._ensure_capacity(len(labels))
+        self.index.add_items(np.asarray(vectors, dtype=np.float32), labels,
+                             num_threads=self.build_threads, replace_deleted=True)
+        self.live += len(labels)
+
+    def delete(self, labels: Iterable[int]):
+        for label in labels:
+            self.index.mark_deleted(int(label))
+            self.live -= 1
+
+    def search_batch(self, queries: np.ndarray, k: int, allowed: Optional[np.ndarray] = None,
+                     num_threads: int = -1, ef: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Args:
+            ef: Optional ef for this call only (used by ef_search tuning)
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        labels, distances = self._empty_result(len(queries), k)
+        k = min(k, self.live if allowed is None else len(allowed))
+        if k == 0 or len(queries) == 0:
+            return labels, distances
+
+        if allowed is not None:
+            return self._search_filtered(queries, k, allowed, labels, distances)
+
+        wide_k = k if ef is None else min(max(ef, k), self.live)
+        found, dist = self.index.knn_query(queries, k=wide_k, num_threads=num_threads)
+        labels[:, :k] = found[:, :k]
+        distances[:, :k] = dist[:, :k]
+        return labels, distances
+
+    def _search_filtered(self, queries: np.ndarray, k: int, allowed: np.ndarray,
+                         labels: np.ndarray, distances: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Filtered search over a subset of labels (see class docstring)"""
+        if len(allowed) <= max(self.filter_exact_max, k):
+            self.stats['filtered_exact'] += len(queries)
+            labels[:, :k], distances[:, :k] = self._exact_search(queries, k, allowed)
+            return labels, distances
+
+        selectivity = len(allowed) / max(self.live, 1)
+        ef = int(min(max(self.ef_search, k / selectivity), self.filter_max_ef))
+        allowed_set = set(allowed.tolist())
+
+        wide_k = min(max(ef, k), len(allowed))
+        missing = []
+        for row, query in enumerate(queries):
+            try:
+                # The Python callback holds the GIL, so extra threads only add overhead
+                found, dist = self.index.knn_query(query.reshape(1, -1), k=wide_k, num_threads=1,
+                                                   filter=allowed_set.__contains__)
+                labels[row, :k], distances[row, :k] = found[0, :k], dist[0, :k]
+                self.stats['filtered_hnsw'] += 1
+            except RuntimeError:
+                missing.append(row)
+
+        if missing:
+            self.stats['filtered_exact'] += len(missing)
+            labels[missing, :k], distances[missing, :k] = self._exact_search(queries[missing], k, allowed)
+        return labels, distances
+
+    def _exact_search(self, queries: np.ndarray, k: int, allowed: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Brute-force search over the stored vectors of allowed labels"""
+        return _top_k(_normalize_rows(queries) @ self.get_vectors(allowed).T, allowed, k)
+
+    def get_vectors(self, labels: np.ndarray) -> np.ndarray:
+        # hnswlib stores cosine-space vectors normalized
+        return np.asarray(self.index.get_items(labels), dtype=np.float32)
+
+    def save(self, path: str):
+        self.index.save_index(path)
+
+    def load(self, path: str, num_elements: int = 0):
+        import hnswlib
+        self.index = hnswlib.Index(space='cosine', dim=self.dimension)
+        self.index.load_index(path, max_elements=num_elements, allow_replace_deleted=True)
+        self.index.set_ef(self.ef_search)
+        # Corrected by VectorEngine once the id map (live labels) is known
+        self.live = self.index.get_current_count()
+
+    def get_stats(self) -> Dict:
+        return {
+            'backend': self.name,
+            'capacity': self.index.get_max_elements(),
+            # Deleted slots not yet reused by add
+            'deleted': self.index.get_current_count() - self.live,
+            'ef_construction': self.ef_construction,
+            'M': self.M,
+            'ef_search': self.ef_search,
+            'build_threads': self.build_threads,
+            'filtered_searches': dict(self.stats),
+        }
+
+
+class ExactBackend(ANNBackend):
+    """
+    Exact cosine search with a numpy matmul over a (capacity x dim) matrix
+
+    Row = label. Rows of deleted labels are zeroed and masked out. The
+    matrix may be a read-only view (mmapped snapshot vectors, float16 or
+    float32); it is copied to a writable float32 array only when vectors
+    are added. Queries scan it in blocks so float16 data is never
+    converted all at once.
+    """
+    name = 'exact'
+
+    def __init__(self, dimension: int, config: Optional[Dict] = None):
+        super().__init__(dimension, config)
+        self.block_rows = self.config.get('exact_block_rows', 65536)
+        self.vectors: Optional[np.ndarray] = None
+        self.live_mask: Optional[np.ndarray] = None
+        self.rows = 0
+        self.stats = {'queries': 0}
+
+    @property
+    def live(self) -> int:
+        return int(self.live_mask[:self.rows].sum()) if self.live_mask is not None else 0
+
+    def build(self, capacity: int):
+        self.vectors = np.zeros((max(capacity, 1), self.dimension), dtype=np.float32)
+        self.live_mask = np.zeros(len(self.vectors), dtype=bool)
+        self.rows = 0
+
+    def attach(self, vectors: np.ndarray, live_mask: Optional[np.ndarray] = None):
+        """
+        Search an existing matrix in place (e.g. the snapshot's mmapped vectors)
+
+        Rows must be unit-length (or zero for absent labels).
+        """
+        if vectors.ndim != 2 or vectors.shape[1] != self.dimension:
+            raise ValueError(f"Expected (n, {self.dimension}) vectors, got {vectors.shape}")
+        self.vectors = vectors
+        self.rows = len(vectors)
+        self.live_mask = np.ones(self.rows, dtype=bool) if live_mask is None else np.asarray(live_mask, dtype=bool)
+
+    def _ensure_capacity(self, rows: int):
+        """Writable float32 matrix with room for rows"""
+        capacity = len(self.vectors)
+        writable = self.vectors.dtype == np.float32 and self.vectors.flags.writeable
+        if rows <= capacity and writable:
+            return
+        new_capacity = max(rows, int(capacity * self.growth_factor)) if rows > capacity else capacity
+        grown = np.zeros((new_capacity, self.dimension), dtype=np.float32)
+        grown[:self.rows] = self.vectors[:self.rows]
+        mask = np.zeros(new_capacity, dtype=bool)
+        mask[:self.rows] = self.live_mask[:self.rows]
+        self.vectors, self.live_mask = grown, mask
+
+    def add(self, vectors: np.ndarray, labels: np.ndarray):
+        labels = np.asarray(labels, dtype=np.int64)
+        self._ensure_capacity(int(labels.max()) + 1)
+        self.vectors[labels] = _normalize_rows(vectors)
+        self.live_mask[labels] = True
+        self.rows = max(self.rows, int(labels.max()) + 1)
+
+    def delete(self, labels: Iterable[int]):
+        labels = np.fromiter((int(label) for label in labels), dtype=np.int64)
+        if len(labels) == 0:
+            return
+        if not self.live_mask.flags.writeable:
+            self.live_mask = self.live_mask.copy()
+        self.live_mask[labels] = False
+
+    def search_batch(self, queries: np.ndarray, k: int, allowed: Optional[np.ndarray] = None,
+                     num_threads: int = -1) -> Tuple[np.ndarray, np.ndarray]:
+        queries = _normalize_rows(queries)
+        labels, distances = self._empty_result(len(queries), k)
+        if self.vectors is None or len(queries) == 0:
+            return labels, distances
+        self.stats['queries'] += len(queries)
+
+        if allowed is not None:
+            allowed = allowed[self.live_mask[allowed]]
+            kk = min(k, len(allowed))
+            if kk:
+                labels[:, :kk], distances[:, :kk] = _top_k(queries @ self.get_vectors(allowed).T, allowed, kk)
+            return labels, distances
+
+        kk = min(k, self.live)
+        if kk == 0:
+            return labels, distances
+        best_labels = best_distances = None
+        for start in range(0, self.rows, self.block_rows):
+            end = min(start + self.block_rows, self.rows)
+            similarities = queries @ np.asarray(self.vectors[start:end], dtype=np.float32).T
+            similarities[:, ~self.live_mask[start:end]] = -np.inf
+            block_labels, block_distances = _top_k(similarities, np.arange(start, end), kk)
+            if best_labels is None:
+                best_labels, best_distances = block_labels, block_distances
+            else:
+                best_labels, best_distances = self._merge(best_labels, best_distances,
+                                                          block_labels, block_distances, kk)
+        labels[:, :kk], distances[:, :kk] = best_labels[:, :kk], best_distances[:, :kk]
+        return labels, distances
+
+    @staticmethod
+    def _merge(labels_a, distances_a, labels_b, distances_b, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Keep the k smallest distances of two per-row candidate lists"""
+        labels = np.concatenate([labels_a, labels_b], axis=1)
+        distances = np.concatenate([distances_a, distances_b], axis=1)
+        order = np.argsort(distances, axis=1, kind='stable')[:, :k]
+        return np.take_along_axis(labels, order, axis=1), np.take_along_axis(distances, order, axis=1)
+
+    def get_vectors(self, labels: np.ndarray) -> np.ndarray:
+        return np.asarray(self.vectors[labels], dtype=np.float32)
+
+    def save(self, path: str):
+        """Write the live rows as a .npy matrix (deleted rows zeroed)"""
+        matrix = np.asarray(self.vectors[:self.rows], dtype=np.float32)
+        matrix = np.where(self.live_mask[:self.rows, None], matrix, 0)
+        with open(path, 'wb') as f:
+            np.save(f, matrix)
+
+    def load(self, path: str, num_elements: int = 0):
+        """Map a matrix written by save() (read-only until vectors are added)"""
+        matrix = np.load(path, mmap_mode='r')
+        live_mask = np.any(matrix != 0, axis=1)
+        self.attach(matrix, live_mask)
+
+    def get_stats(self) -> Dict:
+        return {
+            'backend': self.name,
+            'capacity': len(self.vectors) if self.vectors is not None else 0,
+            'deleted': self.rows - self.live,
+            'storage': 'mmap' if isinstance(self.vectors, np.memmap) or
+                       (self.vectors is not None and not self.vectors.flags.writeable) else 'memory',
+            'dtype': str(self.vectors.dtype) if self.vectors is not None else None,
+            'exact_queries': self.stats['queries'],
+        }
+
+
+def select_backend(name: str, num_vectors: int, exact_max_vectors: int = 20000) -> str:
+    """
+    Resolve a configured backend name ('auto' picks by corpus size)
+
+    Returns:
+        One of BACKENDS
+    """
+    if name == 'auto':
+        return 'exact' if num_vectors <= exact_max_vectors else 'hnsw'
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown ANN backend: {name} (expected one of {BACKENDS} or 'auto')")
+    return name
+
+
+def create_backend(name: str, dimension: int, config: Optional[Dict] = None) -> ANNBackend:
+    """Instantiate a backend by resolved name"""
+    return {'hnsw': HNSWBackend, 'exact': ExactBackend}[name](dimension, config)
+
+
+def load_backend(path: str, dimension: int, configs: Optional[Dict[str, Dict]] = None,
+                 num_elements: int = 0) -> ANNBackend:
+    """
+    Load a saved index, choosing the backend from the file's format
+
+    Args:
+        configs: Optional per-backend config, keyed by backend name
+    """
+    with open(path, 'rb') as f:
+        magic = f.read(len(NPY_MAGIC))
+    name = 'exact' if magic == NPY_MAGIC else 'hnsw'
+    backend = create_backend(name, dimension, (configs or {}).get(name))
+    backend.load(path, num_elements)
+    return backend
@@ -0,0 +1,112 @@
+"""
+Chunk Filter for MCP v6
+Metadata predicates (path subtree, extension/language, section) used to
+restrict vector search to a subset of the snapshot
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+# Language name -> file extensions it covers
+LANGUAGE_EXTENSIONS: Dict[str, Tuple[str, ...]] = {
+    'python': ('.py', '.pyi'),
+    'javascript': ('.js', '.jsx', '.mjs', '.cjs'),
+    'typescript': ('.ts', '.tsx'),
+    'java': ('.java',),
+    'csharp': ('.cs',),
+    'go': ('.go',),
+    'rust': ('.rs',),
+    'c': ('.c', '.h'),
+    'cpp': ('.cpp', '.cc', '.cxx', '.hpp', '.hh'),
+    'markdown': ('.md', '.markdown'),
+    'json': ('.json',),
+    'yaml': ('.yaml', '.yml'),
+    'text': ('.txt',),
+    'shell': ('.sh', '.bash', '.ps1', '.bat'),
+    'sql': ('.sql',),
+    'html': ('.html', '.htm'),
+    'css': ('.css', '.scss'),
+}
+
+
+def _normalize_path(path: str) -> str:
+    """Forward slashes, lower case (snapshots are built on Windows and POSIX)"""
+    return path.replace('\\', '/').lower()
+
+
+@dataclass(frozen=True)
+class ChunkFilter:
+    """
+    Filter on chunk attributes; every field that is set must match
+
+    - path_prefix: file subtree (or one file), matched on whole path
+      components at the start of the path or after any '/' (so 'docs/api'
+      matches 'C:/repo/docs/api/x.md' but not 'docs/api_v2/x.md')
+    - extensions: file extensions, with or without the leading dot
+    - languages: names from LANGUAGE_EXTENSIONS, expanded to extensions
+    - section: case-insensitive substring of the chunk's section title
+    """
+    path_prefix: Optional[str] = None
+    extensions: Tuple[str, ...] = ()
+    languages: Tuple[str, ...] = ()
+    section: Optional[str] = None
+
+    @classmethod
+    def from_args(cls, args: Dict) -> Optional['ChunkFilter']:
+        """Build a filter from tool arguments (None when no filter was requested)"""
+        def as_tuple(value) -> Tuple[str, ...]:
+            if not value:
+                return ()
+            return (value,) if isinstance(value, str) else tuple(value)
+
+        chunk_filter = cls(
+            path_prefix=args.get('path_prefix') or None,
+            extensions=as_tuple(args.get('extensions')),
+            languages=as_tuple(args.get('language') or args.get('languages')),
+            section=args.get('section') or None,
+        )
+        return None if chunk_filter.is_empty() else chunk_filter
+
+    def is_empty(self) -> bool:
+        return not (self.path_prefix or self.extensions or self.languages or self.section)
+
+    def _suffixes(self) -> Tuple[str, ...]:
+        """Lower-case extensions accepted by extensions/languages"""
+        suffixes = [ext.lower() if ext.startswith('.') else f".{ext.lower()}" for ext in self.extensions]
+        for language in self.languages:
+            language = language.lower()
+            if language not in LANGUAGE_EXTENSIONS:
+                raise ValueError(f"Unknown language '{language}' (expected one of {sorted(LANGUAGE_EXTENSIONS)})")
+            suffixes.extend(LANGUAGE_EXTENSIONS[language])
+        return tuple(suffixes)
+
+    def compile(self):
+        """
+        Predicate over (file_path, section)
+
+        File-level tests are memoized, since many chunks share one file.
+        """
+        prefix = _normalize_path(self.path_prefix).strip('/') if self.path_prefix else None
+        suffixes = self._suffixes()
+        section = self.section.lower() if self.section else None
+        file_matches: Dict[str, bool] = {}
+
+        def file_match(file_path: str) -> bool:
+            matched = file_matches.get(file_path)
+            if matched is None:
+                path = _normalize_path(file_path)
+                matched = True
+                # Slashes on both sides keep the match on component boundaries
+                if prefix and f"/{prefix}/" not in f"/{path}/":
+                    matched = False
+                if suffixes and not path.endswith(suffixes):
+                    matched = False
+                file_matches[file_path] = matched
+            return matched
+
+        def predicate(file_path: str, chunk_section: str) -> bool:
+            if not file_match(file_path):
+                return False
+            return section is None or section in (chunk_section or '').lower()
+
+        return predicate
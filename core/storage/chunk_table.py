@@ -0,0 +1,183 @@
+"""
+Columnar Chunk Table for MCP v6
+Binary, memory-mappable replacement for the JSON chunk list in the mcpi box
+"""
+
+import struct
+import logging
+from collections.abc import Sequence
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from .mp4_storage import VirtualChunk
+
+logger = logging.getLogger(__name__)
+
+# Layout (little endian, every section 8-byte aligned):
+#   header   magic, version, reserved, rows, heap_size
+#   columns  one fixed-width array per INT_COLUMNS entry
+#   strings  (offset, length) uint32 pairs per STRING_COLUMNS entry
+#   heap     utf-8 bytes, each distinct string stored once
+CHUNK_TABLE_MAGIC = b'MCPT'
+CHUNK_TABLE_VERSION = 1
+HEADER = struct.Struct('<4sHHQQ')
+
+INT_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ('start_line', '<i4'),
+    ('end_line', '<i4'),
+    ('vector_size', '<i4'),
+    ('vector_offset', '<i8'),
+)
+STRING_COLUMNS: Tuple[str, ...] = ('chunk_id', 'file_path', 'section', 'summary', 'text_hash')
+
+
+def _padded(size: int) -> int:
+    """Round size up to the next multiple of 8"""
+    return (size + 7) & ~7
+
+
+class ChunkView(VirtualChunk):
+    """
+    Lightweight read-only chunk backed by one row of a ChunkTable
+    Fields are decoded from the columns on access; nothing is copied up front
+    """
+    __slots__ = ('_table', '_row')
+
+    def __init__(self, table: 'ChunkTable', row: int):
+        self._table = table
+        self._row = row
+
+    chunk_id = property(lambda self: self._table.get_string('chunk_id', self._row))
+    file_path = property(lambda self: self._table.get_string('file_path', self._row))
+    section = property(lambda self: self._table.get_string('section', self._row))
+    summary = property(lambda self: self._table.get_string('summary', self._row))
+    text_hash = property(lambda self: self._table.get_string('text_hash', self._row))
+    start_line = property(lambda self: int(self._table.columns['start_line'][self._row]))
+    end_line = property(lambda self: int(self._table.columns['end_line'][self._row]))
+    vector_offset = property(lambda self: int(self._table.columns['vector_offset'][self._row]))
+    vector_size = property(lambda self: int(self._table.columns['vector_size'][self._row]))
+
+    @property
+    def row(self) -> int:
+        """Row index of this chunk in its table"""
+        return self._row
+
+    def materialize(self) -> VirtualChunk:
+        """Copy this row into a standalone VirtualChunk"""
+        return VirtualChunk.from_dict(self.to_dict())
+
+    def __repr__(self) -> str:
+        return f"ChunkView(row={self._row}, chunk_id={self.chunk_id!r})"
+
+
+class ChunkTable(Sequence):
+    """
+    Columnar chunk table over a bytes-like buffer (usually an mmap slice)
+    Behaves like a read-only list of ChunkView objects
+    """
+
+    def __init__(self, buffer):
+        """
+        Parse table header and map columns without copying
+
+        Args:
+            buffer: bytes or memoryview produced by ChunkTable.encode
+        """
+        if len(buffer) < HEADER.size:
+            raise ValueError("Chunk table too small")
+
+        magic, version, _, rows, heap_size = HEADER.unpack_from(buffer, 0)
+        if magic != CHUNK_TABLE_MAGIC:
+            raise ValueError(f"Invalid chunk table magic: {magic!r}")
+        if version > CHUNK_TABLE_VERSION:
+            raise ValueError(f"Unsupported chunk table version: {version}")
+
+        self.version = version
+        self.rows = rows
+        self.columns: Dict[str, np.ndarray] = {}
+        self.string_refs: Dict[str, np.ndarray] = {}
+
+        pos = HEADER.size
+        for name, dtype in INT_COLUMNS:
+            column = np.frombuffer(buffer, dtype=dtype, count=rows, offset=pos)
+            self.columns[name] = column
+            pos += _padded(column.nbytes)
+
+        for name in STRING_COLUMNS:
+            refs = np.frombuffer(buffer, dtype='<u4', count=rows * 2, offset=pos).reshape(rows, 2)
+            self.string_refs[name] = refs
+            pos += _padded(refs.nbytes)
+
+        self.heap = memoryview(buffer)[pos:pos + heap_size]
+
+    @staticmethod
+    def encode(chunks: List[VirtualChunk]) -> bytes:
+        """
+        Encode chunks into the columnar binary layout
+
+        Args:
+            chunks: Chunks in row order
+
+        Returns:
+            Table bytes ready to be stored in the mcpt box
+        """
+        rows = len(chunks)
+        heap = bytearray()
+        interned: Dict[str, Tuple[int, int]] = {}
+
+        def intern(value: str) -> Tuple[int, int]:
+            ref = interned.get(value)
+            if ref is None:
+                data = (value or '').encode('utf-8')
+                ref = (len(heap), len(data))
+                heap.extend(data)
+                interned[value] = ref
+            return ref
+
+        parts = []
+        for name, dtype in INT_COLUMNS:
+            column = np.fromiter((getattr(c, name) for c in chunks), dtype=dtype, count=rows)
+            parts.append(column.tobytes())
+
+        for name in STRING_COLUMNS:
+            refs = np.array([intern(getattr(c, name)) for c in chunks], dtype='<u4').reshape(rows, 2)
+            parts.append(refs.tobytes())
+
+        out = bytearray(HEADER.pack(CHUNK_TABLE_MAGIC, CHUNK_TABLE_VERSION, 0, rows, len(heap)))
+        for part in parts:
+            out.extend(part)
+            out.extend(b'\0' * (_padded(len(part)) - len(part)))
+        out.extend(heap)
+        return bytes(out)
+
+    def get_string(self, name: str, row: int) -> str:
+        """Decode one string field for a row"""
+        offset, length = self.string_refs[name][row]
+        return str(self.heap[offset:offset + length], 'utf-8')
+
+    def iter_strings(self, name: str) -> Iterator[str]:
+        """Decode a whole string column in row order"""
+        heap = self.heap
+        for offset, length in self.string_refs[name].tolist():
+            yield str(heap[offset:offset + length], 'utf-8')
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [ChunkView(self, i) for i in range(*index.indices(self.rows))]
+        if index < 0:
+            index += self.rows
+        if not 0 <= index < self.rows:
+            raise IndexError("chunk table index out of range")
+        return ChunkView(self, index)
+
+    def release(self):
+        """Drop column views so the underlying mmap can be closed"""
+        self.columns = {}
+        self.string_refs = {}
+        if self.heap is not None:
+            self.heap.release()
+            self.heap = None
@@ -9,7 +9,7 @@ from pathlib import Path
 import logging
 
 from .mp4_storage import MP4Storage, VirtualChunk
-from .compressed_storage import VectorCompressor
+from .compressed_storage import VectorCompressor, ProductQuantizer, Int8Scorer, BlockCompressedBlob
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +30,10 @@ class CompressedMP4Storage(MP4Storage):
         """
         super().__init__(mp4_path)
         
+        # Decoded LZ4 blocks kept for row-level access to block-compressed blobs
+        self.block_cache_blocks = (compression_config or {}).get('lz4_cache_blocks', 64)
+        self._vector_blocks: Optional[BlockCompressedBlob] = None
+        
         # Initialize compressor if config provided
         if compression_config:
             self.compressor = VectorCompressor(compression_config)
@@ -37,21 +41,33 @@ class CompressedMP4Storage(MP4Storage):
         else:
             self.compressor = None
             logger.info("CompressedMP4Storage initialized without compression (backward compatible)")
+        
+        # PQ search state (codes and rerank vectors are views over the mmap)
+        self.pq: Optional[ProductQuantizer] = None
+        self._pq_codes: Optional[np.ndarray] = None
+        self._rerank_vectors: Optional[np.ndarray] = None
+        self._int8_scorer: Optional[Int8Scorer] = None
     
     def create_compressed_snapshot(self, chunks: List[VirtualChunk], vectors: np.ndarray, 
-                                 hnsw_blob: bytes, metadata: Dict) -> str:
+                                 hnsw_blob: bytes, metadata: Dict,
+                                 hnsw_index_path: Optional[str] = None) -> str:
         """
         Create snapshot with compressed vectors
         
+        With PQ enabled the codebooks are trained here and stored in an mcpq
+        box; an optional reduced-precision copy for reranking goes to mcpr.
+        
         Args:
             chunks: List of virtual chunks
             vectors: Vector embeddings (float32)
             hnsw_blob: HNSW index blob
             metadata: Additional metadata
+            hnsw_index_path: Optional HNSW sidecar file (see MP4Storage.create_snapshot)
             
         Returns:
             Snapshot hash
         """
+        extra_boxes = {}
         if self.compressor and len(vectors) > 0:
             # Compress vectors
             compressed_vectors, compression_metadata = self.compressor.compress_vectors(vectors)
@@ -67,6 +83,12 @@ class CompressedMP4Storage(MP4Storage):
             
             # Use compressed vectors as blob
             vectors_blob = compressed_vectors
+            
+            if self.compressor.pq is not None:
+                extra_boxes['mcpq'] = self.compressor.pq.to_bytes()
+                if self.compressor.pq_rerank_precision:
+                    rerank = vectors.astype(self.compressor.pq_rerank_precision)
+                    extra_boxes['mcpr'] = rerank.tobytes()
         else:
             # No compression - convert to float32 bytes
             vectors_blob = vectors.astype(np.float32).tobytes()
@@ -74,7 +96,16 @@ class CompressedMP4Storage(MP4Storage):
             logger.info(f"Vectors stored without compression ({len(vectors_blob)} bytes)")
         
         # Call parent method to create snapshot
-        return super().create_snapshot(chunks, vectors_blob, hnsw_blob, metadata)
+        snapshot_hash = super().create_snapshot(chunks, vectors_blob, hnsw_blob, metadata,
+                                                hnsw_index_path=hnsw_index_path,
+                                                extra_boxes=extra_boxes)
+        if extra_boxes.get('mcpq'):
+            self._load_pq()
+        return snapshot_hash
+    
+    def reload(self) -> bool:
+        """Reload the snapshot, including its compressed vector views"""
+        return self.load_compressed_snapshot()
     
     def load_compressed_snapshot(self) -> bool:
         """
@@ -94,6 +125,25 @@ class CompressedMP4Storage(MP4Storage):
             # Get compression metadata
             compression_metadata = self.metadata.get('vector_compression', {})
             
+            if compression_metadata.get('pq'):
+                # PQ codes stay compressed in RAM; search runs on them directly
+                return self._load_pq()
+            
+            steps = compression_metadata.get('compression_steps', [])
+            if 'precision_int8' in steps:
+                # int8 codes are scored in place over the mmap (or decoded once if LZ4'd)
+                return self._load_int8()
+            
+            if 'lz4_blocks' in steps:
+                # Keep blocks compressed; rows are decoded on demand via get_vector_rows
+                vec_offset, vec_size = self.get_vector_blob_offset()
+                self._vector_blocks = BlockCompressedBlob(
+                    memoryview(self.mmap_data)[vec_offset:vec_offset + vec_size],
+                    cache_blocks=self.block_cache_blocks
+                )
+                logger.info(f"Block-compressed vectors mapped: {self._vector_blocks.num_blocks} blocks")
+                return True
+            
             if compression_metadata:
                 # Read compressed vector blob
                 vec_offset, vec_size = self.get_vector_blob_offset()
@@ -128,6 +178,19 @@ class CompressedMP4Storage(MP4Storage):
         if hasattr(self, '_decompressed_vectors'):
             return self._decompressed_vectors
         
+        # PQ snapshots: approximate reconstruction from the codebooks
+        if self._pq_codes is not None:
+            return self.pq.decode(self._pq_codes)
+        
+        if self._int8_scorer is not None:
+            scorer = self._int8_scorer
+            return scorer.codes.astype(np.float32) * scorer.scale + scorer.offset
+        
+        if self._vector_blocks is not None:
+            compression_metadata = self.metadata.get('vector_compression', {})
+            decoder = self.compressor or VectorCompressor({})
+            return decoder.decode_rows(self._vector_blocks.read_all(), compression_metadata)
+        
         # Fallback to reading raw vectors (for uncompressed files)
         vec_offset, vec_size = self.get_vector_blob_offset()
         
@@ -157,6 +220,150 @@ class CompressedMP4Storage(MP4Storage):
         
         return None
     
+    def _load_pq(self) -> bool:
+        """
+        Load PQ codebooks and map codes (and rerank vectors) for ADC search
+        
+        Returns:
+            True if PQ search is available
+        """
+        if self.mmap_data is None:
+            self._open_mmap()
+        
+        codebook_view = self.get_box_view('mcpq')
+        if codebook_view is None:
+            logger.error("PQ snapshot has no mcpq codebook box")
+            return False
+        try:
+            self.pq = ProductQuantizer.from_bytes(codebook_view)
+        finally:
+            codebook_view.release()
+        
+        compression_metadata = self.metadata.get('vector_compression', {})
+        total = self.metadata.get('total_vectors', 0)
+        codes = self._map_codes(compression_metadata, np.uint8)
+        self._pq_codes = codes.reshape(total, self.pq.subvectors)
+        
+        if self.compressor:
+            self.compressor.pq = self.pq
+        
+        # Rerank copy stays on disk; only candidate rows are paged in
+        rerank_precision = compression_metadata.get('pq', {}).get('rerank_precision')
+        rerank_box = self._get_box('mcpr')
+        self._rerank_vectors = None
+        if rerank_precision and rerank_box:
+            offset, size = rerank_box
+            dtype = np.dtype(rerank_precision)
+            self._rerank_vectors = np.frombuffer(
+                self.mmap_data, dtype=dtype, count=size // dtype.itemsize, offset=offset
+            ).reshape(total, self.pq.dimension)
+        
+        logger.info(f"PQ search ready: {total} codes x {self.pq.subvectors} bytes "
+                    f"(rerank={'yes' if self._rerank_vectors is not None else 'no'})")
+        return True
+    
+    def _map_codes(self, compression_metadata: Dict, dtype) -> np.ndarray:
+        """Codes as a view over the mmap, or decoded once when LZ4 was applied"""
+        vec_offset, vec_size = self.get_vector_blob_offset()
+        steps = compression_metadata.get('compression_steps', [])
+        if 'lz4' in steps or 'lz4_blocks' in steps:
+            # Codes are already small; decompress them once
+            raw = VectorCompressor.decompress_raw(
+                memoryview(self.mmap_data)[vec_offset:vec_offset + vec_size], compression_metadata
+            )
+            return np.frombuffer(raw, dtype=dtype)
+        return np.frombuffer(self.mmap_data, dtype=dtype, count=vec_size // np.dtype(dtype).itemsize,
+                             offset=vec_offset)
+    
+    def _load_int8(self) -> bool:
+        """Map int8 codes for in-place scoring with their per-dimension scale/offset"""
+        int8 = self.metadata.get('vector_compression', {}).get('int8')
+        if not int8:
+            logger.error("int8 snapshot has no per-dimension scale/offset")
+            return False
+        
+        total = self.metadata.get('total_vectors', 0)
+        codes = self._map_codes(self.metadata['vector_compression'], np.int8)
+        self._int8_scorer = Int8Scorer(codes.reshape(total, -1) if total else codes.reshape(0, 0),
+                                       int8['scale'], int8['offset'])
+        logger.info(f"int8 search ready: {total} vectors x {len(int8['scale'])} dims")
+        return True
+    
+    def search_int8(self, query_vector: np.ndarray, top_k: int = 5) -> Tuple[List[str], List[float]]:
+        """
+        Exact brute-force search over the mmapped int8 codes
+        
+        Returns:
+            Tuple of (chunk_ids, scores), same shape as VectorEngine.search
+        """
+        if self._int8_scorer is None:
+            logger.error("int8 search requested but snapshot has no int8 codes")
+            return [], []
+        
+        rows, scores = self._int8_scorer.search(query_vector, top_k)
+        chunk_ids = [self.chunks[int(row)].chunk_id for row in rows]
+        return chunk_ids, [float(score) for score in scores]
+    
+    def search_pq(self, query_vector: np.ndarray, top_k: int = 5,
+                  rerank_k: int = 0) -> Tuple[List[str], List[float]]:
+        """
+        Search the snapshot with asymmetric-distance PQ scoring
+        
+        Args:
+            query_vector: float32 query embedding (normalized, like the corpus)
+            top_k: Number of results
+            rerank_k: ADC candidates to rescore exactly against the mcpr copy
+                (0 disables; ignored when the snapshot has no rerank vectors)
+        
+        Returns:
+            Tuple of (chunk_ids, scores), same shape as VectorEngine.search
+        """
+        if self._pq_codes is None or self.pq is None:
+            logger.error("PQ search requested but snapshot has no PQ codes")
+            return [], []
+        
+        rows, scores = self.pq.search(query_vector, self._pq_codes, top_k,
+                                      rerank_vectors=self._rerank_vectors, rerank_k=rerank_k)
+        chunk_ids = [self.chunks[int(row)].chunk_id for row in rows]
+        return chunk_ids, [float(score) for score in scores]
+    
+    def close(self):
+        """Drop PQ/int8 views before the mmap is closed"""
+        self._pq_codes = None
+        self._rerank_vectors = None
+        self._int8_scorer = None
+        if self._vector_blocks is not None:
+            self._vector_blocks.release()
+            self._vector_blocks = None
+        super().close()
+    
+    def get_vector_rows(self, rows: List[int]) -> Optional[np.ndarray]:
+        """
+        Get float32 vectors for selected rows without decoding the whole blob
+        
+        Block-compressed snapshots decode only the blocks holding the rows;
+        PQ/int8 snapshots decode just those codes.
+        
+        Args:
+            rows: Row indices (chunk order)
+            
+        Returns:
+            (len(rows), dimension) float32 array, or None if not available
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if self._vector_blocks is not None:
+            compression_metadata = self.metadata.get('vector_compression', {})
+            decoder = self.compressor or VectorCompressor({})
+            return decoder.decode_rows(self._vector_blocks.read_rows(rows), compression_metadata)
+        if self._pq_codes is not None:
+            return self.pq.decode(self._pq_codes[rows])
+        if self._int8_scorer is not None:
+            scorer = self._int8_scorer
+            return scorer.codes[rows].astype(np.float32) * scorer.scale + scorer.offset
+        
+        vectors = self.get_vectors()
+        return vectors[rows] if vectors is not None else None
+    
     def get_compression_stats(self) -> Optional[Dict]:
         """
         Get compression statistics for the current snapshot
@@ -184,7 +391,8 @@ class CompressedMP4Storage(MP4Storage):
         return None
     
     def create_snapshot_with_stats(self, chunks: List[VirtualChunk], vectors: np.ndarray,
-                                 hnsw_blob: bytes, metadata: Dict) -> Tuple[str, Optional[Dict]]:
+                                 hnsw_blob: bytes, metadata: Dict,
+                                 hnsw_index_path: Optional[str] = None) -> Tuple[str, Optional[Dict]]:
         """
         Create snapshot and return compression statistics
         
@@ -193,11 +401,13 @@ class CompressedMP4Storage(MP4Storage):
             vectors: Vector embeddings
             hnsw_blob: HNSW index blob
             metadata: Additional metadata
+            hnsw_index_path: Optional HNSW sidecar file
             
         Returns:
             Tuple of (snapshot_hash, compression_stats)
         """
-        snapshot_hash = self.create_compressed_snapshot(chunks, vectors, hnsw_blob, metadata)
+        snapshot_hash = self.create_compressed_snapshot(chunks, vectors, hnsw_blob, metadata,
+                                                        hnsw_index_path=hnsw_index_path)
         stats = self.get_compression_stats()
         
         return snapshot_hash, stats
\ No newline at end of file
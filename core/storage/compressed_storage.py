@@ -3,14 +3,365 @@ Compressed Vector Storage for MCP v6
 Implements various compression techniques for vector embeddings
 """
 
+import struct
+import threading
+from collections import OrderedDict
 import numpy as np
 import lz4.frame
 import logging
-from typing import Dict, Tuple, Optional
+from typing import Callable, Dict, Sequence, Tuple, Optional
 from sklearn.cluster import MiniBatchKMeans
 
 logger = logging.getLogger(__name__)
 
+# Codebook blob header: magic, version, subvectors, clusters, sub-vector dimension
+PQ_MAGIC = b'MCPQ'
+PQ_VERSION = 1
+PQ_HEADER = struct.Struct('<4sHHII')
+
+
+class ProductQuantizer:
+    """
+    Product quantization with asymmetric distance computation (ADC)
+    
+    Vectors are split into `subvectors` slices; each slice is replaced by the
+    uint8 id of its nearest centroid in a per-slice codebook. Queries stay in
+    float32: one (subvectors x clusters) table of partial inner products is
+    computed per query and scores are sums of table lookups.
+    """
+    
+    def __init__(self, codebooks: np.ndarray):
+        """
+        Args:
+            codebooks: float32 array of shape (subvectors, clusters, sub_dim)
+        """
+        self.codebooks = np.ascontiguousarray(codebooks, dtype=np.float32)
+        self.subvectors, self.clusters, self.sub_dim = self.codebooks.shape
+        self.dimension = self.subvectors * self.sub_dim
+    
+    @classmethod
+    def train(cls, vectors: np.ndarray, subvectors: int, clusters: int = 256,
+              seed: int = 42) -> 'ProductQuantizer':
+        """
+        Train one k-means codebook per sub-vector
+        
+        Args:
+            vectors: float array of shape (n_vectors, dimension)
+            subvectors: Number of slices (must divide the dimension)
+            clusters: Centroids per slice (at most 256, codes are uint8)
+            seed: Random state for reproducible snapshots
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n_vectors, dimension = vectors.shape
+        if dimension % subvectors:
+            raise ValueError(f"pq_subvectors={subvectors} does not divide dimension {dimension}")
+        if not 1 <= clusters <= 256:
+            raise ValueError(f"pq_clusters must be in 1..256, got {clusters}")
+        
+        clusters = min(clusters, n_vectors)
+        sub_dim = dimension // subvectors
+        codebooks = np.empty((subvectors, clusters, sub_dim), dtype=np.float32)
+        for m in range(subvectors):
+            kmeans = MiniBatchKMeans(n_clusters=clusters, random_state=seed, n_init=1,
+                                     batch_size=max(1024, clusters * 4))
+            kmeans.fit(vectors[:, m * sub_dim:(m + 1) * sub_dim])
+            codebooks[m] = kmeans.cluster_centers_
+        
+        logger.info(f"Trained PQ codebooks: {subvectors} x {clusters} x {sub_dim} on {n_vectors} vectors")
+        return cls(codebooks)
+    
+    def _slices(self, vectors: np.ndarray) -> np.ndarray:
+        """View (n, dimension) vectors as (n, subvectors, sub_dim)"""
+        return np.asarray(vectors, dtype=np.float32).reshape(-1, self.subvectors, self.sub_dim)
+    
+    def encode(self, vectors: np.ndarray, batch_size: int = 4096) -> np.ndarray:
+        """Encode vectors as (n, subvectors) uint8 centroid ids"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        codes = np.empty((len(vectors), self.subvectors), dtype=np.uint8)
+        # ||x - c||^2 = ||c||^2 - 2 x.c (+ ||x||^2, constant per row)
+        centroid_norms = np.einsum('mkd,mkd->mk', self.codebooks, self.codebooks)
+        for start in range(0, len(vectors), batch_size):
+            parts = self._slices(vectors[start:start + batch_size])
+            dots = np.einsum('nmd,mkd->nmk', parts, self.codebooks)
+            codes[start:start + batch_size] = np.argmin(centroid_norms[None] - 2 * dots, axis=2)
+        return codes
+    
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Reconstruct approximate float32 vectors from codes"""
+        codes = np.asarray(codes).reshape(-1, self.subvectors)
+        parts = self.codebooks[np.arange(self.subvectors), codes]
+        return parts.reshape(len(codes), self.dimension)
+    
+    def lookup_tables(self, query: np.ndarray) -> np.ndarray:
+        """Partial inner products of a float32 query with every centroid, (subvectors, clusters)"""
+        return np.einsum('md,mkd->mk', self._slices(query)[0], self.codebooks)
+    
+    def score(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Approximate inner product of a query with every coded vector"""
+        tables = self.lookup_tables(query)
+        scores = np.zeros(len(codes), dtype=np.float32)
+        for m in range(self.subvectors):
+            scores += tables[m, codes[:, m]]
+        return scores
+    
+    def search(self, query: np.ndarray, codes: np.ndarray, top_k: int = 5,
+               rerank_vectors: Optional[np.ndarray] = None,
+               rerank_k: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        ADC top-k search, optionally reranked with exact vectors
+        
+        Args:
+            query: float32 query vector
+            codes: (n, subvectors) uint8 codes
+            top_k: Results to return
+            rerank_vectors: Full-precision vectors (any float dtype, can be an
+                mmap view); only the rerank candidates are read
+            rerank_k: ADC candidates to rescore exactly (0 disables reranking)
+        
+        Returns:
+            (rows, scores) sorted by descending score
+        """
+        if len(codes) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        scores = self.score(query, codes)
+        
+        rerank = rerank_vectors is not None and rerank_k > 0
+        shortlist = min(max(rerank_k, top_k) if rerank else top_k, len(scores))
+        rows = np.argpartition(-scores, shortlist - 1)[:shortlist]
+        
+        if rerank:
+            candidate_rows = np.sort(rows)
+            exact = np.asarray(rerank_vectors[candidate_rows], dtype=np.float32) @ query
+            rows, scores = candidate_rows, exact
+        else:
+            scores = scores[rows]
+        
+        order = np.argsort(-scores)[:top_k]
+        return rows[order], scores[order]
+    
+    def to_bytes(self) -> bytes:
+        """Serialize codebooks (stored in the snapshot's mcpq box)"""
+        header = PQ_HEADER.pack(PQ_MAGIC, PQ_VERSION, self.subvectors, self.clusters, self.sub_dim)
+        return header + self.codebooks.astype('<f4').tobytes()
+    
+    @classmethod
+    def from_bytes(cls, data) -> 'ProductQuantizer':
+        """Load codebooks written by to_bytes (bytes or memoryview)"""
+        magic, version, subvectors, clusters, sub_dim = PQ_HEADER.unpack_from(data, 0)
+        if magic != PQ_MAGIC:
+            raise ValueError(f"Invalid PQ codebook magic: {magic!r}")
+        if version > PQ_VERSION:
+            raise ValueError(f"Unsupported PQ codebook version: {version}")
+        codebooks = np.frombuffer(data, dtype='<f4', count=subvectors * clusters * sub_dim,
+                                  offset=PQ_HEADER.size)
+        return cls(codebooks.reshape(subvectors, clusters, sub_dim).copy())
+
+
+# Block-compressed blob header: magic, version, reserved, row bytes, rows per block, rows
+BLOCK_MAGIC = b'MCPB'
+BLOCK_VERSION = 1
+BLOCK_HEADER = struct.Struct('<4sHHIIQ')
+
+
+class BlockCompressedBlob:
+    """
+    Vector blob split into independently LZ4-compressed blocks of whole rows
+    
+    Layout: header, uint64 block offsets (blocks + 1, relative to the first
+    block), then the compressed blocks. Any row can be read by decoding only
+    its block; decoded blocks are kept in a small LRU.
+    """
+    
+    def __init__(self, buffer, cache_blocks: int = 64):
+        """
+        Args:
+            buffer: bytes or memoryview produced by encode (usually an mmap slice)
+            cache_blocks: Decoded blocks kept in the LRU
+        """
+        magic, version, _, row_bytes, rows_per_block, rows = BLOCK_HEADER.unpack_from(buffer, 0)
+        if magic != BLOCK_MAGIC:
+            raise ValueError(f"Invalid block blob magic: {magic!r}")
+        if version > BLOCK_VERSION:
+            raise ValueError(f"Unsupported block blob version: {version}")
+        
+        self.row_bytes = row_bytes
+        self.rows_per_block = rows_per_block
+        self.rows = rows
+        self.num_blocks = -(-rows // rows_per_block) if rows else 0
+        self.offsets = np.frombuffer(buffer, dtype='<u8', count=self.num_blocks + 1,
+                                     offset=BLOCK_HEADER.size)
+        self.data = memoryview(buffer)[BLOCK_HEADER.size + self.offsets.nbytes:]
+        
+        self.cache_blocks = cache_blocks
+        self._cache: 'OrderedDict[int, bytes]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+    
+    @staticmethod
+    def encode(data: bytes, row_bytes: int, block_bytes: int = 64 * 1024) -> bytes:
+        """
+        Compress raw row-major data into independently decodable blocks
+        
+        Args:
+            data: Uncompressed rows
+            row_bytes: Size of one row
+            block_bytes: Target uncompressed block size (rounded to whole rows)
+        """
+        rows = len(data) // row_bytes if row_bytes else 0
+        rows_per_block = max(1, block_bytes // max(row_bytes, 1))
+        block_span = rows_per_block * row_bytes
+        
+        blocks = [lz4.frame.compress(data[start:start + block_span])
+                  for start in range(0, rows * row_bytes, block_span)]
+        offsets = np.zeros(len(blocks) + 1, dtype='<u8')
+        offsets[1:] = np.cumsum([len(block) for block in blocks])
+        
+        header = BLOCK_HEADER.pack(BLOCK_MAGIC, BLOCK_VERSION, 0, row_bytes, rows_per_block, rows)
+        return header + offsets.tobytes() + b''.join(blocks)
+    
+    def _block(self, block_id: int) -> bytes:
+        """Decoded block, through the LRU"""
+        with self._lock:
+            block = self._cache.get(block_id)
+            if block is not None:
+                self._cache.move_to_end(block_id)
+                self.stats['hits'] += 1
+                return block
+        
+        start, end = int(self.offsets[block_id]), int(self.offsets[block_id + 1])
+        block = lz4.frame.decompress(self.data[start:end])
+        with self._lock:
+            self.stats['misses'] += 1
+            self._cache[block_id] = block
+            while len(self._cache) > self.cache_blocks:
+                self._cache.popitem(last=False)
+        return block
+    
+    def read_rows(self, rows: Sequence[int]) -> np.ndarray:
+        """
+        Raw bytes of the requested rows, decoding only the blocks they live in
+        
+        Returns:
+            uint8 array of shape (len(rows), row_bytes), in request order
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if rows.size and (rows.min() < 0 or rows.max() >= self.rows):
+            raise IndexError("vector row out of range")
+        
+        out = np.empty((len(rows), self.row_bytes), dtype=np.uint8)
+        block_ids = rows // self.rows_per_block
+        for block_id in np.unique(block_ids).tolist():
+            mask = block_ids == block_id
+            block = np.frombuffer(self._block(block_id), dtype=np.uint8).reshape(-1, self.row_bytes)
+            out[mask] = block[rows[mask] - block_id * self.rows_per_block]
+        return out
+    
+    def read_all(self) -> bytes:
+        """Decode every block (bypasses the LRU)"""
+        return b''.join(
+            lz4.frame.decompress(self.data[int(self.offsets[i]):int(self.offsets[i + 1])])
+            for i in range(self.num_blocks)
+        )
+    
+    def release(self):
+        """Drop views of the underlying buffer so an mmap can be closed"""
+        self.offsets = None
+        if self.data is not None:
+            self.data.release()
+            self.data = None
+        self._cache.clear()
+    
+    def get_stats(self) -> Dict:
+        """Block cache statistics"""
+        return {**self.stats, 'blocks': self.num_blocks, 'cached_blocks': len(self._cache),
+                'rows_per_block': self.rows_per_block}
+
+
+class Int8Scorer:
+    """
+    Inner-product scoring over int8 codes with per-dimension scale/offset
+    
+    Corpus values are reconstructed as code * scale + offset. The query
+    absorbs the per-dimension scales and is itself quantized to int8, so the
+    hot loop is an int8 x int8 dot product accumulated in int32; the offset
+    term is one float per query.
+    """
+    
+    def __init__(self, codes: np.ndarray, scale: np.ndarray, offset: np.ndarray,
+                 block_rows: int = 8192):
+        """
+        Args:
+            codes: (n, dimension) int8 codes (can be a view over the mmap)
+            scale: Per-dimension float32 scale
+            offset: Per-dimension float32 offset
+            block_rows: Rows widened to int32 at a time (bounds temporary memory)
+        """
+        self.codes = codes
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.offset = np.asarray(offset, dtype=np.float32)
+        self.block_rows = block_rows
+    
+    @staticmethod
+    def quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Map each dimension's [min, max] onto [-127, 127]
+        
+        Returns:
+            (codes int8, scale float32, offset float32)
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        min_val = vectors.min(axis=0)
+        max_val = vectors.max(axis=0)
+        offset = (max_val + min_val) / 2
+        scale = (max_val - min_val) / 254
+        scale[scale <= 0] = 1.0
+        codes = np.clip(np.round((vectors - offset) / scale), -127, 127).astype(np.int8)
+        return codes, scale.astype(np.float32), offset.astype(np.float32)
+    
+    def _query_codes(self, query: np.ndarray) -> Tuple[np.ndarray, float, float]:
+        """Fold the corpus scales into the query and quantize it symmetrically"""
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        folded = query * self.scale
+        peak = float(np.abs(folded).max())
+        query_scale = peak / 127 if peak > 0 else 1.0
+        query_codes = np.round(folded / query_scale).astype(np.int8)
+        return query_codes, query_scale, float(query @ self.offset)
+    
+    def score(self, query: np.ndarray) -> np.ndarray:
+        """Approximate inner product of the query with every row"""
+        query_codes, query_scale, bias = self._query_codes(query)
+        query_wide = query_codes.astype(np.int32)
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), self.block_rows):
+            block = self.codes[start:start + self.block_rows]
+            scores[start:start + len(block)] = block.astype(np.int32) @ query_wide
+        return scores * query_scale + bias
+    
+    def search(self, query: np.ndarray, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Brute-force top-k over the codes
+        
+        Returns:
+            (rows, scores) sorted by descending score
+        """
+        if len(self.codes) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = self.score(query)
+        top_k = min(top_k, len(scores))
+        rows = np.argpartition(-scores, top_k - 1)[:top_k]
+        order = np.argsort(-scores[rows])
+        return rows[order], scores[rows][order]
+
+
+def recall_at_k(exact_rows: np.ndarray, approx_rows: np.ndarray) -> float:
+    """Mean fraction of each exact top-k row set found in the approximate top-k"""
+    if len(exact_rows) == 0:
+        return 0.0
+    hits = sum(len(set(e.tolist()) & set(a.tolist())) for e, a in zip(exact_rows, approx_rows))
+    return hits / float(np.asarray(exact_rows).size)
+
 
 class VectorCompressor:
     """
@@ -18,6 +369,9 @@ class VectorCompressor:
     1. Precision reduction (float32 -> float16 -> int8)
     2. Quantization (scalar and product quantization)
     3. Lossless compression (LZ4)
+    
+    With use_pq the blob holds uint8 PQ codes and the trained codebooks are
+    kept on self.pq so the snapshot writer can store them.
     """
     
     def __init__(self, config: Dict):
@@ -31,14 +385,20 @@ class VectorCompressor:
         self.use_quantization = config.get('use_quantization', False)
         self.quantization_bits = config.get('quantization_bits', 8)  # 1-8 bits
         self.use_lz4 = config.get('use_lz4', True)
+        # LZ4 works on fixed-size blocks so single rows can be decoded on demand
+        self.lz4_block_bytes = config.get('lz4_block_bytes', 64 * 1024)
         self.quantizer = None
         
         # For product quantization
-        self.pq_subvectors = config.get('pq_subvectors', 4)  # Divide vector into sub-vectors
+        self.use_pq = config.get('use_pq', False)
+        self.pq_subvectors = config.get('pq_subvectors', 48)  # 48 x 8-dim codes: 32x smaller for 384-d
         self.pq_clusters = config.get('pq_clusters', 256)  # Number of clusters per sub-vector
+        # Optional full-precision copy for exact reranking (e.g. 'float16', None to skip)
+        self.pq_rerank_precision = config.get('pq_rerank_precision')
+        self.pq: Optional[ProductQuantizer] = None
         
         logger.info(f"VectorCompressor initialized with precision={self.precision}, "
-                   f"quantization={self.use_quantization}, lz4={self.use_lz4}")
+                   f"quantization={self.use_quantization}, pq={self.use_pq}, lz4={self.use_lz4}")
     
     def compress_vectors(self, vectors: np.ndarray) -> Tuple[bytes, Dict]:
         """
@@ -51,19 +411,32 @@ class VectorCompressor:
             Tuple of (compressed_bytes, metadata)
         """
         metadata = {
-            'original_shape': vectors.shape,
+            'original_shape': list(vectors.shape),
             'original_dtype': str(vectors.dtype),
             'compression_steps': []
         }
+        original_size = vectors.nbytes
+        
+        if self.use_pq:
+            # Product quantization replaces precision reduction and scalar quantization
+            self.pq = ProductQuantizer.train(vectors, self.pq_subvectors, self.pq_clusters)
+            vectors = self.pq.encode(vectors)
+            metadata['compression_steps'].append(f'pq_{self.pq.subvectors}x{self.pq.clusters}')
+            metadata['pq'] = {
+                'subvectors': self.pq.subvectors,
+                'clusters': self.pq.clusters,
+                'sub_dim': self.pq.sub_dim,
+                'rerank_precision': self.pq_rerank_precision,
+            }
         
         # Step 1: Precision reduction
-        if self.precision != str(vectors.dtype):
-            vectors = self._reduce_precision(vectors)
+        elif self.precision != str(vectors.dtype):
+            vectors = self._reduce_precision(vectors, metadata)
             metadata['compression_steps'].append(f'precision_{self.precision}')
         
         # Step 2: Quantization (if enabled and not already int8)
-        if self.use_quantization and self.precision != 'int8':
-            vectors = self._quantize_vectors(vectors)
+        if self.use_quantization and self.precision != 'int8' and not self.use_pq:
+            vectors = self._quantize_vectors(vectors, metadata)
             metadata['compression_steps'].append(f'quantization_{self.quantization_bits}bit')
         
         # Convert to bytes
@@ -71,11 +444,11 @@ class VectorCompressor:
         
         # Step 3: Lossless compression
         if self.use_lz4:
-            vector_bytes = lz4.frame.compress(vector_bytes)
-            metadata['compression_steps'].append('lz4')
+            row_bytes = vectors.shape[1] * vectors.itemsize if vectors.ndim == 2 else vectors.itemsize
+            vector_bytes = BlockCompressedBlob.encode(vector_bytes, row_bytes, self.lz4_block_bytes)
+            metadata['compression_steps'].append('lz4_blocks')
         
         # Calculate compression ratio
-        original_size = vectors.size * vectors.itemsize
         compression_ratio = len(vector_bytes) / original_size
         metadata['compression_ratio'] = compression_ratio
         metadata['compressed_size'] = len(vector_bytes)
@@ -97,27 +470,60 @@ class VectorCompressor:
             Decompressed numpy array (float32)
         """
         # Step 1: Decompress if LZ4 was used
-        if 'lz4' in metadata['compression_steps']:
-            compressed_bytes = lz4.frame.decompress(compressed_bytes)
+        return self.decode_rows(self.decompress_raw(compressed_bytes, metadata), metadata)
+    
+    @staticmethod
+    def decompress_raw(compressed_bytes, metadata: Dict) -> bytes:
+        """Undo the lossless LZ4 step (whole-frame or block format), if any"""
+        steps = metadata['compression_steps']
+        if 'lz4_blocks' in steps:
+            return BlockCompressedBlob(compressed_bytes).read_all()
+        if 'lz4' in steps:
+            return lz4.frame.decompress(compressed_bytes)
+        return compressed_bytes
+    
+    def decode_rows(self, raw, metadata: Dict) -> np.ndarray:
+        """
+        Turn uncompressed blob rows (all of them or a subset) into float32 vectors
         
+        Args:
+            raw: Row-major bytes/uint8 array after the LZ4 step was undone
+            metadata: Compression metadata
+        """
         # Step 2: Convert bytes back to numpy array
-        original_shape = metadata['original_shape']
+        dimension = metadata['original_shape'][1]
+        
+        steps = metadata['compression_steps']
+        
+        # PQ codes: reconstruct from the codebooks
+        if any(step.startswith('pq_') for step in steps):
+            if self.pq is None:
+                raise ValueError("PQ codebooks not loaded; cannot decode PQ vectors")
+            codes = np.frombuffer(raw, dtype=np.uint8)
+            return self.pq.decode(codes.reshape(-1, self.pq.subvectors))
         
         # Determine the dtype after compression
-        if 'precision_float16' in metadata['compression_steps']:
+        quantized = any(step.startswith('quantization_') for step in steps)
+        if quantized:
+            dtype = np.uint8
+        elif 'precision_float16' in steps:
             dtype = np.float16
-        elif 'precision_int8' in metadata['compression_steps'] or 'quantization' in str(metadata['compression_steps']):
+        elif 'precision_int8' in steps:
             dtype = np.int8
         else:
             dtype = np.float32
         
         # Create array from bytes
-        vectors = np.frombuffer(compressed_bytes, dtype=dtype)
-        vectors = vectors.reshape(original_shape)
+        vectors = np.frombuffer(raw, dtype=dtype)
+        vectors = vectors.reshape(-1, dimension)
         
         # Step 3: Reverse quantization if needed
-        if 'quantization' in str(metadata['compression_steps']):
+        if quantized:
             vectors = self._dequantize_vectors(vectors, metadata)
+        elif dtype == np.int8:
+            int8 = metadata['int8']
+            vectors = vectors.astype(np.float32) * np.asarray(int8['scale'], dtype=np.float32) \
+                + np.asarray(int8['offset'], dtype=np.float32)
         
         # Step 4: Convert back to float32
         if dtype != np.float32:
@@ -125,12 +531,13 @@ class VectorCompressor:
         
         return vectors
     
-    def _reduce_precision(self, vectors: np.ndarray) -> np.ndarray:
+    def _reduce_precision(self, vectors: np.ndarray, metadata: Dict) -> np.ndarray:
         """
         Reduce precision from float32 to float16 or int8
         
         Args:
             vectors: float32 numpy array
+            metadata: Compression metadata; int8 stores its per-dimension scale/offset here
             
         Returns:
             Reduced precision array
@@ -138,46 +545,37 @@ class VectorCompressor:
         if self.precision == 'float16':
             return vectors.astype(np.float16)
         elif self.precision == 'int8':
-            # Normalize to -128 to 127 range
-            min_val, max_val = vectors.min(), vectors.max()
-            if max_val > min_val:
-                normalized = (vectors - min_val) / (max_val - min_val) * 255 - 128
-                return normalized.astype(np.int8)
-            else:
-                return np.zeros_like(vectors, dtype=np.int8)
+            codes, scale, offset = Int8Scorer.quantize(vectors)
+            metadata['int8'] = {'scale': scale.tolist(), 'offset': offset.tolist()}
+            return codes
         else:
             return vectors
     
-    def _quantize_vectors(self, vectors: np.ndarray) -> np.ndarray:
+    def _quantize_vectors(self, vectors: np.ndarray, metadata: Dict) -> np.ndarray:
         """
-        Apply quantization to reduce precision further
+        Scalar-quantize vectors to uint8 level ids
         
         Args:
-            vectors: numpy array
+            vectors: Floating point numpy array
+            metadata: Compression metadata; receives the min/scale needed to invert
             
         Returns:
-            Quantized array
+            uint8 array of level ids (2 ** quantization_bits levels)
         """
-        if self.quantization_bits >= 8:
-            return vectors
+        levels = 2 ** min(max(self.quantization_bits, 1), 8)
+        vectors = vectors.astype(np.float32)
         
-        # Scalar quantization
-        levels = 2 ** self.quantization_bits
+        min_val, max_val = float(vectors.min()), float(vectors.max())
+        scale = (max_val - min_val) / (levels - 1)
+        if scale <= 0:
+            scale = 1.0
         
-        if vectors.dtype == np.float32 or vectors.dtype == np.float16:
-            # For floating point, quantize to discrete levels
-            min_val, max_val = vectors.min(), vectors.max()
-            scale = (max_val - min_val) / (levels - 1)
-            
-            if scale > 0:
-                quantized = np.round((vectors - min_val) / scale) * scale + min_val
-                return quantized.astype(vectors.dtype)
-        
-        return vectors
+        metadata['quantization'] = {'min': min_val, 'scale': scale, 'levels': levels}
+        return np.clip(np.round((vectors - min_val) / scale), 0, levels - 1).astype(np.uint8)
     
     def _dequantize_vectors(self, vectors: np.ndarray, metadata: Dict) -> np.ndarray:
         """
-        Reverse quantization (simplified - full implementation would need quantization params)
+        Map uint8 level ids back to float32 using the stored min/scale
         
         Args:
             vectors: Quantized array
@@ -186,11 +584,65 @@ class VectorCompressor:
         Returns:
             Dequantized array
         """
-        # This is a simplified implementation
-        # In practice, you'd store quantization parameters (min, max, scale)
-        return vectors.astype(np.float32)
+        params = metadata['quantization']
+        return vectors.astype(np.float32) * params['scale'] + params['min']
     
-    def get_compression_stats(self, original_vectors: np.ndarray, compressed_bytes: bytes, metadata: Dict) -> Dict:
+    def compressed_searcher(self, compressed_bytes: bytes, metadata: Dict) -> Callable[[np.ndarray, int], np.ndarray]:
+        """
+        Decode a blob once and return search(query, top_k) -> top-k rows over it
+        
+        PQ uses ADC tables and int8 the int8 kernel; other formats are decoded
+        to float32 first.
+        """
+        steps = metadata['compression_steps']
+        raw = self.decompress_raw(compressed_bytes, metadata)
+        
+        if any(step.startswith('pq_') for step in steps):
+            codes = np.frombuffer(raw, dtype=np.uint8).reshape(-1, self.pq.subvectors)
+            return lambda query, top_k: self.pq.search(query, codes, top_k)[0]
+        if 'precision_int8' in steps:
+            int8 = metadata['int8']
+            scorer = Int8Scorer(np.frombuffer(raw, dtype=np.int8).reshape(metadata['original_shape']),
+                                int8['scale'], int8['offset'])
+            return lambda query, top_k: scorer.search(query, top_k)[0]
+        
+        vectors = self.decode_rows(raw, metadata)
+        return lambda query, top_k: np.argsort(-(vectors @ np.asarray(query, dtype=np.float32)))[:top_k]
+    
+    def search_compressed(self, compressed_bytes: bytes, metadata: Dict, query: np.ndarray,
+                          top_k: int = 10) -> np.ndarray:
+        """
+        Top-k rows for a query scored directly on the compressed representation
+        
+        Decodes the blob on every call; use compressed_searcher() for many queries.
+        """
+        return self.compressed_searcher(compressed_bytes, metadata)(query, top_k)
+    
+    def recall_report(self, original_vectors: np.ndarray, compressed_bytes: bytes, metadata: Dict,
+                      queries: np.ndarray, k: int = 10) -> Dict:
+        """
+        Recall@k of compressed-domain search against exact float32 search
+        
+        Args:
+            original_vectors: float32 vectors the blob was built from
+            compressed_bytes: Output of compress_vectors
+            metadata: Compression metadata
+            queries: (n_queries, dimension) query vectors
+            k: Cut-off
+            
+        Returns:
+            {'k', 'queries', 'recall_at_k'}
+        """
+        original_vectors = np.asarray(original_vectors, dtype=np.float32)
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, original_vectors.shape[1])
+        
+        exact = np.argsort(-(queries @ original_vectors.T), axis=1)[:, :k]
+        search = self.compressed_searcher(compressed_bytes, metadata)
+        approx = [search(q, k) for q in queries]
+        return {'k': k, 'queries': len(queries), 'recall_at_k': recall_at_k(exact, approx)}
+    
+    def get_compression_stats(self, original_vectors: np.ndarray, compressed_bytes: bytes, metadata: Dict,
+                              queries: Optional[np.ndarray] = None, k: int = 10) -> Dict:
         """
         Get detailed compression statistics
         
@@ -198,6 +650,8 @@ class VectorCompressor:
             original_vectors: Original uncompressed vectors
             compressed_bytes: Compressed bytes
             metadata: Compression metadata
+            queries: Optional query vectors; adds a recall@k report vs float32
+            k: Cut-off for the recall report
             
         Returns:
             Statistics dictionary
@@ -214,7 +668,7 @@ class VectorCompressor:
         else:
             mse = rmse = float('inf')
         
-        return {
+        stats = {
             'original_size_bytes': original_size,
             'compressed_size_bytes': compressed_size,
             'compression_ratio': compressed_size / original_size,
@@ -222,4 +676,7 @@ class VectorCompressor:
             'rmse': rmse,
             'techniques_used': metadata['compression_steps'],
             'precision': self.precision
-        }
\ No newline at end of file
+        }
+        if queries is not None:
+            stats['recall'] = self.recall_report(original_vectors, compressed_bytes, metadata, queries, k)
+        return stats
\ No newline at end of file
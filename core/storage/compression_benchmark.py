@@ -0,0 +1,240 @@
+"""
+Compression Benchmark for MCP v6
+Runs every VectorCompressor configuration over one embedding matrix and
+reports size, throughput, load time, recall@k vs float32 and query latency
+
+Usage (from core/):
+    python -m storage.compression_benchmark --synthetic 20000 --dim 384
+    python -m storage.compression_benchmark --vectors embeddings.npy --output report.json
+    python -m storage.compression_benchmark --snapshot context_vectors_v6.mp4
+
+Snapshots are written to (and read from) ./data like every MP4Storage;
+benchmark files are named bench_<config>.mp4 and removed afterwards.
+"""
+
+import json
+import time
+import argparse
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .mp4_storage import VirtualChunk
+from .compressed_storage import VectorCompressor, recall_at_k
+from .compressed_mp4_storage import CompressedMP4Storage
+
+logger = logging.getLogger(__name__)
+
+# (name, VectorCompressor config, search options)
+DEFAULT_CONFIGS: List[Tuple[str, Dict, Dict]] = [
+    ('float32', {'precision': 'float32', 'use_lz4': False}, {}),
+    ('float32_+_lz4', {'precision': 'float32', 'use_lz4': True}, {}),
+    ('float16', {'precision': 'float16', 'use_lz4': False}, {}),
+    ('float16_+_lz4', {'precision': 'float16', 'use_lz4': True}, {}),
+    ('int8', {'precision': 'int8', 'use_lz4': False}, {}),
+    ('int8_+_lz4', {'precision': 'int8', 'use_lz4': True}, {}),
+    ('sq8', {'precision': 'float16', 'use_quantization': True, 'quantization_bits': 8, 'use_lz4': False}, {}),
+    ('sq4_+_lz4', {'precision': 'float16', 'use_quantization': True, 'quantization_bits': 4, 'use_lz4': True}, {}),
+    ('pq48', {'use_pq': True, 'pq_subvectors': 48, 'use_lz4': False}, {}),
+    ('pq96', {'use_pq': True, 'pq_subvectors': 96, 'use_lz4': False}, {}),
+    ('pq48_+_rerank', {'use_pq': True, 'pq_subvectors': 48, 'use_lz4': False,
+                       'pq_rerank_precision': 'float16'}, {'rerank_k': 100}),
+]
+
+
+def synthetic_embeddings(count: int, dimension: int, clusters: int = 64, seed: int = 42) -> np.ndarray:
+    """Clustered, L2-normalized vectors that roughly behave like sentence embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension))
+    vectors = centers[rng.integers(0, clusters, count)] + 0.6 * rng.normal(size=(count, dimension))
+    vectors = vectors.astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def load_embeddings(args) -> np.ndarray:
+    """Embedding matrix from .npy, an existing snapshot, or the synthetic generator"""
+    if args.vectors:
+        return np.load(args.vectors).astype(np.float32)
+    if args.snapshot:
+        storage = CompressedMP4Storage(args.snapshot)
+        if not storage.load_compressed_snapshot():
+            raise SystemExit(f"Cannot load snapshot {args.snapshot}")
+        vectors = storage.get_vectors()
+        if vectors is None or len(vectors) == 0:
+            raise SystemExit(f"Snapshot {args.snapshot} has no readable vectors")
+        vectors = np.array(vectors, dtype=np.float32)
+        storage.close()
+        return vectors
+    return synthetic_embeddings(args.synthetic, args.dim, seed=args.seed)
+
+
+def make_queries(vectors: np.ndarray, count: int, noise: float = 0.1, seed: int = 7) -> np.ndarray:
+    """Perturbed corpus vectors used as queries"""
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.integers(0, len(vectors), count)]
+    queries = queries + noise * rng.normal(size=queries.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def _search_fn(storage: CompressedMP4Storage, options: Dict):
+    """Pick the search path a deployment of this codec would use"""
+    if storage.pq is not None:
+        return lambda q, k: storage.search_pq(q, k, rerank_k=options.get('rerank_k', 0))[0]
+    if storage._int8_scorer is not None:
+        return lambda q, k: storage.search_int8(q, k)[0]
+
+    # Float formats: brute force over the decoded matrix
+    vectors = storage.get_vectors()
+    chunk_ids = [chunk.chunk_id for chunk in storage.chunks]
+
+    def search(q, k):
+        scores = vectors @ q
+        rows = np.argpartition(-scores, k - 1)[:k]
+        return [chunk_ids[row] for row in rows[np.argsort(-scores[rows])]]
+    return search
+
+
+def benchmark_config(name: str, config: Dict, options: Dict, vectors: np.ndarray,
+                     queries: np.ndarray, exact: np.ndarray, k: int = 10) -> Dict:
+    """
+    Measure one compressor configuration end to end
+
+    Returns:
+        Result row for the report
+    """
+    chunks = [VirtualChunk(chunk_id=str(i), file_path='', start_line=0, end_line=0,
+                           vector_offset=0, vector_size=0) for i in range(len(vectors))]
+    vector_mb = vectors.nbytes / (1024 * 1024)
+
+    compressor = VectorCompressor(config)
+    start = time.perf_counter()
+    blob, metadata = compressor.compress_vectors(vectors)
+    encode_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compressor.decompress_vectors(blob, metadata)
+    decode_s = time.perf_counter() - start
+
+    filename = f"bench_{name}.mp4"
+    writer = CompressedMP4Storage(filename, config)
+    writer.create_compressed_snapshot(chunks, vectors, b'', {})
+    writer.close()
+    path = writer.mp4_path
+    file_size = path.stat().st_size
+
+    start = time.perf_counter()
+    storage = CompressedMP4Storage(filename, config)
+    storage.load_compressed_snapshot()
+    load_s = time.perf_counter() - start
+
+    search = _search_fn(storage, options)
+    latencies = []
+    approx = []
+    for query in queries:
+        start = time.perf_counter()
+        ids = search(query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        approx.append(np.array([int(i) for i in ids]))
+    storage.close()
+    path.unlink()
+
+    return {
+        'config': name,
+        'settings': {**config, **options},
+        'vectors': len(vectors),
+        'blob_bytes': len(blob),
+        'file_bytes': file_size,
+        'ratio_vs_float32': round(len(blob) / vectors.nbytes, 4),
+        'encode_mb_s': round(vector_mb / encode_s, 2) if encode_s else None,
+        'decode_mb_s': round(vector_mb / decode_s, 2) if decode_s else None,
+        'load_ms': round(load_s * 1000, 2),
+        f'recall_at_{k}': round(recall_at_k(exact, approx), 4),
+        'query_p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'query_p95_ms': round(float(np.percentile(latencies, 95)), 3),
+    }
+
+
+def run_benchmark(vectors: np.ndarray, num_queries: int = 200, k: int = 10,
+                  configs: Optional[List[str]] = None) -> Dict:
+    """
+    Benchmark the selected (default: all) configurations
+
+    Args:
+        vectors: float32 embedding matrix
+        num_queries: Number of perturbed corpus vectors used as queries
+        k: Recall cut-off
+        configs: Optional subset of DEFAULT_CONFIGS names
+
+    Returns:
+        Report with the dataset description and one result per configuration
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    queries = make_queries(vectors, num_queries)
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :k]
+
+    selected = [c for c in DEFAULT_CONFIGS if not configs or c[0] in configs]
+    results = []
+    for name, config, options in selected:
+        if config.get('use_pq') and vectors.shape[1] % config['pq_subvectors']:
+            logger.warning(f"Skipping {name}: dimension {vectors.shape[1]} not divisible "
+                           f"by {config['pq_subvectors']}")
+            continue
+        logger.info(f"Benchmarking {name}")
+        results.append(benchmark_config(name, config, options, vectors, queries, exact, k))
+
+    return {
+        'dataset': {'vectors': len(vectors), 'dimension': vectors.shape[1],
+                    'float32_bytes': vectors.nbytes, 'queries': num_queries, 'k': k},
+        'results': results,
+    }
+
+
+def format_table(report: Dict) -> str:
+    """Fixed-width summary table of a report"""
+    k = report['dataset']['k']
+    columns = [('config', 'config', 16), ('ratio', 'ratio_vs_float32', 7), ('file KB', 'file_bytes', 10),
+               ('enc MB/s', 'encode_mb_s', 9), ('dec MB/s', 'decode_mb_s', 9), ('load ms', 'load_ms', 9),
+               (f'recall@{k}', f'recall_at_{k}', 9), ('p50 ms', 'query_p50_ms', 8), ('p95 ms', 'query_p95_ms', 8)]
+
+    lines = [' '.join(title.rjust(width) if i else title.ljust(width)
+                      for i, (title, _, width) in enumerate(columns))]
+    for row in report['results']:
+        cells = []
+        for i, (_, key, width) in enumerate(columns):
+            value = row[key]
+            if key == 'file_bytes':
+                value = f"{value / 1024:.0f}"
+            cells.append(str(value).rjust(width) if i else str(value).ljust(width))
+        lines.append(' '.join(cells))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vector compression codecs for MP4 snapshots")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--vectors", help="Embedding matrix (.npy, shape n x dim)")
+    source.add_argument("--snapshot", help="Existing MP4 snapshot in data/ to take vectors from")
+    source.add_argument("--synthetic", type=int, default=10000, help="Synthetic corpus size (default)")
+    parser.add_argument("--dim", type=int, default=384, help="Synthetic vector dimension")
+    parser.add_argument("--seed", type=int, default=42, help="Synthetic data seed")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("--k", type=int, default=10, help="Recall cut-off")
+    parser.add_argument("--configs", nargs='*', help="Subset of configurations: "
+                        + ', '.join(name for name, _, _ in DEFAULT_CONFIGS))
+    parser.add_argument("--output", help="Write the JSON report here")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    vectors = load_embeddings(args)
+    report = run_benchmark(vectors, args.queries, args.k, args.configs)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    print(format_table(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Embedding Micro-Batcher for MCP v6
+Coalesces concurrent small embedding requests into one model call
+"""
+
+import time
+import queue
+import threading
+import logging
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class _Request:
+    """Texts of one caller and the future its vectors are delivered to"""
+    __slots__ = ('texts', 'future')
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future: Future = Future()
+
+
+class EmbeddingBatcher:
+    """
+    Collects embedding requests for up to max_wait_ms (or max_batch_size
+    texts) and runs a single encode for all of them
+
+    The worker starts as soon as a request arrives. Everything already
+    queued is drained without waiting, so under load requests pile up while
+    the model is busy and are encoded together. A lone request waits at
+    most max_wait_ms.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray],
+                 max_wait_ms: float = 2.0, max_batch_size: int = 32):
+        """
+        Args:
+            encode_fn: Encodes a list of texts into a (n, dim) array
+            max_wait_ms: Extra time the worker waits to fill a batch
+            max_batch_size: Maximum texts per model call
+        """
+        self.encode_fn = encode_fn
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max_batch_size
+
+        self._queue: 'queue.Queue[Optional[_Request]]' = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.stats = {'requests': 0, 'batches': 0, 'texts': 0, 'max_batch': 0}
+
+    def start(self):
+        """Start the worker thread (idempotent)"""
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._thread.start()
+            logger.info(f"Embedding batcher started (wait={self.max_wait * 1000:.1f}ms, "
+                        f"batch={self.max_batch_size})")
+
+    def stop(self):
+        """Stop the worker after the requests already queued"""
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def submit(self, texts: List[str]) -> Future:
+        """Queue texts; the future resolves to their (n, dim) embeddings"""
+        if not self._thread or not self._thread.is_alive():
+            self.start()
+        request = _Request(list(texts))
+        self._queue.put(request)
+        return request.future
+
+    def encode(self, texts: List[str], timeout: Optional[float] = None) -> np.ndarray:
+        """Blocking helper: submit and wait for the result"""
+        return self.submit(texts).result(timeout)
+
+    def _collect(self, first: _Request) -> List[_Request]:
+        """Gather more requests behind first until the batch is full or the window closes"""
+        batch = [first]
+        count = len(first.texts)
+        deadline = time.monotonic() + self.max_wait
+        while count < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                request = self._queue.get_nowait() if remaining <= 0 else self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                # Stop marker: finish this batch, then exit
+                self._queue.put(None)
+                break
+            batch.append(request)
+            count += len(request.texts)
+        return batch
+
+    def _run(self):
+        """Worker loop"""
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            self._run_batch(self._collect(first))
+
+    def _run_batch(self, batch: List[_Request]):
+        """One model call for every request in the batch"""
+        texts = [text for request in batch for text in request.texts]
+        try:
+            vectors = self.encode_fn(texts)
+        except Exception as e:
+            logger.error(f"Batched embedding failed: {e}")
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        start = 0
+        for request in batch:
+            end = start + len(request.texts)
+            request.future.set_result(vectors[start:end])
+            start = end
+
+        self.stats['requests'] += len(batch)
+        self.stats['batches'] += 1
+        self.stats['texts'] += len(texts)
+        self.stats['max_batch'] = max(self.stats['max_batch'], len(texts))
+
+    def get_stats(self) -> Dict:
+        """Batching statistics"""
+        batches = self.stats['batches']
+        return {
+            **self.stats,
+            'avg_batch': round(self.stats['texts'] / batches, 2) if batches else 0.0,
+            'queued': self._queue.qsize(),
+            'max_wait_ms': self.max_wait * 1000,
+            'max_batch_size': self.max_batch_size,
+        }
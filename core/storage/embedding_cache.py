@@ -0,0 +1,168 @@
+"""
+Embedding Cache for MCP v6
+Content-hash keyed embeddings: in-memory LRU in front of a persistent SQLite tier
+"""
+
+import sqlite3
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def text_hash(text: str) -> str:
+    """SHA-256 of the text, the content part of every cache key"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by (model name, normalize flag, text hash)
+
+    - Memory tier: bounded LRU of float32 vectors
+    - Disk tier: optional SQLite table that survives restarts
+    - Vectors are stored exactly as the model produced them after
+      normalization, so a hit is indistinguishable from a fresh encode
+    """
+
+    def __init__(self, memory_items: int = 10000, disk_path: Optional[str] = None):
+        """
+        Args:
+            memory_items: Maximum vectors kept in the in-memory LRU (0 disables it)
+            disk_path: SQLite file for the persistent tier (None disables it)
+        """
+        self.memory_items = memory_items
+        self.disk_path = Path(disk_path) if disk_path else None
+
+        self._memory: 'OrderedDict[Tuple[str, bool, str], np.ndarray]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if self.disk_path:
+            self._open_disk()
+
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'writes': 0}
+
+    def _open_disk(self):
+        """Open (or create) the SQLite store"""
+        try:
+            self.disk_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.disk_path), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL, normalize INTEGER NOT NULL, text_hash TEXT NOT NULL,"
+                " dim INTEGER NOT NULL, vector BLOB NOT NULL,"
+                " PRIMARY KEY (model, normalize, text_hash))"
+            )
+            self._db.commit()
+            logger.info(f"Embedding disk cache at {self.disk_path}")
+        except sqlite3.Error as e:
+            logger.error(f"Embedding disk cache unavailable ({self.disk_path}): {e}")
+            self._db = None
+
+    def _remember(self, key: Tuple[str, bool, str], vector: np.ndarray):
+        """Insert into the memory LRU (caller holds the lock)"""
+        if self.memory_items <= 0:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, model: str, normalize: bool, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look texts up in memory, then on disk
+
+        Returns:
+            float32 vectors aligned with texts (None for misses)
+        """
+        keys = [(model, bool(normalize), text_hash(text)) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+        pending: Dict[str, List[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vector
+                    self.stats['memory_hits'] += 1
+                else:
+                    pending.setdefault(key[2], []).append(i)
+
+            if pending and self._db is not None:
+                hashes = list(pending)
+                # Stay under SQLite's bound-parameter limit
+                for start in range(0, len(hashes), 500):
+                    batch = hashes[start:start + 500]
+                    rows = self._db.execute(
+                        f"SELECT text_hash, dim, vector FROM embeddings WHERE model = ? AND normalize = ?"
+                        f" AND text_hash IN ({','.join('?' * len(batch))})",
+                        [model, int(bool(normalize)), *batch]
+                    ).fetchall()
+                    for digest, dim, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32, count=dim)
+                        self._remember((model, bool(normalize), digest), vector)
+                        for i in pending.pop(digest):
+                            results[i] = vector
+                            self.stats['disk_hits'] += 1
+
+            self.stats['misses'] += sum(len(indices) for indices in pending.values())
+        return results
+
+    def put_many(self, model: str, normalize: bool, texts: Sequence[str], vectors: np.ndarray):
+        """Store freshly computed vectors in both tiers"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = (model, bool(normalize), text_hash(text))
+                vector = vector.copy()
+                self._remember(key, vector)
+                rows.append((model, int(bool(normalize)), key[2], len(vector), vector.tobytes()))
+
+            if self._db is not None and rows:
+                try:
+                    self._db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.error(f"Error writing embedding disk cache: {e}")
+            self.stats['writes'] += len(rows)
+
+    def clear(self, disk: bool = False):
+        """Empty the memory tier (and optionally the disk tier)"""
+        with self._lock:
+            self._memory.clear()
+            if disk and self._db is not None:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+
+    def close(self):
+        """Close the SQLite connection"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def get_stats(self) -> Dict:
+        """Hit/miss counters and tier sizes"""
+        with self._lock:
+            lookups = self.stats['memory_hits'] + self.stats['disk_hits'] + self.stats['misses']
+            hits = self.stats['memory_hits'] + self.stats['disk_hits']
+            disk_items = None
+            if self._db is not None:
+                disk_items = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return {
+                **self.stats,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+                'memory_items': len(self._memory),
+                'disk_items': disk_items,
+                'disk_path': str(self.disk_path) if self.disk_path else None,
+            }
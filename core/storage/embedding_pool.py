@@ -0,0 +1,410 @@
+"""
+Embedding Worker Pool for MCP v6
+Runs the embedding model in N worker processes so encoding does not share
+the GIL with the MCP server's request handling
+
+Texts go to the workers over multiprocessing queues; embeddings come back
+through multiprocessing.shared_memory blocks allocated by the parent, so the
+(n, dim) float32 arrays are never pickled.
+
+Interactive (query) jobs are always dispatched first, and bulk (indexing)
+jobs may occupy at most workers - reserved_interactive workers, so a corpus
+build cannot starve queries.
+"""
+
+import itertools
+import logging
+import multiprocessing as mp
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing import resource_tracker, shared_memory
+from typing import Deque, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Python 3.13+ attaches to a block without registering it with the resource tracker.
+# Before that, POSIX workers unregister it after attaching and the parent registers it
+# again before unlink(); on Windows the OS frees the block with its last handle.
+_UNTRACKED_ATTACH = sys.version_info >= (3, 13)
+_RETRACK_BEFORE_UNLINK = os.name == 'posix' and not _UNTRACKED_ATTACH
+
+
+def _tracker_name(shm: shared_memory.SharedMemory) -> str:
+    """Name the POSIX resource tracker keys the block by (shm.name plus the leading slash)"""
+    return f"/{shm.name}"
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to a block the parent owns, keeping it out of this process's resource tracking"""
+    if _UNTRACKED_ATTACH:
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    if _RETRACK_BEFORE_UNLINK:
+        # Otherwise the tracker warns about (or unlinks) a block the parent still owns
+        resource_tracker.unregister(_tracker_name(shm), 'shared_memory')
+    return shm
+
+
+def _worker_main(worker_id: int, model_name: str, backend: str, device: str,
+                 torch_threads: int, inbox, results):
+    """
+    Worker process: load the model once, then encode jobs until None arrives
+
+    Messages sent on results:
+        ('ready', worker_id, dimension) | ('failed', worker_id, error)
+        ('done', worker_id, job_id, None) | ('done', worker_id, job_id, error)
+    """
+    try:
+        if torch_threads > 0:
+            try:
+                import torch
+                torch.set_num_threads(torch_threads)
+            except ImportError:
+                pass
+        from .inference_backends import load_model
+        model = load_model(model_name, backend, device)
+        dimension = int(model.get_sentence_embedding_dimension())
+    except Exception as e:
+        results.put(('failed', worker_id, f"{type(e).__name__}: {e}"))
+        return
+    results.put(('ready', worker_id, dimension))
+
+    while True:
+        job = inbox.get()
+        if job is None:
+            break
+        job_id, texts, batch_size, shm_name = job
+        try:
+            vectors = np.asarray(model.encode(texts, batch_size=batch_size, convert_to_numpy=True,
+                                              show_progress_bar=False), dtype=np.float32)
+            shm = _attach(shm_name)
+            try:
+                # The parent created the block and unlinks it once the result is copied out
+                np.ndarray(vectors.shape, dtype=np.float32, buffer=shm.buf)[:] = vectors
+            finally:
+                shm.close()
+            results.put(('done', worker_id, job_id, None))
+        except Exception as e:
+            results.put(('done', worker_id, job_id, f"{type(e).__name__}: {e}"))
+
+
+class _Job:
+    """Texts of one pool request, its shared-memory output and the future to resolve"""
+    __slots__ = ('job_id', 'texts', 'bulk', 'future', 'shm', 'queued_at')
+
+    def __init__(self, job_id: int, texts: List[str], bulk: bool):
+        self.job_id = job_id
+        self.texts = texts
+        self.bulk = bulk
+        self.future: Future = Future()
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        self.queued_at = time.time()
+
+
+class EmbeddingPool:
+    """
+    N worker processes, each holding its own copy of the embedding model
+
+    encode() is thread-safe and blocks until the vectors are back. Bulk
+    requests are split into bulk_chunk-text jobs (length-sorted, so batches
+    pad to similar lengths) that can run on several workers in parallel.
+    """
+
+    def __init__(self, model_name: str, backend: str = 'torch', device: str = 'cpu',
+                 workers: int = 2, reserved_interactive: int = 1, batch_size: int = 32,
+                 bulk_chunk: int = 256, torch_threads: int = 0, start_method: str = 'spawn'):
+        """
+        Args:
+            model_name: Model loaded by every worker
+            backend: Inference backend (see inference_backends.py)
+            device: Torch device for the workers
+            workers: Number of worker processes
+            reserved_interactive: Workers bulk jobs may never occupy (capped at workers - 1)
+            batch_size: Model batch size inside a worker
+            bulk_chunk: Texts per bulk job
+            torch_threads: torch.set_num_threads in each worker (0 = library default)
+            start_method: multiprocessing start method ('spawn' is safe with torch)
+        """
+        self.model_name = model_name
+        self.backend = backend
+        self.device = device
+        self.num_workers = max(1, int(workers))
+        self.bulk_limit = self.num_workers - min(max(0, reserved_interactive), self.num_workers - 1)
+        self.batch_size = batch_size
+        self.bulk_chunk = max(1, int(bulk_chunk))
+        self.torch_threads = torch_threads
+        self.start_method = start_method
+
+        self.dimension: Optional[int] = None
+        self.error: Optional[str] = None
+        self._ctx = mp.get_context(start_method)
+        self._processes: List = []
+        self._inboxes: List = []
+        self._results = None
+        self._idle: Deque[int] = deque()
+        self._running: Dict[int, _Job] = {}   # worker_id -> job
+        self._interactive: Deque[_Job] = deque()
+        self._bulk: Deque[_Job] = deque()
+        self._cond = threading.Condition()
+        self._ids = itertools.count()
+        self._ready_workers = 0
+        self._ready = threading.Event()
+        self._closed = False
+        self._threads: List[threading.Thread] = []
+        self.stats = {'jobs': 0, 'interactive_jobs': 0, 'bulk_jobs': 0, 'texts': 0,
+                      'queue_wait_ms_total': 0.0, 'worker_failures': 0}
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Spawn the workers (they load the model in parallel); idempotent"""
+        with self._cond:
+            if self._processes or self._closed:
+                return
+            self._results = self._ctx.Queue()
+            for worker_id in range(self.num_workers):
+                inbox = self._ctx.Queue()
+                process = self._ctx.Process(
+                    target=_worker_main, name=f"embedding-worker-{worker_id}", daemon=True,
+                    args=(worker_id, self.model_name, self.backend, self.device,
+                          self.torch_threads, inbox, self._results))
+                process.start()
+                self._inboxes.append(inbox)
+                self._processes.append(process)
+
+        for target, name in ((self._collect, 'embedding-pool-collector'),
+                             (self._dispatch, 'embedding-pool-dispatcher')):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Embedding pool started: {self.num_workers} workers "
+                    f"(bulk may use {self.bulk_limit}), model={self.model_name}")
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until at least one worker has loaded the model (or all failed)"""
+        self._ready.wait(timeout)
+        return self.ready
+
+    @property
+    def ready(self) -> bool:
+        """True while at least one worker can take jobs"""
+        return self._ready_workers > 0 and not self._closed
+
+    def close(self):
+        """Stop the workers and fail anything still queued"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            pending = list(self._interactive) + list(self._bulk) + list(self._running.values())
+            self._interactive.clear()
+            self._bulk.clear()
+            self._running.clear()
+            self._cond.notify_all()
+        for job in pending:
+            self._finish(job, error="Embedding pool closed")
+        for inbox in self._inboxes:
+            try:
+                inbox.put(None)
+            except Exception:
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._ready.set()
+        logger.info("Embedding pool closed")
+
+    # ------------------------------------------------------------------
+    # Encoding
+    # ------------------------------------------------------------------
+
+    def encode(self, texts: List[str], bulk: bool = False, timeout: Optional[float] = None) -> np.ndarray:
+        """
+        Embed texts in the worker processes
+
+        Args:
+            texts: Texts to embed
+            bulk: Indexing work (lower priority, split across workers)
+            timeout: Seconds to wait for the result
+
+        Returns:
+            (n, dim) float32 embeddings in input order (not normalized)
+        """
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.dimension or 0), dtype=np.float32)
+        if not bulk or len(texts) <= self.bulk_chunk:
+            return self.submit([texts], bulk)[0].result(timeout)
+
+        # Length-sorted chunks pad to similar lengths inside each worker
+        order = np.argsort([len(text) for text in texts], kind='stable')
+        chunks = [order[start:start + self.bulk_chunk] for start in range(0, len(texts), self.bulk_chunk)]
+        futures = self.submit([[texts[i] for i in rows] for rows in chunks], bulk=True)
+        embeddings = None
+        for rows, future in zip(chunks, futures):
+            vectors = future.result(timeout)
+            if embeddings is None:
+                embeddings = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            embeddings[rows] = vectors
+        return embeddings
+
+    def submit(self, batches: List[List[str]], bulk: bool = False) -> List[Future]:
+        """Queue one job per batch; each future resolves to that batch's (n, dim) array"""
+        jobs = [_Job(next(self._ids), list(texts), bulk) for texts in batches]
+        with self._cond:
+            if self._closed or (self.error and not self.ready):
+                raise RuntimeError(f"Embedding pool unavailable: {self.error or 'closed'}")
+            (self._bulk if bulk else self._interactive).extend(jobs)
+            self._cond.notify_all()
+        return [job.future for job in jobs]
+
+    def _dispatch(self):
+        """Hand queued jobs to idle workers: interactive first, bulk up to bulk_limit"""
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        return
+                    job = None
+                    if self._idle and self._interactive:
+                        job = self._interactive.popleft()
+                    elif self._idle and self._bulk and self._busy_bulk() < self.bulk_limit:
+                        job = self._bulk.popleft()
+                    if job is not None:
+                        break
+                    self._cond.wait()
+                worker_id = self._idle.popleft()
+                self._running[worker_id] = job
+
+            try:
+                job.shm = shared_memory.SharedMemory(create=True, size=max(1, len(job.texts) * self.dimension * 4))
+                self._inboxes[worker_id].put((job.job_id, job.texts, self.batch_size, job.shm.name))
+            except Exception as e:
+                with self._cond:
+                    self._running.pop(worker_id, None)
+                    self._idle.append(worker_id)
+                self._finish(job, error=f"dispatch failed: {e}")
+                continue
+
+            wait_ms = (time.time() - job.queued_at) * 1000
+            self.stats['jobs'] += 1
+            self.stats['bulk_jobs' if job.bulk else 'interactive_jobs'] += 1
+            self.stats['texts'] += len(job.texts)
+            self.stats['queue_wait_ms_total'] += wait_ms
+
+    def _busy_bulk(self) -> int:
+        return sum(1 for job in self._running.values() if job.bulk)
+
+    def _collect(self):
+        """Read worker messages, resolve futures and watch for dead workers"""
+        last_check = time.time()
+        while not self._closed:
+            if time.time() - last_check >= 1.0:
+                self._check_workers()
+                last_check = time.time()
+            try:
+                message = self._results.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+
+            kind, worker_id = message[0], message[1]
+            if kind == 'ready':
+                with self._cond:
+                    self.dimension = message[2]
+                    self._ready_workers += 1
+                    self._idle.append(worker_id)
+                    self._cond.notify_all()
+                self._ready.set()
+            elif kind == 'failed':
+                logger.error(f"Embedding worker {worker_id} failed to start: {message[2]}")
+                self.error = message[2]
+                self.stats['worker_failures'] += 1
+                self._check_all_failed()
+            elif kind == 'done':
+                job_id, error = message[2], message[3]
+                with self._cond:
+                    job = self._running.pop(worker_id, None)
+                    if not self._closed:
+                        self._idle.append(worker_id)
+                    self._cond.notify_all()
+                if job is not None and job.job_id == job_id:
+                    self._finish(job, error=error)
+
+    def _finish(self, job: _Job, error: Optional[str] = None):
+        """Copy the result out of shared memory, release it and resolve the future"""
+        vectors = None
+        if job.shm is not None:
+            if error is None:
+                vectors = np.ndarray((len(job.texts), self.dimension), dtype=np.float32, buffer=job.shm.buf).copy()
+            job.shm.close()
+            if _RETRACK_BEFORE_UNLINK:
+                # Undo a worker's unregister (the tracker may be shared) so unlink() is balanced
+                resource_tracker.register(_tracker_name(job.shm), 'shared_memory')
+            job.shm.unlink()
+            job.shm = None
+        if job.future.done():
+            return
+        if vectors is not None:
+            job.future.set_result(vectors)
+        else:
+            job.future.set_exception(RuntimeError(f"Embedding worker error: {error or 'no result'}"))
+
+    def _check_workers(self):
+        """Fail the job of any worker process that died and drop it from the pool"""
+        for worker_id, process in enumerate(self._processes):
+            if process.is_alive() or process.exitcode is None:
+                continue
+            with self._cond:
+                job = self._running.pop(worker_id, None)
+                was_ready = worker_id in self._idle or job is not None
+                if worker_id in self._idle:
+                    self._idle.remove(worker_id)
+                if was_ready:
+                    self._ready_workers -= 1
+                    self.stats['worker_failures'] += 1
+                    self.error = f"worker {worker_id} exited with code {process.exitcode}"
+                    logger.error(f"Embedding {self.error}")
+            if job is not None:
+                self._finish(job, error=self.error)
+        self._check_all_failed()
+
+    def _check_all_failed(self):
+        """Once no worker is left, fail queued jobs and release wait_ready() callers"""
+        if self._ready_workers > 0 or any(process.is_alive() for process in self._processes):
+            return
+        with self._cond:
+            pending = list(self._interactive) + list(self._bulk)
+            self._interactive.clear()
+            self._bulk.clear()
+        for job in pending:
+            self._finish(job, error=self.error or "no embedding workers left")
+        self._ready.set()
+
+    def get_stats(self) -> Dict:
+        """Worker and queue statistics"""
+        with self._cond:
+            queued = {'interactive': len(self._interactive), 'bulk': len(self._bulk)}
+            busy = {'interactive': len(self._running) - self._busy_bulk(), 'bulk': self._busy_bulk()}
+        jobs = self.stats['jobs']
+        return {
+            'workers': self.num_workers,
+            'ready_workers': self._ready_workers,
+            'bulk_limit': self.bulk_limit,
+            'queued': queued,
+            'busy': busy,
+            'error': self.error,
+            **{k: v for k, v in self.stats.items() if k != 'queue_wait_ms_total'},
+            'avg_queue_wait_ms': round(self.stats['queue_wait_ms_total'] / jobs, 2) if jobs else 0.0,
+        }
@@ -0,0 +1,467 @@
+"""
+Embedding Service for MCP v6
+One SentenceTransformer per process, shared by every component that embeds text
+"""
+
+import threading
+import logging
+import time
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from .embedding_cache import EmbeddingCache
+from .embedding_batcher import EmbeddingBatcher
+from .embedding_pool import EmbeddingPool
+from .inference_backends import PROBE_TEXTS, load_model, quantize_dynamic_int8, embedding_agreement
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+
+# Token-length bucket upper bounds for bulk encoding (capped at the model's max_seq_length)
+LENGTH_BUCKETS = (32, 64, 128, 256, 512)
+
+# Readiness states: idle -> loading -> warming -> ready (or failed)
+READINESS_STATES = ('idle', 'loading', 'warming', 'ready', 'failed')
+
+
+class EmbeddingService:
+    """
+    Owns the embedding model and the single encode entry point
+
+    - The model is loaded lazily, once, under a lock
+    - encode() is serialized: the model is never run from two threads at once
+    - Components register with attach() so get_stats() shows who shares it
+    - Repeated texts are served from the EmbeddingCache without running the model
+    - Small concurrent requests are coalesced by an EmbeddingBatcher
+    - start_warmup() loads the model and runs a first encode in the background;
+      callers can wait_ready() or check readiness() instead of paying for it
+    - With embedding.pool.enabled the model runs in an EmbeddingPool of worker
+      processes instead of this one (the fp32 backend check is not repeated there)
+    """
+
+    def __init__(self, config: Optional[Dict] = None):
+        """
+        Args:
+            config: Full config dict; only the 'embedding' section is read
+        """
+        embedding_config = (config or {}).get('embedding', {})
+        self.model_name = embedding_config.get('model', DEFAULT_MODEL)
+        self.dimension = embedding_config.get('dimension', 384)
+        self.normalize = embedding_config.get('normalize', True)
+        self.dtype = embedding_config.get('dtype', 'float16')
+        self.batch_size = embedding_config.get('batch_size', 32)
+        # Bulk encoding: padded tokens per batch, so short-text buckets get bigger batches
+        self.bucket_token_budget = embedding_config.get('bucket_token_budget', 8192)
+        self.max_bucket_batch = embedding_config.get('max_bucket_batch', 256)
+
+        # Inference backend (see inference_backends.py) and its accuracy gate vs fp32
+        self.backend = embedding_config.get('backend', 'torch')
+        self.device = embedding_config.get('device', 'cpu')
+        self.backend_check = embedding_config.get('backend_check', True)
+        self.backend_min_cosine = embedding_config.get('backend_min_cosine', 0.99)
+        self.backend_report: Optional[Dict] = None
+
+        cache_config = embedding_config.get('cache', {})
+        self.cache: Optional[EmbeddingCache] = None
+        if cache_config.get('enabled', True):
+            self.cache = EmbeddingCache(
+                memory_items=cache_config.get('memory_items', 10000),
+                disk_path=cache_config.get('disk_path')
+            )
+
+        batching_config = embedding_config.get('micro_batching', {})
+        self.batcher: Optional[EmbeddingBatcher] = None
+        if batching_config.get('enabled', True):
+            self.batcher = EmbeddingBatcher(
+                self._encode_uncached,
+                max_wait_ms=batching_config.get('max_wait_ms', 2.0),
+                max_batch_size=batching_config.get('max_batch_size', self.batch_size)
+            )
+
+        # Optional out-of-process workers (see embedding_pool.py)
+        self.pool_config = embedding_config.get('pool', {})
+        self.pool: Optional[EmbeddingPool] = None
+
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._encode_lock = threading.Lock()
+
+        warmup_config = embedding_config.get('warmup', {})
+        self.warmup_enabled = warmup_config.get('enabled', True)
+        self.state = 'idle'
+        self.state_error: Optional[str] = None
+        self.state_timings: Dict[str, float] = {}
+        self._state_since = time.time()
+        self._ready = threading.Event()
+        self._warmup_lock = threading.Lock()
+        self._warmup_thread: Optional[threading.Thread] = None
+
+        self.components: Dict[str, str] = {}
+        self.stats = {'encode_calls': 0, 'texts_encoded': 0}
+
+    @property
+    def model(self):
+        """Lazy-load the embedding model on first access (once per process)"""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    logger.info(f"Loading embedding model: {self.model_name} (backend={self.backend})")
+                    logger.info("This may take 10-30 seconds on first run...")
+                    # Also after a failed warmup: a successful retry makes the service ready again
+                    lazy = self.state in ('idle', 'failed')
+                    if lazy:
+                        self._set_state('loading')
+                    try:
+                        self._model = self._load_model()
+                    except Exception as e:
+                        if lazy:
+                            self._set_state('failed', error=str(e))
+                        raise
+                    if lazy:
+                        # Loaded on demand (no warmup thread): the first encode warms it
+                        self._set_state('ready')
+                    logger.info("Model loaded successfully!")
+        return self._model
+
+    @property
+    def cache_model_key(self) -> str:
+        """Model identity used in cache keys (non-fp32 backends produce slightly different vectors)"""
+        return self.model_name if self.backend == 'torch' else f"{self.model_name}#{self.backend}"
+
+    def _load_model(self):
+        """
+        Load the model for the configured backend
+
+        Non-reference backends are compared with fp32 on PROBE_TEXTS; if the
+        minimum cosine is below backend_min_cosine (or the backend cannot be
+        loaded) the service falls back to the fp32 torch model.
+        """
+        if self.backend == 'torch':
+            return load_model(self.model_name, 'torch', self.device)
+
+        reference_vectors = None
+        base = None
+        try:
+            if self.backend_check or self.backend == 'torch_int8':
+                base = load_model(self.model_name, 'torch', self.device)
+                if self.backend_check:
+                    reference_vectors = base.encode(PROBE_TEXTS, convert_to_numpy=True)
+
+            if self.backend == 'torch_int8':
+                model = quantize_dynamic_int8(base)
+            else:
+                base = None
+                model = load_model(self.model_name, self.backend, self.device)
+        except Exception as e:
+            logger.warning(f"Embedding backend '{self.backend}' unavailable ({e}), using torch fp32")
+            self.backend_report = {'backend': self.backend, 'status': 'unavailable', 'error': str(e)}
+            self.backend = 'torch'
+            return load_model(self.model_name, 'torch', self.device)
+
+        if reference_vectors is None:
+            self.backend_report = {'backend': self.backend, 'status': 'unchecked'}
+            return model
+
+        report = embedding_agreement(reference_vectors, model.encode(PROBE_TEXTS, convert_to_numpy=True))
+        report['backend'] = self.backend
+        if report['min_cosine'] < self.backend_min_cosine:
+            logger.warning(f"Embedding backend '{self.backend}' min cosine {report['min_cosine']} "
+                           f"< {self.backend_min_cosine}, using torch fp32")
+            report['status'] = 'rejected'
+            self.backend_report = report
+            self.backend = 'torch'
+            return load_model(self.model_name, 'torch', self.device)
+
+        report['status'] = 'accepted'
+        self.backend_report = report
+        logger.info(f"Embedding backend '{self.backend}' accepted: {report}")
+        return model
+
+    def _resolve_backend(self) -> str:
+        """
+        Run the backend gate of _load_model once without keeping the model
+        (the worker pool loads its own copies); returns the accepted backend
+        """
+        if self.backend != 'torch' and self.backend_report is None:
+            self._load_model()
+        return self.backend
+
+    @property
+    def loaded(self) -> bool:
+        """True once the model is in memory (here or in a pool worker)"""
+        return self._model is not None or (self.pool is not None and self.pool.ready)
+
+    def _get_pool(self) -> Optional[EmbeddingPool]:
+        """The worker pool if enabled and usable, started on first use"""
+        if not self.pool_config.get('enabled', False):
+            return None
+        if self.pool is None:
+            with self._load_lock:
+                if self.pool is None:
+                    # Workers load the backend directly, so the fp32 agreement gate runs here first
+                    backend = self._resolve_backend()
+                    self.pool = EmbeddingPool(
+                        self.model_name, backend=backend, device=self.device,
+                        workers=self.pool_config.get('workers', 2),
+                        reserved_interactive=self.pool_config.get('reserved_interactive', 1),
+                        batch_size=self.batch_size,
+                        bulk_chunk=self.pool_config.get('bulk_chunk', 256),
+                        torch_threads=self.pool_config.get('torch_threads', 0),
+                        start_method=self.pool_config.get('start_method', 'spawn'))
+                    self.pool.start()
+        if not self.pool.wait_ready(self.pool_config.get('ready_timeout_s', 120)):
+            return None
+        return self.pool
+
+    def close(self):
+        """Stop the micro-batcher and the worker pool"""
+        if self.batcher:
+            self.batcher.stop()
+        if self.pool:
+            self.pool.close()
+
+    def _set_state(self, state: str, error: Optional[str] = None):
+        """Move to a readiness state, recording how long the previous one lasted"""
+        now = time.time()
+        self.state_timings[f"{self.state}_s"] = round(now - self._state_since, 3)
+        self._state_since = now
+        self.state = state
+        self.state_error = error
+        if state in ('ready', 'failed'):
+            self._ready.set()
+        else:
+            self._ready.clear()
+        logger.info(f"Embedding service state: {state}" + (f" ({error})" if error else ""))
+
+    def start_warmup(self) -> bool:
+        """
+        Load the model and run a warmup encode in a background thread
+        (also retries after a failed warmup)
+
+        Returns:
+            True if a warmup thread was started; False if disabled or already
+            started/loaded
+        """
+        if not self.warmup_enabled:
+            return False
+        with self._warmup_lock:
+            if not (self.state == 'failed' or (self.state == 'idle' and self._model is None)):
+                return False
+            if self._warmup_thread is not None and self._warmup_thread.is_alive():
+                return False
+            self._set_state('loading')
+            self._warmup_thread = threading.Thread(target=self._warmup, name='embedding-warmup', daemon=True)
+        self._warmup_thread.start()
+        return True
+
+    def _warmup(self):
+        """Warmup thread body: load, then one uncached encode so kernels/allocations are primed"""
+        try:
+            if self._get_pool() is None:
+                if self.pool is not None:
+                    logger.warning(f"Embedding pool unavailable ({self.pool.error}), loading model in-process")
+                self.model
+            self._set_state('warming')
+            # Bypasses the cache and the batcher: the point is to run the model
+            self._encode_uncached(list(PROBE_TEXTS))
+            self._set_state('ready')
+        except Exception as e:
+            logger.error(f"Embedding warmup failed: {e}")
+            self._set_state('failed', error=str(e))
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until the model is ready (or warmup failed)
+
+        Args:
+            timeout: Seconds to wait; None waits indefinitely, 0 just checks
+
+        Returns:
+            True if the service is ready. Returns False immediately when idle,
+            since nothing is loading that could become ready.
+        """
+        if self.state == 'idle':
+            return False
+        self._ready.wait(timeout)
+        return self.state == 'ready'
+
+    @property
+    def ready(self) -> bool:
+        """True once the model is loaded and warmed"""
+        return self.state == 'ready'
+
+    def readiness(self) -> Dict:
+        """Current readiness state, for health checks and 'warming up' responses"""
+        return {
+            'state': self.state,
+            'ready': self.ready,
+            'error': self.state_error,
+            'state_age_s': round(time.time() - self._state_since, 3),
+            'timings': dict(self.state_timings),
+        }
+
+    def attach(self, component: str, kind: str = ''):
+        """Record that a component embeds through this service"""
+        self.components[component] = kind or component
+        logger.info(f"Embedding service attached to {component}")
+
+    def encode(self, texts: Union[str, List[str]], show_progress_bar: bool = False) -> np.ndarray:
+        """
+        Embed one text or a list of texts (thread-safe)
+
+        Args:
+            texts: A string (returns a 1-D vector) or a list (returns a 2-D array)
+            show_progress_bar: Transient progress bar for bulk encodes
+
+        Returns:
+            Embeddings, L2-normalized and cast to the configured dtype
+        """
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+
+        if self.cache and self.backend != 'torch' and self.backend_report is None:
+            # A fallback to torch on load changes cache_model_key: resolve the backend first
+            if self._get_pool() is None:
+                self.model
+
+        cached = self.cache.get_many(self.cache_model_key, self.normalize, texts) if self.cache else [None] * len(texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+
+        fresh = None
+        if missing:
+            # Each distinct missing text is encoded once
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            if self.batcher and len(unique) < self.batcher.max_batch_size and not show_progress_bar:
+                encoded = self.batcher.encode(unique)
+            else:
+                encoded = self._encode_uncached(unique, show_progress_bar)
+            if self.cache:
+                self.cache.put_many(self.cache_model_key, self.normalize, unique, encoded)
+            position = {text: row for row, text in enumerate(unique)}
+            fresh = encoded[[position[texts[i]] for i in missing]]
+
+        if not missing:
+            embeddings = np.stack(cached) if cached else np.zeros((0, self.dimension), dtype=np.float32)
+        elif len(missing) == len(texts):
+            embeddings = fresh
+        else:
+            embeddings = np.empty((len(texts), fresh.shape[1]), dtype=np.float32)
+            embeddings[missing] = fresh
+            for i, vector in enumerate(cached):
+                if vector is not None:
+                    embeddings[i] = vector
+
+        if self.dtype == 'float16':
+            embeddings = embeddings.astype(np.float16)
+
+        return embeddings[0] if single else embeddings
+
+    def _encode_uncached(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        """Run the model (in-process or in the pool) on texts and normalize the result as float32"""
+        embeddings = None
+        pool = self._get_pool()
+        if pool is not None:
+            try:
+                # Bulk (indexing) jobs yield to interactive ones inside the pool
+                embeddings = pool.encode(texts, bulk=show_progress_bar or len(texts) > self.batch_size)
+                self.stats['encode_calls'] += 1
+                self.stats['texts_encoded'] += len(texts)
+            except RuntimeError as e:
+                if pool.ready:
+                    raise
+                logger.warning(f"Embedding pool failed ({e}), encoding in-process")
+
+        if embeddings is None:
+            model = self.model
+            if len(texts) <= self.batch_size:
+                embeddings = self._run_model(model, texts, self.batch_size)
+            else:
+                embeddings = self._encode_bucketed(model, texts, show_progress_bar)
+
+        if self.normalize and embeddings.size:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.where(norms > 0, norms, 1)
+        return embeddings
+
+    def _run_model(self, model, texts: List[str], batch_size: int) -> np.ndarray:
+        """One serialized model call"""
+        with self._encode_lock:
+            embeddings = model.encode(texts, batch_size=batch_size,
+                                      convert_to_numpy=True, show_progress_bar=False)
+            self.stats['encode_calls'] += 1
+            self.stats['texts_encoded'] += len(texts)
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def _encode_bucketed(self, model, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        """
+        Bulk encode grouped by length so batches are padded to similar lengths
+
+        Texts are sorted by estimated token count (~4 chars per token) and
+        split into LENGTH_BUCKETS; each bucket uses the largest batch that
+        fits bucket_token_budget. The model lock is released between
+        batches so interactive queries are not stuck behind a corpus build.
+        Results are returned in input order.
+        """
+        max_tokens = getattr(model, 'max_seq_length', None) or LENGTH_BUCKETS[-1]
+        bounds = np.array([b for b in LENGTH_BUCKETS if b < max_tokens] + [max_tokens])
+
+        lengths = np.fromiter((len(text) // 4 + 2 for text in texts), dtype=np.int64, count=len(texts))
+        order = np.argsort(lengths, kind='stable')
+        buckets = np.minimum(np.searchsorted(bounds, lengths[order]), len(bounds) - 1)
+
+        progress = None
+        if show_progress_bar:
+            try:
+                from tqdm import tqdm
+                progress = tqdm(total=len(texts), desc="Embedding", unit="text", leave=False)
+            except ImportError:
+                pass
+
+        embeddings = None
+        for bucket in np.unique(buckets).tolist():
+            rows = order[buckets == bucket]
+            batch_size = int(max(1, min(self.max_bucket_batch, self.bucket_token_budget // bounds[bucket])))
+            for start in range(0, len(rows), batch_size):
+                batch_rows = rows[start:start + batch_size]
+                vectors = self._run_model(model, [texts[i] for i in batch_rows], batch_size)
+                if embeddings is None:
+                    embeddings = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+                embeddings[batch_rows] = vectors
+                if progress is not None:
+                    progress.update(len(batch_rows))
+
+        if progress is not None:
+            progress.close()
+        return embeddings
+
+    def get_stats(self) -> Dict:
+        """Model and sharing statistics"""
+        return {
+            'model': self.model_name,
+            'backend': self.backend,
+            'backend_check': self.backend_report,
+            'loaded': self.loaded,
+            'readiness': self.readiness(),
+            'components': sorted(self.components),
+            **self.stats,
+            'cache': self.cache.get_stats() if self.cache else None,
+            'batching': self.batcher.get_stats() if self.batcher else None,
+            'pool': self.pool.get_stats() if self.pool else None,
+        }
+
+
+# Instancia global del servicio de embeddings
+_embedding_service: Optional[EmbeddingService] = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service(config: Optional[Dict] = None) -> EmbeddingService:
+    """Obtiene instancia global del servicio de embeddings (config solo se usa al crearla)"""
+    global _embedding_service
+    if _embedding_service is None:
+        with _service_lock:
+            if _embedding_service is None:
+                _embedding_service = EmbeddingService(config)
+    return _embedding_service
@@ -0,0 +1,87 @@
+"""
+Inference Backends for MCP v6
+Ways to run the embedding model on CPU, plus an accuracy check against fp32
+
+Backends (embedding.backend in v6_config.json):
+    torch       - SentenceTransformer in fp32 (reference, default)
+    torch_int8  - fp32 model with nn.Linear layers dynamically quantized to int8
+    onnx        - SentenceTransformer ONNX export run by onnxruntime
+                  (needs sentence-transformers >= 3.2 with the onnx extra)
+"""
+
+import logging
+from typing import Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('torch', 'torch_int8', 'onnx')
+
+# Mixed code/prose probe set used to compare a backend with fp32
+PROBE_TEXTS: List[str] = [
+    "def get_chunk(self, chunk_id: str) -> Optional[VirtualChunk]:",
+    "Resolve a chunk by id in O(1) using the row index built at load time.",
+    "How is the HNSW index loaded from the snapshot sidecar file?",
+    "class SessionManager handles trimming and summarizing strategies",
+    "import numpy as np\nscores = vectors @ query\nrows = np.argsort(-scores)[:10]",
+    "El servidor MCP expone herramientas de contexto para el asistente.",
+    "Configuration lives in config/v6_config.json under the embedding section.",
+    "ValueError: Invalid chunk table magic",
+    "token budget manager reserves tokens for the response",
+    "SELECT text_hash, dim, vector FROM embeddings WHERE model = ?",
+    "Project grounding compares the query with documents in project_context.",
+    "async def call_tool(name: str, arguments: dict) -> list:",
+]
+
+
+def load_model(model_name: str, backend: str = 'torch', device: str = 'cpu'):
+    """
+    Load a SentenceTransformer for the given backend
+
+    Args:
+        model_name: Hugging Face model id
+        backend: One of BACKENDS
+        device: Torch device for the torch backends
+
+    Returns:
+        Model exposing SentenceTransformer.encode
+    """
+    from sentence_transformers import SentenceTransformer
+
+    if backend == 'onnx':
+        return SentenceTransformer(model_name, backend='onnx', device='cpu')
+
+    model = SentenceTransformer(model_name, device=device)
+    if backend == 'torch_int8':
+        model = quantize_dynamic_int8(model)
+    elif backend != 'torch':
+        raise ValueError(f"Unknown embedding backend: {backend} (expected one of {BACKENDS})")
+    return model
+
+
+def quantize_dynamic_int8(model):
+    """Swap the model's nn.Linear layers for dynamically quantized int8 ones (in place)"""
+    import torch
+
+    model.to('cpu')
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def embedding_agreement(reference: np.ndarray, candidate: np.ndarray) -> Dict:
+    """
+    Cosine similarity between reference and candidate embeddings of the same texts
+
+    Returns:
+        {'min_cosine', 'mean_cosine', 'texts'}
+    """
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    dots = np.sum(reference * candidate, axis=1)
+    norms = np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    cosines = dots / np.where(norms > 0, norms, 1)
+    return {
+        'min_cosine': round(float(cosines.min()), 5),
+        'mean_cosine': round(float(cosines.mean()), 5),
+        'texts': len(cosines),
+    }
@@ -0,0 +1,254 @@
+"""
+Source Integrity Scanner for MCP v6
+Cheap (size, mtime_ns, fast hash) fingerprints checked in the background,
+plus an explicit, rate-limited full SHA-256 verification
+"""
+
+import os
+import time
+import hashlib
+import threading
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from .source_text import get_source_text_cache
+
+logger = logging.getLogger(__name__)
+
+# Bytes sampled from the head and tail of a file for the fast hash
+FAST_HASH_SAMPLE = 64 * 1024
+
+
+def file_fingerprint(file_path: str) -> Optional[Dict]:
+    """
+    Compute a cheap fingerprint of a source file
+
+    The fast hash covers the size plus the first and last FAST_HASH_SAMPLE
+    bytes, so it costs at most two small reads regardless of file size.
+
+    Returns:
+        {'size', 'mtime_ns', 'fast_hash'} or None if the file is unreadable
+    """
+    try:
+        stat = os.stat(file_path)
+        digest = hashlib.blake2b(str(stat.st_size).encode(), digest_size=16)
+        with open(file_path, 'rb') as f:
+            digest.update(f.read(FAST_HASH_SAMPLE))
+            if stat.st_size > FAST_HASH_SAMPLE:
+                f.seek(max(stat.st_size - FAST_HASH_SAMPLE, FAST_HASH_SAMPLE))
+                digest.update(f.read(FAST_HASH_SAMPLE))
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'fast_hash': digest.hexdigest()}
+    except OSError:
+        return None
+
+
+def fingerprint_sources(file_paths: Iterable[str]) -> Dict[str, Dict]:
+    """Fingerprint every distinct readable source file"""
+    fingerprints = {}
+    for path in set(file_paths):
+        fingerprint = file_fingerprint(path)
+        if fingerprint:
+            fingerprints[path] = fingerprint
+    return fingerprints
+
+
+class IntegrityScanner:
+    """
+    Tracks which source files changed since the snapshot was built
+
+    - Background thread re-stats files every scan_interval seconds and only
+      re-hashes when size/mtime moved
+    - A new mtime with the same size and fast hash may still hide an edit
+      between the sampled bytes: such files stay suspect (reported stale)
+      until verify_full() confirms their chunks and re-baselines them
+    - Stale files are published to storage.stale_files, so the query path
+      can filter or flag chunks with a set lookup and no I/O
+    - verify_full() re-hashes chunk texts against text_hash; it is an
+      explicit maintenance operation limited to one run per min interval
+    """
+
+    def __init__(self, storage, scan_interval: float = 300.0,
+                 full_verify_min_interval: float = 3600.0, throttle_seconds: float = 0.001):
+        """
+        Args:
+            storage: Loaded MP4Storage whose chunks and metadata are checked
+            scan_interval: Seconds between background fingerprint scans
+            full_verify_min_interval: Minimum seconds between verify_full runs
+            throttle_seconds: Pause between files to stay out of the query path's way
+        """
+        self.storage = storage
+        self.scan_interval = scan_interval
+        self.full_verify_min_interval = full_verify_min_interval
+        self.throttle_seconds = throttle_seconds
+
+        # Baseline: fingerprints stored in the snapshot, else taken on first scan
+        self.baseline: Dict[str, Dict] = dict(storage.metadata.get('source_fingerprints') or {})
+        self.last_scan: Optional[float] = None
+        self.last_full_verify: Optional[float] = None
+        self.scans = 0
+        self._verified_stale = set()
+        self._suspect = set()
+        # Guards baseline, _suspect, _verified_stale and the published stale set, which the
+        # scanner thread and verify_full() both update; file I/O happens outside it
+        self._lock = threading.Lock()
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _source_files(self) -> List[str]:
+        """Distinct source files referenced by the snapshot"""
+        table = getattr(self.storage, '_chunk_table', None)
+        if table is not None and self.storage.chunks is table:
+            return list(set(table.iter_strings('file_path')))
+        return list({chunk.file_path for chunk in self.storage.chunks})
+
+    def check_once(self) -> Dict:
+        """
+        Run one fingerprint pass and publish the stale set
+
+        Returns:
+            Scan summary
+        """
+        stale = set()
+        rehashed = 0
+        for path in self._source_files():
+            if self._stop.is_set():
+                break
+
+            with self._lock:
+                expected = self.baseline.get(path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                stale.add(path)
+                continue
+
+            if expected is None:
+                # Snapshot predates fingerprints: current state becomes the baseline
+                fingerprint = file_fingerprint(path)
+                if fingerprint:
+                    with self._lock:
+                        self.baseline.setdefault(path, fingerprint)
+                else:
+                    stale.add(path)
+            elif stat.st_size != expected['size'] or stat.st_mtime_ns != expected['mtime_ns']:
+                rehashed += 1
+                fingerprint = file_fingerprint(path)
+                if fingerprint is None or fingerprint['fast_hash'] != expected['fast_hash'] \
+                        or fingerprint['size'] != expected['size']:
+                    stale.add(path)
+                else:
+                    # Same size and sampled bytes, but the middle of the file is not hashed
+                    stale.add(path)
+                    with self._lock:
+                        # Unless verify_full settled the file since the baseline was read
+                        if self.baseline.get(path) is expected and path not in self._verified_stale:
+                            self._suspect.add(path)
+
+            if self.throttle_seconds:
+                time.sleep(self.throttle_seconds)
+
+        with self._lock:
+            # Files caught by verify_full stay stale until the snapshot is rebuilt
+            self.storage.stale_files = frozenset(stale | self._verified_stale)
+            checked = len(self.baseline)
+        self.last_scan = time.time()
+        self.scans += 1
+
+        if stale:
+            logger.warning(f"Integrity scan: {len(stale)} source file(s) changed since snapshot")
+        return {'stale_files': len(stale), 'rehashed': rehashed, 'checked': checked}
+
+    def _run(self):
+        """Background loop"""
+        while not self._stop.is_set():
+            try:
+                self.check_once()
+            except Exception as e:
+                logger.error(f"Integrity scan failed: {e}")
+            self._stop.wait(self.scan_interval)
+
+    def start(self):
+        """Start the background scanner (daemon thread)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="integrity-scanner", daemon=True)
+        self._thread.start()
+        logger.info(f"Integrity scanner started (interval={self.scan_interval}s)")
+
+    def stop(self):
+        """Stop the background scanner"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def verify_full(self, max_chunks: Optional[int] = None) -> Dict:
+        """
+        Recompute SHA-256 of chunk texts and compare with stored text_hash
+
+        Args:
+            max_chunks: Optional cap on the number of chunks verified
+
+        Returns:
+            Verification summary, or a rate_limited status
+        """
+        now = time.time()
+        with self._lock:
+            if self.last_full_verify is not None and now - self.last_full_verify < self.full_verify_min_interval:
+                retry_in = self.full_verify_min_interval - (now - self.last_full_verify)
+                return {'status': 'rate_limited', 'retry_in_seconds': round(retry_in, 1)}
+            self.last_full_verify = now
+            suspects = list(self._suspect)
+
+        all_chunks = self.storage.chunks
+        count = len(all_chunks) if max_chunks is None else min(max_chunks, len(all_chunks))
+        chunks = [all_chunks[i] for i in range(count)]
+        # Taken before reading the texts, so a later edit is not re-baselined as verified
+        suspect_fingerprints = {path: file_fingerprint(path) for path in suspects}
+        texts = get_source_text_cache().get_chunk_texts(chunks)
+
+        mismatched_files = set()
+        mismatches = 0
+        for chunk, text in zip(chunks, texts):
+            if not chunk.text_hash:
+                continue
+            if hashlib.sha256(text.encode()).hexdigest() != chunk.text_hash:
+                mismatches += 1
+                mismatched_files.add(chunk.file_path)
+
+        # Suspect files whose every chunk matched were only touched: re-baseline them
+        unverified = {all_chunks[i].file_path for i in range(count, len(all_chunks))}
+        verified_files = {chunk.file_path for chunk in chunks} - unverified
+        cleared = set()
+        with self._lock:
+            self._verified_stale |= mismatched_files
+            for path, fingerprint in suspect_fingerprints.items():
+                if path in mismatched_files:
+                    self._suspect.discard(path)
+                elif path in verified_files and fingerprint is not None:
+                    self.baseline[path] = fingerprint
+                    self._suspect.discard(path)
+                    cleared.add(path)
+            self.storage.stale_files = frozenset((set(self.storage.stale_files) - cleared) | mismatched_files)
+        logger.info(f"Full integrity verification: {mismatches} mismatching chunk(s) in {count}")
+        return {
+            'status': 'completed',
+            'chunks_verified': count,
+            'mismatched_chunks': mismatches,
+            'suspect_files_cleared': len(cleared),
+            'stale_files': sorted(self.storage.stale_files),
+            'elapsed_ms': round((time.time() - now) * 1000, 2),
+        }
+
+    def get_stats(self) -> Dict:
+        """Scanner status"""
+        return {
+            'running': bool(self._thread and self._thread.is_alive()),
+            'scans': self.scans,
+            'last_scan': self.last_scan,
+            'last_full_verify': self.last_full_verify,
+            'stale_files': len(self.storage.stale_files),
+            'suspect_files': len(self._suspect),
+        }
@@ -3,8 +3,10 @@ MP4 Storage System for MCP v5
 Implements vector storage using MP4 container format with custom boxes
 """
 
+import os
 import json
 import mmap
+import shutil
 import hashlib
 import struct
 from pathlib import Path
@@ -12,8 +14,59 @@ from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 import logging
 
+import numpy as np
+
+from .source_text import get_source_text_cache
+from .integrity import fingerprint_sources
+from .chunk_filter import ChunkFilter
+
 logger = logging.getLogger(__name__)
 
+# Boxes whose payload is a sequence of child boxes (walked recursively)
+CONTAINER_BOXES = {b'moov', b'udta'}
+
+# mdat vector data is padded (with a 'free' box) to start on this boundary
+DATA_ALIGNMENT = 64
+
+# File suffix of the standalone HNSW graph stored next to the snapshot
+HNSW_SIDECAR_SUFFIX = '.hnsw'
+
+
+def iter_boxes(f, start: int, end: int):
+    """
+    Walk ISO BMFF boxes between start and end reading only their headers
+
+    Payloads are skipped with seek(), so the cost depends on the number of
+    boxes, not on their size. Supports 64-bit 'largesize' headers and the
+    size == 0 "box extends to end of file" form.
+
+    Yields:
+        (box_type, box_offset, payload_offset, payload_size) tuples
+    """
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            break
+
+        size, box_type = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:
+            largesize = f.read(8)
+            if len(largesize) < 8:
+                raise ValueError(f"Truncated largesize header at offset {pos}")
+            size = struct.unpack('>Q', largesize)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - pos
+
+        if size < header_size or pos + size > end:
+            raise ValueError(f"Invalid box {box_type!r} at offset {pos} (size={size})")
+
+        yield box_type, pos, pos + header_size, size - header_size
+        pos += size
+
 
 @dataclass
 class VirtualChunk:
@@ -32,15 +85,8 @@ class VirtualChunk:
     text_hash: str = ""
     
     def get_text(self) -> str:
-        """Read actual text from source MD file on-demand"""
-        try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                text = ''.join(lines[self.start_line:self.end_line + 1])
-                return text.strip()
-        except (IOError, IndexError) as e:
-            logger.error(f"Error reading chunk text from {self.file_path}: {e}")
-            return ""
+        """Read actual text from source MD file on-demand (via the shared line-offset cache)"""
+        return get_source_text_cache().get_text(self.file_path, self.start_line, self.end_line)
     
     def compute_hash(self) -> str:
         """Compute hash of the text for integrity checking"""
@@ -89,51 +135,94 @@ class MP4Storage:
         self.metadata: Dict = {}
         self.mmap_handle = None
         self.mmap_data = None
+        self.boxes: Optional[Dict[str, Tuple[int, int]]] = None
+        self._chunk_table = None
+        self._row_index: Dict[str, int] = {}
+        # Source files changed since the snapshot (maintained by IntegrityScanner)
+        self.stale_files = frozenset()
+        # ChunkFilter -> matching chunk ids (cleared on load)
+        self._filter_cache: Dict[ChunkFilter, frozenset] = {}
         
         logger.info(f"Initialized MP4Storage at {self.mp4_path}")
     
     def create_snapshot(self, chunks: List[VirtualChunk], vectors_blob: bytes, 
-                       hnsw_blob: bytes, metadata: Dict) -> str:
+                       hnsw_blob: bytes, metadata: Dict,
+                       hnsw_index_path: Optional[str] = None,
+                       extra_boxes: Optional[Dict[str, bytes]] = None) -> str:
         """
         Create new MP4 snapshot with vectors and index
         
         Args:
             chunks: List of VirtualChunk objects
             vectors_blob: Binary blob of all vectors
-            hnsw_blob: Serialized HNSW index
+            hnsw_blob: Serialized HNSW index, or the binary id map when
+                hnsw_index_path is given
             metadata: Additional metadata
+            hnsw_index_path: Optional HNSW graph file (VectorEngine.save_index)
+                that is moved next to the snapshot as a sidecar
+            extra_boxes: Optional binary payloads keyed by 4-char box type
+                (e.g. PQ codebooks), each stored DATA_ALIGNMENT-aligned
         
         Returns:
             Snapshot hash
         """
         logger.info(f"Creating MP4 snapshot with {len(chunks)} chunks")
         
+        hnsw_sidecar = None
+        if hnsw_index_path:
+            hnsw_sidecar = self._install_hnsw_sidecar(hnsw_index_path)
+        
+        # Chunk metadata goes to the columnar mcpt box, not the JSON index
+        from .chunk_table import ChunkTable, CHUNK_TABLE_VERSION
+        chunk_table = ChunkTable.encode(chunks)
+        
         # Prepare index data
         index_data = {
             'version': metadata.get('version', '5.0.0'),
             'snapshot_hash': '',  # Will be computed
             'embedding_model': metadata.get('embedding_model', 'unknown'),
-            'chunks': [chunk.to_dict() for chunk in chunks],
+            'chunk_table': {'format': 'columnar', 'version': CHUNK_TABLE_VERSION},
             'created_at': metadata.get('created_at', ''),
             'total_vectors': len(chunks),
-            'vector_dimension': metadata.get('vector_dimension', 384)
+            'vector_dimension': metadata.get('vector_dimension', 384),
+            # (size, mtime_ns, fast_hash) per source file for staleness checks
+            'source_fingerprints': fingerprint_sources(chunk.file_path for chunk in chunks)
         }
+        if hnsw_sidecar:
+            index_data['hnsw_layout'] = 'sidecar'
+            index_data['hnsw_sidecar'] = hnsw_sidecar
+        
+        # Keep caller metadata (e.g. vector_compression) that has no field above
+        for key, value in metadata.items():
+            if key != 'chunks':
+                index_data.setdefault(key, value)
+        
+        extra_boxes = extra_boxes or {}
+        for box_type in extra_boxes:
+            if len(box_type.encode('latin-1')) != 4:
+                raise ValueError(f"Box type must be 4 characters: {box_type!r}")
         
         # Compute snapshot hash
         content_for_hash = json.dumps(index_data, sort_keys=True) + str(len(vectors_blob))
-        snapshot_hash = hashlib.sha256(content_for_hash.encode()).hexdigest()
+        hashed = hashlib.sha256(content_for_hash.encode() + chunk_table)
+        for box_type in sorted(extra_boxes):
+            hashed.update(box_type.encode('latin-1') + extra_boxes[box_type])
+        snapshot_hash = hashed.hexdigest()
         index_data['snapshot_hash'] = snapshot_hash
         
         # Write MP4 structure
-        self._write_mp4_structure(index_data, vectors_blob, hnsw_blob)
+        self._write_mp4_structure(index_data, vectors_blob, hnsw_blob, chunk_table, extra_boxes)
         
         self.chunks = chunks
         self.metadata = index_data
+        self._build_row_index()
+        self.stale_files = frozenset()
         
         logger.info(f"Snapshot created: {snapshot_hash}")
         return snapshot_hash
     
-    def _write_mp4_structure(self, index_data: Dict, vectors_blob: bytes, hnsw_blob: bytes):
+    def _write_mp4_structure(self, index_data: Dict, vectors_blob: bytes, hnsw_blob: bytes,
+                             chunk_table: bytes = b'', extra_boxes: Optional[Dict[str, bytes]] = None):
         """
         Write MP4 file structure with custom boxes
         
@@ -142,8 +231,16 @@ class MP4Storage:
             moov - Movie box containing metadata
                 udta - User data box
                     mcpi - Custom box for index JSON
+            free - Padding so the chunk table columns are 8-byte aligned
+            mcpt - Columnar chunk table (see chunk_table.py)
+            free + xxxx - Optional extra boxes (e.g. mcpq PQ codebooks), aligned
+            free - Padding so vector data starts DATA_ALIGNMENT-aligned
             mdat - Media data box containing vectors and HNSW index
+                   (or the binary id map when the graph lives in a sidecar)
         """
+        # Never truncate a file that is still memory-mapped
+        self.close()
+
         with open(self.mp4_path, 'wb') as f:
             # Write ftyp box (file type)
             ftyp = self._create_ftyp_box()
@@ -154,10 +251,25 @@ class MP4Storage:
             moov = self._create_moov_box(index_json)
             f.write(moov)
             
+            # Write mcpt box with the columnar chunk table
+            if chunk_table:
+                self._write_free_padding(f, data_start=8)
+                self._write_box_header(f, b'mcpt', len(chunk_table))
+                f.write(chunk_table)
+            
+            for box_type, payload in (extra_boxes or {}).items():
+                self._write_free_padding(f, data_start=8)
+                self._write_box_header(f, box_type.encode('latin-1'), len(payload))
+                f.write(payload)
+            
+            # Pad so the vector blob (mdat header + 8-byte separator) is aligned
+            self._write_free_padding(f, data_start=8 + 8)
+            
             # Write mdat box with vectors and HNSW
-            mdat = self._create_mdat_box(vectors_blob, hnsw_blob)
-            f.write(mdat)
+            self._write_mdat_box(f, vectors_blob, hnsw_blob)
         
+        # Offsets changed, rescan headers on next access
+        self.boxes = None
         logger.info(f"MP4 structure written to {self.mp4_path}")
     
     def _create_ftyp_box(self) -> bytes:
@@ -188,14 +300,34 @@ class MP4Storage:
         mcpi = struct.pack('>I', mcpi_size) + b'mcpi' + index_json
         return mcpi
     
-    def _create_mdat_box(self, vectors_blob: bytes, hnsw_blob: bytes) -> bytes:
-        """Create mdat box containing vectors and HNSW index"""
-        # Combine vectors and HNSW with separator
-        separator = struct.pack('>Q', len(vectors_blob))  # 8 bytes for vector blob size
-        data = separator + vectors_blob + hnsw_blob
+    def _write_box_header(self, f, box_type: bytes, payload_size: int):
+        """Write a box header, switching to 64-bit largesize when needed"""
+        if payload_size + 8 <= 0xFFFFFFFF:
+            f.write(struct.pack('>I', payload_size + 8) + box_type)
+        else:
+            f.write(struct.pack('>I', 1) + box_type + struct.pack('>Q', payload_size + 16))
+    
+    def _write_free_padding(self, f, data_start: int):
+        """
+        Write a 'free' box so that data_start bytes after it are aligned
         
-        size = len(data) + 8
-        return struct.pack('>I', size) + b'mdat' + data
+        Args:
+            f: File positioned where the next box will be written
+            data_start: Offset of the data to align from the next box start
+        """
+        pos = f.tell()
+        # A free box is at least its own 8-byte header
+        padding = (-(pos + 8 + data_start)) % DATA_ALIGNMENT
+        f.write(struct.pack('>I', padding + 8) + b'free' + b'\0' * padding)
+    
+    def _write_mdat_box(self, f, vectors_blob: bytes, hnsw_blob: bytes):
+        """Write mdat box containing vectors and HNSW index without concatenating them"""
+        # 8-byte separator with the vector blob size, then vectors and HNSW
+        separator = struct.pack('>Q', len(vectors_blob))
+        self._write_box_header(f, b'mdat', len(separator) + len(vectors_blob) + len(hnsw_blob))
+        f.write(separator)
+        f.write(vectors_blob)
+        f.write(hnsw_blob)
     
     def load_snapshot(self) -> bool:
         """
@@ -208,16 +340,20 @@ class MP4Storage:
             logger.warning(f"MP4 file not found: {self.mp4_path}")
             return False
         
+        self._apply_pending_update()
         try:
+            # Build the box table from headers only, then map the file once
+            self._open_mmap(self._read_box_table())
+
             index_data = self._read_index_from_mp4()
             if not index_data:
                 return False
             
             self.metadata = index_data
-            self.chunks = [VirtualChunk.from_dict(c) for c in index_data['chunks']]
-            
-            # Open mmap for vector access
-            self._open_mmap()
+            self.chunks = self._load_chunks(index_data)
+            self._build_row_index()
+            self.stale_files = frozenset()
+            self._filter_cache = {}
             
             logger.info(f"Loaded snapshot with {len(self.chunks)} chunks")
             return True
@@ -226,41 +362,304 @@ class MP4Storage:
             logger.error(f"Error loading snapshot: {e}")
             return False
     
+    def _load_chunks(self, index_data: Dict):
+        """
+        Load the chunk list for a snapshot
+        
+        Columnar snapshots return a ChunkTable of lazy views over the mmap;
+        older snapshots with a JSON 'chunks' array are materialized as before.
+        """
+        if 'chunks' in index_data:
+            return [VirtualChunk.from_dict(c) for c in index_data['chunks']]
+        
+        from .chunk_table import ChunkTable
+        box = self._get_box('mcpt')
+        if box is None:
+            raise ValueError("Snapshot has neither a JSON chunk list nor an mcpt box")
+        
+        offset, size = box
+        self._chunk_table = ChunkTable(memoryview(self.mmap_data)[offset:offset + size])
+        return self._chunk_table
+    
+    def iter_chunk_ids(self):
+        """Chunk ids in row order (read from the id column for columnar snapshots)"""
+        if self._chunk_table is not None and self.chunks is self._chunk_table:
+            return self._chunk_table.iter_strings('chunk_id')
+        return (chunk.chunk_id for chunk in self.chunks)
+    
+    def _build_row_index(self):
+        """Rebuild the chunk_id -> row map for the current chunk list"""
+        self._row_index = {chunk_id: row for row, chunk_id in enumerate(self.iter_chunk_ids())}
+    
+    def get_row(self, chunk_id: str) -> Optional[int]:
+        """Row of a chunk in self.chunks, or None if unknown"""
+        return self._row_index.get(chunk_id)
+    
+    def get_chunk(self, chunk_id: str) -> Optional[VirtualChunk]:
+        """
+        Resolve a chunk by id in O(1)
+        
+        Args:
+            chunk_id: Chunk identifier (as returned by vector search)
+        
+        Returns:
+            The chunk, or None if it is not in the snapshot
+        """
+        row = self._row_index.get(chunk_id)
+        return self.chunks[row] if row is not None else None
+    
+    def get_chunks(self, chunk_ids: List[str]) -> List[Optional[VirtualChunk]]:
+        """
+        Resolve several chunks by id, preserving order
+        
+        Args:
+            chunk_ids: Chunk identifiers
+        
+        Returns:
+            Chunks aligned with chunk_ids (None for unknown ids)
+        """
+        rows = self._row_index
+        chunks = self.chunks
+        return [chunks[rows[cid]] if cid in rows else None for cid in chunk_ids]
+    
+    def select_chunk_ids(self, chunk_filter: ChunkFilter) -> frozenset:
+        """
+        Chunk ids whose attributes match a filter
+        
+        Columnar snapshots are scanned column-wise without building chunk
+        objects; results are cached per filter until the next load.
+        
+        Args:
+            chunk_filter: Path/extension/language/section filter
+        
+        Returns:
+            Matching chunk ids
+        """
+        cached = self._filter_cache.get(chunk_filter)
+        if cached is not None:
+            return cached
+        
+        predicate = chunk_filter.compile()
+        if self._chunk_table is not None and self.chunks is self._chunk_table:
+            table = self._chunk_table
+            rows = zip(table.iter_strings('chunk_id'), table.iter_strings('file_path'),
+                       table.iter_strings('section'))
+        else:
+            rows = ((chunk.chunk_id, chunk.file_path, chunk.section) for chunk in self.chunks)
+        selected = frozenset(chunk_id for chunk_id, file_path, section in rows if predicate(file_path, section))
+        
+        if len(self._filter_cache) >= 64:
+            self._filter_cache.pop(next(iter(self._filter_cache)))
+        self._filter_cache[chunk_filter] = selected
+        return selected
+    
+    def is_stale(self, chunk: VirtualChunk) -> bool:
+        """True if the chunk's source file changed since the snapshot (no I/O)"""
+        return chunk.file_path in self.stale_files
+    
+    def _scan_boxes(self) -> Dict[str, Tuple[int, int]]:
+        """Build (and keep) the box offset table for the current MP4 file"""
+        self.boxes = self._read_box_table()
+        return self.boxes
+
+    def _read_box_table(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Box offset table of the current MP4 file
+
+        Only box headers are read; the table maps each box type to the
+        (payload_offset, payload_size) of its first occurrence.
+        """
+        boxes: Dict[str, Tuple[int, int]] = {}
+
+        with open(self.mp4_path, 'rb') as f:
+            file_size = f.seek(0, 2)
+            pending = [(0, file_size)]
+            while pending:
+                start, end = pending.pop()
+                for box_type, _, payload_offset, payload_size in iter_boxes(f, start, end):
+                    name = box_type.decode('latin-1')
+                    boxes.setdefault(name, (payload_offset, payload_size))
+                    if box_type in CONTAINER_BOXES:
+                        pending.append((payload_offset, payload_offset + payload_size))
+        return boxes
+
+    def _get_box(self, box_type: str) -> Optional[Tuple[int, int]]:
+        """Get (payload_offset, payload_size) for a box, scanning headers once"""
+        if self.boxes is None:
+            self._scan_boxes()
+        return self.boxes.get(box_type)
+
+    def _read_box_payload(self, box_type: str) -> Optional[bytes]:
+        """Read the payload of a single box without touching the rest of the file"""
+        box = self._get_box(box_type)
+        if box is None:
+            return None
+
+        offset, size = box
+        if self.mmap_data is not None:
+            return self.mmap_data[offset:offset + size]
+
+        with open(self.mp4_path, 'rb') as f:
+            f.seek(offset)
+            return f.read(size)
+
+    def get_box_view(self, box_type: str) -> Optional[memoryview]:
+        """
+        Zero-copy view of a box payload over the memory map
+        
+        Returns:
+            memoryview slice, or None if the box is absent or nothing is mapped
+        """
+        box = self._get_box(box_type)
+        if box is None or self.mmap_data is None:
+            return None
+        offset, size = box
+        return memoryview(self.mmap_data)[offset:offset + size]
+
+    def update_metadata(self, updates: Dict) -> bool:
+        """
+        Merge keys into the snapshot's index JSON (e.g. 'hnsw_tuning')
+        
+        Everything after the moov box is copied unchanged, re-padded so
+        every box keeps its alignment; the snapshot is then reloaded. The
+        snapshot hash is kept: it identifies the indexed content, which
+        does not change. Nothing is released: chunk views taken before the
+        call (in-flight queries, the integrity scanner) keep reading the
+        previous mapping until they are dropped.
+        
+        Windows cannot replace a file that is still mapped; there the new
+        file is kept as a pending update, applied by the next load, and the
+        updates are only merged into self.metadata for this process.
+        
+        Args:
+            updates: Top-level keys to set ('chunks' is not allowed)
+        
+        Returns:
+            True if the snapshot was rewritten and reloaded
+        """
+        if 'chunks' in updates:
+            raise ValueError("update_metadata cannot replace the chunk list")
+        
+        index_data = self._read_index_from_mp4()
+        if index_data is None:
+            return False
+        index_data.update(updates)
+        
+        tmp_path = self.mp4_path.with_name(self.mp4_path.name + '.tmp')
+        with open(self.mp4_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            file_size = src.seek(0, 2)
+            for box_type, box_offset, payload_offset, payload_size in list(iter_boxes(src, 0, file_size)):
+                if box_type == b'free':
+                    continue
+                if box_type == b'moov':
+                    dst.write(self._create_moov_box(json.dumps(index_data, indent=2).encode('utf-8')))
+                    continue
+                if box_type != b'ftyp':
+                    # Same padding rule as _write_mp4_structure
+                    self._write_free_padding(dst, data_start=16 if box_type == b'mdat' else 8)
+                src.seek(box_offset)
+                remaining = payload_offset + payload_size - box_offset
+                while remaining:
+                    block = src.read(min(remaining, 1 << 20))
+                    dst.write(block)
+                    remaining -= len(block)
+        
+        try:
+            # POSIX: the old inode lives on for as long as it is mapped
+            os.replace(tmp_path, self.mp4_path)
+        except PermissionError:
+            os.replace(tmp_path, self._pending_update_path())
+            self.metadata.update(updates)
+            logger.warning(f"Snapshot is mapped; metadata update {sorted(updates)} applies on the next load")
+            return False
+        
+        logger.info(f"Snapshot metadata updated: {sorted(updates)}")
+        # Same chunks and content: the integrity scanner's findings still hold
+        stale_files = self.stale_files
+        reloaded = self.reload()
+        self.stale_files = stale_files
+        return reloaded
+    
+    def _pending_update_path(self) -> Path:
+        return self.mp4_path.with_name(self.mp4_path.name + '.pending')
+    
+    def _apply_pending_update(self):
+        """Move a deferred update_metadata rewrite into place while the file is not mapped"""
+        pending = self._pending_update_path()
+        if self.mmap_data is not None or not pending.exists():
+            return
+        try:
+            if pending.stat().st_mtime_ns < self.mp4_path.stat().st_mtime_ns:
+                # The snapshot was rebuilt after the update was deferred
+                pending.unlink()
+                return
+            os.replace(pending, self.mp4_path)
+            logger.info("Applied pending snapshot metadata update")
+        except OSError as e:
+            logger.warning(f"Could not apply pending snapshot metadata update: {e}")
+    
+    def reload(self) -> bool:
+        """Reload the snapshot from disk (subclasses add their own decoding)"""
+        return self.load_snapshot()
+    
     def _read_index_from_mp4(self) -> Optional[Dict]:
         """Read index JSON from MP4 udta box"""
         try:
-            with open(self.mp4_path, 'rb') as f:
-                data = f.read()
-            
-            # Find mcpi box (simplified parsing)
-            mcpi_pos = data.find(b'mcpi')
-            if mcpi_pos == -1:
+            json_data = self._read_box_payload('mcpi')
+            if json_data is None:
                 logger.error("mcpi box not found in MP4")
                 return None
-            
-            # Read size of mcpi box (4 bytes before 'mcpi')
-            size_pos = mcpi_pos - 4
-            mcpi_size = struct.unpack('>I', data[size_pos:mcpi_pos])[0]
-            
-            # Extract JSON data (after 'mcpi' marker)
-            json_start = mcpi_pos + 4
-            json_end = size_pos + mcpi_size
-            json_data = data[json_start:json_end]
-            
+
             return json.loads(json_data.decode('utf-8'))
-            
+
         except Exception as e:
             logger.error(f"Error reading index: {e}")
             return None
     
-    def _open_mmap(self):
-        """Open memory map for efficient vector access"""
+    def _open_mmap(self, boxes: Optional[Dict[str, Tuple[int, int]]] = None):
+        """
+        Open memory map for efficient vector access
+        
+        A previous mapping is replaced, not closed: views still held elsewhere
+        keep it alive until they are dropped. The box table of the new file
+        (if given) is swapped in together with the mapping.
+        """
         try:
-            self.mmap_handle = open(self.mp4_path, 'rb')
-            self.mmap_data = mmap.mmap(self.mmap_handle.fileno(), 0, access=mmap.ACCESS_READ)
-            logger.info("Memory map opened for vector access")
+            handle = open(self.mp4_path, 'rb')
+            data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
         except Exception as e:
             logger.error(f"Error opening mmap: {e}")
+            if boxes is not None:
+                self.boxes = boxes
+            return
+        previous_handle = self.mmap_handle
+        self.boxes, self.mmap_handle, self.mmap_data = boxes if boxes is not None else self.boxes, handle, data
+        if previous_handle is not None:
+            # The mmap keeps its own handle to the file
+            previous_handle.close()
+        logger.info("Memory map opened for vector access")
+    
+    def get_vector_matrix(self) -> Optional[np.ndarray]:
+        """
+        Zero-copy (chunks x dimension) view of uncompressed float16/float32 vectors
+        
+        Row i belongs to self.chunks[i]. The view points into the mmap, so
+        drop it before close() (otherwise the unmap is deferred).
+        
+        Returns:
+            Read-only array, or None for compressed or mismatched vector blobs
+        """
+        if self.metadata.get('compression_enabled') or self.mmap_data is None:
+            return None
+        
+        offset, size = self.get_vector_blob_offset()
+        rows = len(self.chunks)
+        dimension = self.metadata.get('vector_dimension', 384)
+        itemsize = {rows * dimension * 2: np.float16, rows * dimension * 4: np.float32}.get(size)
+        if not rows or itemsize is None:
+            return None
+        return np.frombuffer(self.mmap_data, dtype=itemsize, count=rows * dimension,
+                             offset=offset).reshape(rows, dimension)
     
     def get_vector_blob_offset(self) -> Tuple[int, int]:
         """
@@ -270,25 +669,21 @@ class MP4Storage:
             (offset, size) tuple
         """
         try:
-            with open(self.mp4_path, 'rb') as f:
-                data = f.read()
-            
-            # Find mdat box
-            mdat_pos = data.find(b'mdat')
-            if mdat_pos == -1:
+            mdat = self._get_box('mdat')
+            if mdat is None or mdat[1] < 8:
                 return (0, 0)
-            
-            # Read mdat size
-            size_pos = mdat_pos - 4
-            mdat_size = struct.unpack('>I', data[size_pos:mdat_pos])[0]
-            
-            # Vector blob starts after 8-byte separator
-            data_start = mdat_pos + 4 + 8
-            
-            # Read separator to get vector blob size
-            separator = struct.unpack('>Q', data[mdat_pos + 4:mdat_pos + 12])[0]
-            
-            return (data_start, separator)
+
+            mdat_offset, _ = mdat
+            if self.mmap_data is not None:
+                separator_bytes = self.mmap_data[mdat_offset:mdat_offset + 8]
+            else:
+                with open(self.mp4_path, 'rb') as f:
+                    f.seek(mdat_offset)
+                    separator_bytes = f.read(8)
+
+            # Vector blob starts after 8-byte separator holding its size
+            vec_size = struct.unpack('>Q', separator_bytes)[0]
+            return (mdat_offset + 8, vec_size)
             
         except Exception as e:
             logger.error(f"Error getting vector blob offset: {e}")
@@ -302,31 +697,85 @@ class MP4Storage:
             (offset, size) tuple
         """
         try:
+            mdat = self._get_box('mdat')
+            if mdat is None:
+                return (0, 0)
+
             vec_offset, vec_size = self.get_vector_blob_offset()
             hnsw_offset = vec_offset + vec_size
-            
-            # HNSW size is mdat_size - vec_size - overhead
-            with open(self.mp4_path, 'rb') as f:
-                data = f.read()
-            
-            mdat_pos = data.find(b'mdat')
-            size_pos = mdat_pos - 4
-            mdat_size = struct.unpack('>I', data[size_pos:mdat_pos])[0]
-            
-            hnsw_size = mdat_size - vec_size - 16  # 8 for box header, 8 for separator
-            
-            return (hnsw_offset, hnsw_size)
+
+            # HNSW fills the rest of the mdat payload after separator + vectors
+            mdat_offset, mdat_size = mdat
+            hnsw_size = mdat_offset + mdat_size - hnsw_offset
+
+            return (hnsw_offset, max(hnsw_size, 0))
             
         except Exception as e:
             logger.error(f"Error getting HNSW blob offset: {e}")
             return (0, 0)
     
+    def get_hnsw_blob_view(self) -> Optional[memoryview]:
+        """
+        Zero-copy view of the HNSW region of mdat over the memory map
+        
+        Returns:
+            memoryview slice, or None if the snapshot is not mapped
+        """
+        hnsw_offset, hnsw_size = self.get_hnsw_blob_offset()
+        if self.mmap_data is None or hnsw_size <= 0:
+            return None
+        return memoryview(self.mmap_data)[hnsw_offset:hnsw_offset + hnsw_size]
+    
+    def get_hnsw_sidecar_path(self) -> Path:
+        """Path of the standalone HNSW graph file for this snapshot"""
+        return self.mp4_path.with_suffix(HNSW_SIDECAR_SUFFIX)
+    
+    def get_hnsw_index_path(self) -> Optional[Path]:
+        """
+        Get the HNSW sidecar file if this snapshot uses one and it is intact
+        
+        Returns:
+            Path that hnswlib can load directly, or None (legacy in-mdat blob)
+        """
+        sidecar = self.metadata.get('hnsw_sidecar')
+        if self.metadata.get('hnsw_layout') != 'sidecar' or not sidecar:
+            return None
+        
+        path = self.mp4_path.parent / sidecar['file']
+        if not path.exists():
+            logger.warning(f"HNSW sidecar missing: {path}")
+            return None
+        if path.stat().st_size != sidecar.get('size'):
+            logger.warning(f"HNSW sidecar size mismatch for {path}, ignoring it")
+            return None
+        return path
+    
+    def _install_hnsw_sidecar(self, hnsw_index_path: str) -> Dict:
+        """Move a saved HNSW graph next to the snapshot (a rename on the same filesystem)"""
+        target = self.get_hnsw_sidecar_path()
+        if Path(hnsw_index_path).resolve() != target.resolve():
+            shutil.move(str(hnsw_index_path), str(target))
+        
+        return {'file': target.name, 'size': target.stat().st_size}
+    
     def close(self):
         """Close memory map and file handles"""
-        if self.mmap_data:
-            self.mmap_data.close()
-        if self.mmap_handle:
+        if self._chunk_table is not None:
+            # Chunk views point into the mmap; they are invalid from here on
+            self._chunk_table.release()
+            self._chunk_table = None
+            self.chunks = []
+            self._row_index = {}
+        if self.mmap_data is not None:
+            try:
+                self.mmap_data.close()
+            except BufferError:
+                # Someone still holds a view (e.g. a numpy column); let GC unmap it
+                logger.warning("MP4 memory map still referenced, deferring unmap")
+            self.mmap_data = None
+        if self.mmap_handle is not None:
             self.mmap_handle.close()
+            self.mmap_handle = None
         logger.info("MP4 storage closed")
     
     def __del__(self):
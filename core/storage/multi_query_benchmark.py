@@ -0,0 +1,210 @@
+"""
+Multi-Query Retrieval Benchmark for MCP v6
+Measures recall@k and latency of reciprocal-rank-fusion retrieval for each
+fan-out (expansions searched next to the original query), and the recall
+gained per extra millisecond relative to fan-out 0
+
+Usage (from core/):
+    python -m storage.multi_query_benchmark --synthetic 50000 --fan-outs 0 1 2 4
+    python -m storage.multi_query_benchmark --snapshot context_vectors_v6.mp4 --queries labeled.jsonl
+
+--queries is JSONL with {"query": str, "relevant": [chunk_id, ...]} per line;
+expansions come from AutoQueryExpander and the timings include the batched
+embedding. Synthetic mode simulates paraphrases as independent noisy views
+of one query intent; ground truth is the exact top-k of the intent.
+"""
+
+import json
+import time
+import argparse
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .vector_engine import VectorEngine, RRF_K
+
+logger = logging.getLogger(__name__)
+
+
+def _run(search, cases: Sequence, k: int, repeats: int = 1) -> Dict:
+    """recall@k and latency of search(case) -> chunk ids over all cases"""
+    recalls = []
+    latencies = []
+    for case in cases:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            found = search(case)
+            latencies.append((time.perf_counter() - start) * 1000)
+        relevant = case['relevant']
+        recalls.append(len(relevant.intersection(found[:k])) / len(relevant) if relevant else 0.0)
+    return {
+        f'recall@{k}': round(float(np.mean(recalls)), 4),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+    }
+
+
+def _with_gain(rows: List[Dict], k: int) -> List[Dict]:
+    """Recall gain and gain per extra ms relative to fan-out 0 (or the smallest fan-out)"""
+    base = rows[0]
+    for row in rows:
+        gain = row[f'recall@{k}'] - base[f'recall@{k}']
+        extra_ms = row['p50_ms'] - base['p50_ms']
+        row['recall_gain'] = round(gain, 4)
+        row['extra_p50_ms'] = round(extra_ms, 3)
+        row['gain_per_ms'] = round(gain / extra_ms, 4) if extra_ms > 0 else None
+    return rows
+
+
+def benchmark_synthetic(count: int, dimension: int, fan_outs: Sequence[int], queries: int = 200,
+                        k: int = 10, noise: float = 0.35, candidates: int = 20, rrf_k: int = RRF_K,
+                        expansion_weight: float = 1.0, config: Optional[Dict] = None, seed: int = 7) -> List[Dict]:
+    """
+    Fan-out sweep on synthetic clustered vectors (no model; search + fusion cost only)
+
+    Each case is an intent vector near a corpus point; the "query" and every
+    "expansion" are the intent plus independent noise of the given scale.
+    """
+    from .compression_benchmark import synthetic_embeddings
+
+    vectors = synthetic_embeddings(count, dimension)
+    engine = VectorEngine({**(config or {}), 'embedding': {'dimension': dimension, 'cache': {'enabled': False}}})
+    engine.create_index(count)
+    engine.add_vectors(vectors, [str(i) for i in range(count)])
+
+    rng = np.random.default_rng(seed)
+    max_fan_out = max(fan_outs)
+    cases = []
+    for row in rng.integers(0, count, queries):
+        intent = vectors[row] + 0.1 * rng.normal(size=dimension).astype(np.float32)
+        intent /= np.linalg.norm(intent)
+        truth = np.argpartition(-(vectors @ intent), k)[:k]
+        views = intent + noise * rng.normal(size=(max_fan_out + 1, dimension)).astype(np.float32) / np.sqrt(dimension)
+        views /= np.linalg.norm(views, axis=1, keepdims=True)
+        cases.append({'views': views, 'relevant': {str(i) for i in truth}})
+
+    rows = []
+    for fan_out in fan_outs:
+        weights = [1.0] + [expansion_weight] * fan_out
+
+        def search(case, fan_out=fan_out, weights=weights):
+            if fan_out == 0:
+                return engine.search(case['views'][0], k)[0]
+            fused = engine.search_fused(case['views'][:fan_out + 1], k, per_query_k=candidates,
+                                        rrf_k=rrf_k, weights=weights)
+            return [hit['chunk_id'] for hit in fused]
+
+        rows.append({'fan_out': fan_out, **_run(search, cases, k, repeats=3)})
+    return _with_gain(rows, k)
+
+
+def benchmark_snapshot(snapshot: str, queries_path: str, fan_outs: Sequence[int], config: Dict,
+                       k: int = 10, candidates: int = 20, rrf_k: int = RRF_K,
+                       expansion_weight: float = 1.0) -> List[Dict]:
+    """
+    Fan-out sweep on a real snapshot with labeled queries (embedding included in the timings)
+    """
+    from .mp4_storage import MP4Storage
+    from advanced_features.query_expansion import AutoQueryExpander
+
+    storage = MP4Storage(snapshot)
+    if not storage.load_snapshot():
+        raise SystemExit(f"Cannot load snapshot {snapshot}")
+    engine = VectorEngine(config)
+    view = storage.get_hnsw_blob_view()
+    if view is None:
+        raise SystemExit(f"Snapshot {snapshot} has no ANN index")
+    try:
+        index_path = storage.get_hnsw_index_path()
+        if index_path is not None:
+            engine.load_index(str(index_path), view, len(storage.chunks))
+        else:
+            engine.load_index_from_bytes(view, len(storage.chunks))
+    finally:
+        view.release()
+
+    expander = AutoQueryExpander()
+    cases = []
+    for line in Path(queries_path).read_text(encoding='utf-8').splitlines():
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        expansions = [q for q in expander.expand(entry['query']).get('expansions', []) if q != entry['query']]
+        cases.append({'query': entry['query'], 'expansions': expansions, 'relevant': set(entry['relevant'])})
+    if not cases:
+        raise SystemExit(f"No queries in {queries_path}")
+
+    # Warm the model and the embedding cache path once; timings then reflect steady state
+    engine.embed_batch([case['query'] for case in cases[:4]])
+
+    rows = []
+    for fan_out in fan_outs:
+        def search(case, fan_out=fan_out):
+            queries = [case['query']] + case['expansions'][:fan_out]
+            if len(queries) == 1:
+                return engine.search(engine.embed_query(queries[0]), k)[0]
+            fused = engine.search_fused(engine.embed_batch(queries), k, per_query_k=candidates, rrf_k=rrf_k,
+                                        weights=[1.0] + [expansion_weight] * (len(queries) - 1))
+            return [hit['chunk_id'] for hit in fused]
+
+        # Disable the embedding cache per fan-out so each run pays for its embeddings
+        cache = engine.embedding_service.cache
+        engine.embedding_service.cache = None
+        try:
+            rows.append({'fan_out': fan_out, **_run(search, cases, k)})
+        finally:
+            engine.embedding_service.cache = cache
+    storage.close()
+    return _with_gain(rows, k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs latency of multi-query RRF retrieval per fan-out")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--synthetic', type=int, help="Synthetic corpus size")
+    source.add_argument('--snapshot', help="Snapshot file name (under ./data)")
+    parser.add_argument('--queries', help="Labeled queries JSONL (with --snapshot)")
+    parser.add_argument('--config', default=str(Path(__file__).resolve().parents[2] / 'config' / 'v6_config.json'))
+    parser.add_argument('--fan-outs', type=int, nargs='+', default=[0, 1, 2, 3, 4])
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--candidates', type=int, default=20, help="Depth of each ranked list")
+    parser.add_argument('--rrf-k', type=int, default=RRF_K)
+    parser.add_argument('--expansion-weight', type=float, default=1.0)
+    parser.add_argument('--num-queries', type=int, default=200)
+    parser.add_argument('--noise', type=float, default=0.35)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--output', help="Write the report as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    config = json.loads(Path(args.config).read_text()) if Path(args.config).exists() else {}
+    fan_outs = sorted(set(args.fan_outs))
+
+    if args.synthetic:
+        rows = benchmark_synthetic(args.synthetic, args.dim, fan_outs, queries=args.num_queries, k=args.k,
+                                   noise=args.noise, candidates=args.candidates, rrf_k=args.rrf_k,
+                                   expansion_weight=args.expansion_weight,
+                                   config={'hnsw': config.get('hnsw', {}), 'ann': {'backend': 'hnsw'}})
+    else:
+        if not args.queries:
+            parser.error("--snapshot needs --queries")
+        rows = benchmark_snapshot(args.snapshot, args.queries, fan_outs, config, k=args.k,
+                                  candidates=args.candidates, rrf_k=args.rrf_k,
+                                  expansion_weight=args.expansion_weight)
+
+    header = f"{'fan_out':>7} {'recall@' + str(args.k):>10} {'p50_ms':>8} {'p95_ms':>8} {'gain':>7} {'gain/ms':>8}"
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        per_ms = f"{row['gain_per_ms']:.4f}" if row['gain_per_ms'] is not None else '-'
+        print(f"{row['fan_out']:>7} {row[f'recall@{args.k}']:>10.4f} {row['p50_ms']:>8.3f} "
+              f"{row['p95_ms']:>8.3f} {row['recall_gain']:>+7.4f} {per_ms:>8}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(rows, indent=2))
+
+
+if __name__ == '__main__':
+    main()
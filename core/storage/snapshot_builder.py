@@ -0,0 +1,330 @@
+"""
+Snapshot Builder for MCP v6
+Builds an MP4 snapshot (vectors + ANN index sidecar + id map) from chunks,
+running embedding and index insertion as overlapping pipeline stages
+
+    read texts + embed (thread)  --bounded queue-->  add_vectors (caller thread)
+
+hnswlib add_items runs on hnsw.build_threads cores and releases the GIL, so
+the model keeps embedding the next batch while the previous one is inserted.
+With embedding.pool enabled, each batch is also split across the embedding
+workers, so a full rebuild uses every core in both stages.
+
+Usage (from core/):
+    python -m storage.snapshot_builder --synthetic 100000 --threads 8
+    python -m storage.snapshot_builder --source ../docs --output context_vectors_v6.mp4
+"""
+
+import os
+import json
+import time
+import queue
+import argparse
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .mp4_storage import MP4Storage, VirtualChunk
+from .source_text import get_source_text_cache
+from .ann_backends import HNSWBackend
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BuildProgress:
+    """Pipeline progress passed to the progress callback"""
+    total: int
+    embedded: int = 0
+    indexed: int = 0
+    elapsed_s: float = 0.0
+    embed_s: float = 0.0
+    index_s: float = 0.0
+    done: bool = False
+
+    @property
+    def rate(self) -> float:
+        """Chunks indexed per second"""
+        return self.indexed / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+    @property
+    def eta_s(self) -> Optional[float]:
+        """Estimated seconds left, from the indexing rate so far"""
+        rate = self.rate
+        return (self.total - self.indexed) / rate if rate > 0 else None
+
+
+def log_progress(progress: BuildProgress):
+    """Default progress callback: one log line per report"""
+    eta = f", eta {progress.eta_s:.0f}s" if progress.eta_s is not None and not progress.done else ""
+    logger.info(f"Snapshot build: embedded {progress.embedded}/{progress.total}, "
+                f"indexed {progress.indexed}/{progress.total} "
+                f"({progress.rate:.0f} chunks/s{eta})")
+
+
+class SnapshotBuilder:
+    """
+    Embeds chunks and builds the VectorEngine index in a two-stage pipeline,
+    then writes the snapshot through MP4Storage (or CompressedMP4Storage)
+
+    - Stage 1 (background thread): read chunk texts, embed a batch
+    - Stage 2 (calling thread): copy the batch into the vector matrix and
+      insert it with VectorEngine.add_vectors (multi-threaded add_items)
+    - At most queue_depth embedded batches wait between the stages
+    """
+
+    def __init__(self, vector_engine, storage: MP4Storage, batch_size: int = 1024,
+                 queue_depth: int = 4, progress_interval_s: float = 2.0,
+                 progress_callback: Optional[Callable[[BuildProgress], None]] = log_progress,
+                 embed_fn: Optional[Callable[[List[str]], np.ndarray]] = None):
+        """
+        Args:
+            vector_engine: VectorEngine whose index is rebuilt
+            storage: Snapshot destination
+            batch_size: Chunks per pipeline batch
+            queue_depth: Embedded batches buffered ahead of insertion
+            progress_interval_s: Minimum seconds between progress reports
+            progress_callback: Called with BuildProgress (None disables reports)
+            embed_fn: Texts -> (n, dim) vectors; defaults to vector_engine.embed_batch
+        """
+        self.vector_engine = vector_engine
+        self.storage = storage
+        self.batch_size = max(1, int(batch_size))
+        self.queue_depth = max(1, int(queue_depth))
+        self.progress_interval_s = progress_interval_s
+        self.progress_callback = progress_callback
+        self.embed_fn = embed_fn or vector_engine.embed_batch
+
+    def build(self, chunks: List[VirtualChunk], texts: Optional[List[str]] = None,
+              metadata: Optional[Dict] = None) -> Dict:
+        """
+        Embed, index and write a snapshot of chunks
+
+        Args:
+            chunks: Chunks in snapshot row order
+            texts: Chunk texts (default: read from the source files)
+            metadata: Extra snapshot metadata
+
+        Returns:
+            Build report (timings, throughput, threads, snapshot hash)
+        """
+        if texts is not None and len(texts) != len(chunks):
+            raise ValueError(f"Got {len(texts)} texts for {len(chunks)} chunks")
+
+        total = len(chunks)
+        engine = self.vector_engine
+        engine.create_index(total)
+        dtype = np.float16 if engine.dtype == 'float16' else np.float32
+        vectors = np.zeros((total, engine.dimension), dtype=dtype)
+        progress = BuildProgress(total=total)
+
+        start = time.perf_counter()
+        last_report = start
+        batches: 'queue.Queue' = queue.Queue(maxsize=self.queue_depth)
+        stop = threading.Event()
+        producer = threading.Thread(target=self._embed_stage, name="snapshot-embed",
+                                    args=(chunks, texts, batches, progress, stop), daemon=True)
+        producer.start()
+
+        try:
+            while True:
+                item = batches.get()
+                if item is None:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                offset, batch = item
+                rows = slice(offset, offset + len(batch))
+                vectors[rows] = batch
+
+                index_start = time.perf_counter()
+                engine.add_vectors(batch, [chunk.chunk_id for chunk in chunks[rows]])
+                progress.index_s += time.perf_counter() - index_start
+                progress.indexed += len(batch)
+
+                now = time.perf_counter()
+                progress.elapsed_s = now - start
+                if self.progress_callback and now - last_report >= self.progress_interval_s:
+                    self.progress_callback(progress)
+                    last_report = now
+        finally:
+            stop.set()
+            producer.join()
+
+        progress.elapsed_s = time.perf_counter() - start
+        progress.done = True
+        if self.progress_callback:
+            self.progress_callback(progress)
+
+        write_start = time.perf_counter()
+        snapshot_hash = self._write_snapshot(chunks, vectors, metadata or {})
+        write_s = time.perf_counter() - write_start
+
+        index = engine.index
+        report = {
+            'chunks': total,
+            'backend': index.name,
+            'build_threads': index.build_threads if isinstance(index, HNSWBackend) else None,
+            'batch_size': self.batch_size,
+            'pipeline_s': round(progress.elapsed_s, 3),
+            'embed_s': round(progress.embed_s, 3),
+            'index_s': round(progress.index_s, 3),
+            # Time saved by running the stages concurrently
+            'overlap_s': round(max(0.0, progress.embed_s + progress.index_s - progress.elapsed_s), 3),
+            'write_s': round(write_s, 3),
+            'chunks_per_s': round(progress.rate, 1),
+            'snapshot_hash': snapshot_hash,
+        }
+        logger.info(f"Snapshot built: {report}")
+        return report
+
+    def _embed_stage(self, chunks: List[VirtualChunk], texts: Optional[List[str]],
+                     batches: 'queue.Queue', progress: BuildProgress, stop: threading.Event):
+        """Producer: read + embed batches; ends with None (or the exception raised)"""
+        try:
+            cache = get_source_text_cache()
+            for offset in range(0, len(chunks), self.batch_size):
+                if stop.is_set():
+                    return
+                batch_chunks = chunks[offset:offset + self.batch_size]
+                if texts is not None:
+                    batch_texts = texts[offset:offset + self.batch_size]
+                else:
+                    batch_texts = cache.get_texts([(c.file_path, c.start_line, c.end_line) for c in batch_chunks])
+
+                embed_start = time.perf_counter()
+                embedded = np.asarray(self.embed_fn(batch_texts))
+                progress.embed_s += time.perf_counter() - embed_start
+                progress.embedded += len(embedded)
+                self._put(batches, (offset, embedded), stop)
+            self._put(batches, None, stop)
+        except BaseException as e:
+            self._put(batches, e, stop)
+
+    @staticmethod
+    def _put(batches: 'queue.Queue', item, stop: threading.Event):
+        """Blocking put that gives up once the consumer has stopped"""
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _write_snapshot(self, chunks: List[VirtualChunk], vectors: np.ndarray, metadata: Dict) -> str:
+        """Save the index (any backend) as the snapshot sidecar and write the MP4"""
+        engine = self.vector_engine
+        snapshot_metadata = {
+            'version': '6.0.0',
+            'embedding_model': engine.model_name,
+            'created_at': datetime.now().isoformat(),
+            'vector_dimension': engine.dimension,
+            **metadata,
+        }
+
+        # Always a sidecar: an HNSW graph or the exact backend's .npy matrix (load_backend tells them
+        # apart), so the snapshot loads through load_index whatever backend the reader resolves
+        index_path = str(self.storage.mp4_path.with_suffix('.hnsw.tmp'))
+        engine.save_index(index_path)
+        id_map = engine.serialize_id_map()
+
+        if hasattr(self.storage, 'create_compressed_snapshot'):
+            return self.storage.create_compressed_snapshot(chunks, vectors, id_map, snapshot_metadata,
+                                                           hnsw_index_path=index_path)
+        return self.storage.create_snapshot(chunks, vectors.tobytes(), id_map, snapshot_metadata,
+                                            hnsw_index_path=index_path)
+
+
+def chunk_source_files(source_dir: str, patterns=('*.md',), lines_per_chunk: int = 40) -> List[VirtualChunk]:
+    """
+    Split source files into fixed line windows, tagged with the nearest markdown heading
+
+    Args:
+        source_dir: Directory scanned recursively
+        patterns: Glob patterns of files to include
+        lines_per_chunk: Lines per chunk
+
+    Returns:
+        VirtualChunks in file order
+    """
+    chunks = []
+    files = sorted({path for pattern in patterns for path in Path(source_dir).rglob(pattern) if path.is_file()})
+    for path in files:
+        try:
+            lines = path.read_text(encoding='utf-8', errors='ignore').splitlines()
+        except OSError as e:
+            logger.warning(f"Skipping {path}: {e}")
+            continue
+        section = ''
+        for start in range(0, len(lines), lines_per_chunk):
+            window = lines[start:start + lines_per_chunk]
+            for line in window:
+                if line.startswith('#'):
+                    section = line.lstrip('#').strip()
+                    break
+            if not any(line.strip() for line in window):
+                continue
+            chunks.append(VirtualChunk(
+                chunk_id=f"{path.as_posix()}:{start + 1}",
+                file_path=str(path),
+                start_line=start,
+                end_line=start + len(window) - 1,
+                vector_offset=0,
+                vector_size=0,
+                section=section,
+            ))
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build an MCP v6 snapshot with a pipelined, multi-threaded index build")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--source', help="Directory of source files to chunk and embed")
+    source.add_argument('--synthetic', type=int, help="Benchmark with N synthetic vectors (no model)")
+    parser.add_argument('--pattern', action='append', help="Glob for --source files (default *.md)")
+    parser.add_argument('--output', default='snapshot_build.mp4', help="Snapshot file name (under ./data)")
+    parser.add_argument('--config', default=str(Path(__file__).resolve().parents[2] / 'config' / 'v6_config.json'))
+    parser.add_argument('--threads', type=int, help="hnswlib add_items threads (default hnsw.build_threads)")
+    parser.add_argument('--batch-size', type=int, default=1024)
+    parser.add_argument('--dim', type=int, default=384)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    from .vector_engine import VectorEngine
+
+    config = json.loads(Path(args.config).read_text()) if os.path.exists(args.config) else {}
+    config.setdefault('ann', {})['backend'] = 'hnsw'
+    if args.threads is not None:
+        config.setdefault('hnsw', {})['build_threads'] = args.threads
+
+    embed_fn = None
+    texts = None
+    if args.synthetic:
+        from .compression_benchmark import synthetic_embeddings
+        config.setdefault('embedding', {})['dimension'] = args.dim
+        matrix = synthetic_embeddings(args.synthetic, args.dim)
+        chunks = [VirtualChunk(chunk_id=str(i), file_path='', start_line=0, end_line=0,
+                               vector_offset=0, vector_size=0) for i in range(len(matrix))]
+        # Texts carry the row number; the "model" returns the matching precomputed rows
+        texts = [str(i) for i in range(len(matrix))]
+        embed_fn = lambda batch: matrix[int(batch[0]):int(batch[-1]) + 1]
+    else:
+        chunks = chunk_source_files(args.source, tuple(args.pattern or ['*.md']))
+        if not chunks:
+            raise SystemExit(f"No chunks found under {args.source}")
+
+    engine = VectorEngine(config)
+    storage = MP4Storage(args.output)
+    builder = SnapshotBuilder(engine, storage, batch_size=args.batch_size, embed_fn=embed_fn)
+    report = builder.build(chunks, texts=texts)
+    storage.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""
+Source Text Service for MCP v6
+Shared line-offset index and LRU text cache behind VirtualChunk.get_text
+"""
+
+import os
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class _FileEntry:
+    """Line offsets of one source file at a given (size, mtime)"""
+    __slots__ = ('size', 'mtime_ns', 'offsets')
+
+    def __init__(self, size: int, mtime_ns: int, offsets: np.ndarray):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        # offsets[i] is the byte where line i starts; offsets[-1] is the file size
+        self.offsets = offsets
+
+
+class SourceTextCache:
+    """
+    Serves line ranges of source files without re-reading whole files
+
+    - A per-file line-offset table turns a chunk into one seek/read
+    - Hot file contents are kept in an LRU bounded by total bytes
+    - Every entry is validated against (size, mtime_ns) before use
+    - get_texts() groups requests by file: one stat/open per distinct file
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_files: int = 4096):
+        """
+        Args:
+            max_bytes: Budget for cached file contents
+            max_files: Maximum number of line-offset tables kept
+        """
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+
+        self._entries: 'OrderedDict[str, _FileEntry]' = OrderedDict()
+        self._contents: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._content_bytes = 0
+        self._lock = threading.RLock()
+
+        self.stats = {'hits': 0, 'misses': 0, 'reads': 0, 'invalidations': 0}
+
+    @staticmethod
+    def _line_offsets(data: bytes) -> np.ndarray:
+        """Compute line start offsets (plus a final end offset) for a file"""
+        newlines = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == 0x0A) + 1
+        offsets = np.empty(len(newlines) + 2, dtype=np.int64)
+        offsets[0] = 0
+        offsets[1:-1] = newlines
+        offsets[-1] = len(data)
+        # A trailing newline does not start an extra (empty) line
+        if len(newlines) and newlines[-1] == len(data):
+            offsets = offsets[:-1]
+        return offsets
+
+    def _lookup(self, path: str, stat: os.stat_result) -> Optional[_FileEntry]:
+        """Get a still-valid entry for path, dropping it if the file changed"""
+        entry = self._entries.get(path)
+        if entry is None:
+            return None
+
+        if entry.size != stat.st_size or entry.mtime_ns != stat.st_mtime_ns:
+            self._drop(path)
+            self.stats['invalidations'] += 1
+            return None
+
+        self._entries.move_to_end(path)
+        if path in self._contents:
+            self._contents.move_to_end(path)
+        return entry
+
+    def _drop(self, path: str):
+        """Forget offsets and contents of a file"""
+        self._entries.pop(path, None)
+        data = self._contents.pop(path, None)
+        if data is not None:
+            self._content_bytes -= len(data)
+
+    def _store(self, path: str, stat: os.stat_result, data: bytes) -> _FileEntry:
+        """Index a freshly read file and cache its contents if they fit"""
+        entry = _FileEntry(stat.st_size, stat.st_mtime_ns, self._line_offsets(data))
+        self._drop(path)
+        self._entries[path] = entry
+        while len(self._entries) > self.max_files:
+            self._drop(next(iter(self._entries)))
+
+        if len(data) <= self.max_bytes:
+            self._contents[path] = data
+            self._content_bytes += len(data)
+            while self._content_bytes > self.max_bytes:
+                _, evicted = self._contents.popitem(last=False)
+                self._content_bytes -= len(evicted)
+        return entry
+
+    @staticmethod
+    def _byte_range(entry: _FileEntry, start_line: int, end_line: int) -> Tuple[int, int]:
+        """Byte range of lines[start_line:end_line + 1] (list slicing semantics)"""
+        num_lines = len(entry.offsets) - 1
+        first = min(max(start_line, 0), num_lines)
+        last = min(max(end_line + 1, first), num_lines)
+        return int(entry.offsets[first]), int(entry.offsets[last])
+
+    @staticmethod
+    def _decode(data: bytes) -> str:
+        """Decode a line range like text-mode reading would, then strip it"""
+        text = data.decode('utf-8', errors='replace')
+        return text.replace('\r\n', '\n').strip()
+
+    def get_texts(self, requests: Sequence[Tuple[str, int, int]]) -> List[str]:
+        """
+        Fetch several line ranges, opening each distinct file at most once
+
+        Args:
+            requests: (file_path, start_line, end_line) tuples, end inclusive
+
+        Returns:
+            Stripped texts aligned with requests ('' for unreadable files)
+        """
+        results = [''] * len(requests)
+        by_file: Dict[str, List[int]] = {}
+        for i, (path, _, _) in enumerate(requests):
+            by_file.setdefault(path, []).append(i)
+
+        for path, indices in by_file.items():
+            try:
+                self._fill_from_file(path, indices, requests, results)
+            except (IOError, OSError) as e:
+                logger.error(f"Error reading chunk text from {path}: {e}")
+
+        return results
+
+    def _fill_from_file(self, path: str, indices: List[int],
+                        requests: Sequence[Tuple[str, int, int]], results: List[str]):
+        """Serve all requests for one file from cache or a single open"""
+        with self._lock:
+            stat = os.stat(path)
+            entry = self._lookup(path, stat)
+            data = self._contents.get(path) if entry is not None else None
+
+            if entry is None:
+                self.stats['misses'] += 1
+                self.stats['reads'] += 1
+                with open(path, 'rb') as f:
+                    data = f.read()
+                entry = self._store(path, stat, data)
+            else:
+                self.stats['hits'] += 1
+
+        if data is not None:
+            for i in indices:
+                begin, end = self._byte_range(entry, requests[i][1], requests[i][2])
+                results[i] = self._decode(data[begin:end])
+            return
+
+        # Offsets known but contents evicted: one open, one seek/read per range
+        self.stats['reads'] += 1
+        with open(path, 'rb') as f:
+            for i in indices:
+                begin, end = self._byte_range(entry, requests[i][1], requests[i][2])
+                f.seek(begin)
+                results[i] = self._decode(f.read(end - begin))
+
+    def get_text(self, file_path: str, start_line: int, end_line: int) -> str:
+        """Fetch lines[start_line:end_line + 1] of a file as stripped text"""
+        return self.get_texts([(file_path, start_line, end_line)])[0]
+
+    def get_chunk_texts(self, chunks: Sequence) -> List[str]:
+        """Batch version of VirtualChunk.get_text for a result set"""
+        return self.get_texts([(c.file_path, c.start_line, c.end_line) for c in chunks])
+
+    def invalidate(self, file_path: Optional[str] = None):
+        """Drop one file (or everything) from the cache"""
+        with self._lock:
+            if file_path is None:
+                self._entries.clear()
+                self._contents.clear()
+                self._content_bytes = 0
+            else:
+                self._drop(file_path)
+
+    def get_stats(self) -> Dict:
+        """Cache statistics"""
+        with self._lock:
+            return {
+                **self.stats,
+                'files_indexed': len(self._entries),
+                'files_cached': len(self._contents),
+                'cached_bytes': self._content_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+# Instancia global del servicio de texto fuente
+source_text_cache = SourceTextCache()
+
+
+def get_source_text_cache() -> SourceTextCache:
+    """Obtiene instancia global del servicio de texto fuente"""
+    return source_text_cache
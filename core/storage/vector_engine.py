@@ -1,79 +1,137 @@
 """
 Vector Engine for MCP v5
-Handles HNSW indexing, vector search, and embedding operations
+Handles ANN indexing (HNSW or exact, see ann_backends.py), vector search, and embedding operations
 """
 
 import numpy as np
-import hnswlib
-from typing import List, Tuple, Optional, Dict
-from sentence_transformers import SentenceTransformer
+from typing import AbstractSet, Callable, List, Tuple, Optional, Dict, Union
 import logging
 import pickle
+import struct
+import time
+from datetime import datetime
+
+from .embedding_service import EmbeddingService, get_embedding_service
+from .ann_backends import ANNBackend, HNSWBackend, ExactBackend, select_backend, create_backend, load_backend
 
 logger = logging.getLogger(__name__)
 
+# Binary id map: magic, version, reserved, count | int64 labels | uint32 heap offsets | utf-8 heap
+# Version 2 appends the label allocator state (next_label) to the header
+ID_MAP_MAGIC = b'MCPL'
+ID_MAP_VERSION = 2
+ID_MAP_HEADER = struct.Struct('<4sHHQ')
+ID_MAP_ALLOCATOR = struct.Struct('<Q')
+
+# ef_search values tried by tune_ef_search, ascending
+EF_CANDIDATES = (10, 16, 24, 32, 48, 64, 96, 128, 192, 256, 384, 512, 768, 1024)
+
+# Rank offset of reciprocal rank fusion (Cormack et al.; 60 is the usual default)
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(ids: np.ndarray, scores: np.ndarray, top_k: int, rrf_k: int = RRF_K,
+                           weights: Optional[List[float]] = None) -> List[Dict]:
+    """
+    Merge per-query ranked lists with reciprocal rank fusion
+    
+    A chunk at rank r (0-based) in list q earns weights[q] / (rrf_k + r + 1).
+    
+    Args:
+        ids: Chunk ids (Q x k), padded with None (search_batch output)
+        scores: Similarities (Q x k), aligned with ids
+        top_k: Fused results to return
+        rrf_k: Rank offset; larger values flatten the rank curve
+        weights: Per-list weights (default 1.0 each)
+    
+    Returns:
+        Dicts with chunk_id, rrf_score, score (best similarity over the
+        lists) and hits (lists that contained the chunk), best first
+    """
+    weights = weights if weights is not None else [1.0] * len(ids)
+    fused: Dict[str, List[float]] = {}
+    for row_ids, row_scores, weight in zip(ids, scores, weights):
+        for rank, (chunk_id, score) in enumerate(zip(row_ids, row_scores)):
+            if chunk_id is None:
+                break
+            entry = fused.get(chunk_id)
+            if entry is None:
+                fused[chunk_id] = [weight / (rrf_k + rank + 1), float(score), 1]
+            else:
+                entry[0] += weight / (rrf_k + rank + 1)
+                entry[1] = max(entry[1], float(score))
+                entry[2] += 1
+    
+    # Ties on the fused score go to the higher similarity
+    ranked = sorted(fused.items(), key=lambda item: (-item[1][0], -item[1][1]))[:top_k]
+    return [{'chunk_id': chunk_id, 'rrf_score': rrf, 'score': score, 'hits': hits}
+            for chunk_id, (rrf, score, hits) in ranked]
+
 
 class VectorEngine:
     """
-    Manages vector embeddings and HNSW-based similarity search
+    Manages vector embeddings and ANN similarity search
+    
+    The index is an ANNBackend chosen by ann.backend ('hnsw', 'exact' or
+    'auto' by corpus size); the engine owns the label <-> chunk_id maps.
     """
     
-    def __init__(self, config: Dict):
+    def __init__(self, config: Dict, embedding_service: Optional[EmbeddingService] = None):
         """
         Initialize vector engine
         
         Args:
             config: Configuration dict with embedding and HNSW params
+            embedding_service: Shared model owner; defaults to the process-wide one
         """
         self.config = config
-        self.dimension = config.get('embedding', {}).get('dimension', 384)
-        self.model_name = config.get('embedding', {}).get('model', 'sentence-transformers/all-MiniLM-L6-v2')
-        self.normalize = config.get('embedding', {}).get('normalize', True)
-        self.dtype = config.get('embedding', {}).get('dtype', 'float16')
-        
-        # HNSW parameters
-        hnsw_config = config.get('hnsw', {})
-        self.ef_construction = hnsw_config.get('ef_construction', 200)
-        self.M = hnsw_config.get('M', 16)
-        self.ef_search = hnsw_config.get('ef_search', 50)
+        # All engines embed through one service, so the model is loaded once
+        self.embedding_service = embedding_service or get_embedding_service(config)
+        self.dimension = self.embedding_service.dimension
+        self.model_name = self.embedding_service.model_name
+        self.normalize = self.embedding_service.normalize
+        self.dtype = self.embedding_service.dtype
+        
+        # HNSW parameters (also growth_factor, filter_exact_max, filter_max_ef; see HNSWBackend)
+        self.hnsw_config = config.get('hnsw', {})
+        self.ef_construction = self.hnsw_config.get('ef_construction', 200)
+        self.M = self.hnsw_config.get('M', 16)
+        self.ef_search = self.hnsw_config.get('ef_search', 50)
+        # Threads used by batched queries (-1 = all cores)
+        self.num_threads = self.hnsw_config.get('num_threads', -1)
+        # Last ef_search tuning report (tune_ef_search or snapshot metadata)
+        self.ef_tuning: Optional[Dict] = None
+        
+        # Backend selection: 'hnsw', 'exact' or 'auto' (exact up to exact_max_vectors)
+        ann_config = config.get('ann', {})
+        self.backend_name = ann_config.get('backend', 'hnsw')
+        self.exact_max_vectors = ann_config.get('exact_max_vectors', 20000)
+        self.exact_config = {'growth_factor': self.hnsw_config.get('growth_factor', 1.5),
+                             'exact_block_rows': ann_config.get('exact_block_rows', 65536)}
         
         # Lazy-load embedding model (avoid blocking initialization)
         logger.info(f"VectorEngine configured for model: {self.model_name}")
         logger.info("Model will be loaded on first use (lazy loading)")
-        self._model: Optional[SentenceTransformer] = None
         
-        # HNSW index
-        self.index: Optional[hnswlib.Index] = None
+        # ANN index (an ANNBackend)
+        self.index: Optional[ANNBackend] = None
         self.id_to_chunk_id: Dict[int, str] = {}
         self.chunk_id_to_id: Dict[str, int] = {}
+        # Monotonic label allocator: labels are never reused, even after deletes
+        self.next_label = 0
         
         logger.info(f"VectorEngine initialized with dimension={self.dimension}")
     
     @property
-    def model(self) -> SentenceTransformer:
-        """Lazy-load the embedding model on first access"""
-        if self._model is None:
-            logger.info(f"Loading embedding model: {self.model_name}")
-            logger.info("This may take 10-30 seconds on first run...")
-            self._model = SentenceTransformer(self.model_name)
-            logger.info("Model loaded successfully!")
-        return self._model
+    def model(self):
+        """Shared embedding model (loaded by the EmbeddingService on first access)"""
+        return self.embedding_service.model
     
     def embed_text(self, text: str) -> np.ndarray:
         """
         Generate embedding for text
         """
-        embedding = self.model.encode(text, convert_to_numpy=True)
-        
-        if self.normalize:
-            norm = np.linalg.norm(embedding)
-            if norm > 0:
-                embedding = embedding / norm
-        
-        if self.dtype == 'float16':
-            embedding = embedding.astype(np.float16)
-        
-        return embedding
+        return self.embedding_service.encode(text)
 
     def embed_query(self, query: str) -> np.ndarray:
         """v9 Compatibility: Alias for embed_text"""
@@ -92,47 +150,67 @@ class VectorEngine:
             
         return float(np.dot(v1, v2) / (norm1 * norm2))
     
-    def embed_batch(self, texts: List[str]) -> np.ndarray:
+    def cosine_similarities(self, query_vector: np.ndarray, vectors: np.ndarray) -> np.ndarray:
         """
-        Generate embeddings for batch of texts
+        Cosine similarity of one vector against every row of a matrix
         
         Args:
-            texts: List of input texts
+            query_vector: Query embedding (dimension,)
+            vectors: Candidate embeddings (N x dimension)
         
         Returns:
-            Array of embeddings
+            float32 similarities (N,)
         """
-        embeddings = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=True)
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, query_vector.shape[-1])
+        norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query_vector)
+        return (vectors @ query_vector) / np.where(norms > 0, norms, 1)
+    
+    def embed_batch(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        """
+        Generate embeddings for batch of texts
         
-        if self.normalize:
-            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
-            embeddings = embeddings / norms
+        Large batches are length-bucketed by the EmbeddingService and
+        returned in input order.
         
-        if self.dtype == 'float16':
-            embeddings = embeddings.astype(np.float16)
+        Args:
+            texts: List of input texts
+            show_progress_bar: Show a transient progress bar (off by default)
         
-        return embeddings
+        Returns:
+            Array of embeddings
+        """
+        return self.embedding_service.encode(texts, show_progress_bar=show_progress_bar)
+    
+    def resolve_backend(self, num_elements: int) -> str:
+        """Backend used for a corpus of num_elements vectors"""
+        return select_backend(self.backend_name, num_elements, self.exact_max_vectors)
+    
+    def _new_backend(self, name: str) -> ANNBackend:
+        return create_backend(name, self.dimension, self.hnsw_config if name == 'hnsw' else self.exact_config)
     
     def create_index(self, num_elements: int):
         """
-        Create new HNSW index
+        Create new empty index
         
         Args:
-            num_elements: Expected number of vectors
+            num_elements: Expected number of vectors (also drives 'auto' backend selection)
         """
-        self.index = hnswlib.Index(space='cosine', dim=self.dimension)
-        self.index.init_index(
-            max_elements=num_elements,
-            ef_construction=self.ef_construction,
-            M=self.M
-        )
-        self.index.set_ef(self.ef_search)
-        
-        logger.info(f"Created HNSW index for {num_elements} elements")
+        self.index = self._new_backend(self.resolve_backend(num_elements))
+        self.index.build(num_elements)
+        self.apply_ef_tuning(self.ef_tuning)
+        self.id_to_chunk_id = {}
+        self.chunk_id_to_id = {}
+        self.next_label = 0
+        
+        logger.info(f"Created {self.index.name} index for {num_elements} elements")
     
     def add_vectors(self, vectors: np.ndarray, chunk_ids: List[str]):
         """
-        Add vectors to HNSW index
+        Add vectors to the index
+        
+        Labels come from a monotonic allocator, so repeated calls append
+        instead of overwriting. Re-adding an existing chunk_id replaces it.
         
         Args:
             vectors: Array of vectors (N x dimension)
@@ -140,31 +218,82 @@ class VectorEngine:
         """
         if self.index is None:
             raise ValueError("Index not initialized. Call create_index first.")
+        if len(vectors) != len(chunk_ids):
+            raise ValueError(f"Got {len(vectors)} vectors for {len(chunk_ids)} chunk ids")
         
-        # Convert float16 to float32 for HNSW
+        # Convert float16 to float32 for the index
         if vectors.dtype == np.float16:
             vectors = vectors.astype(np.float32)
         
-        # Create internal IDs
-        internal_ids = np.arange(len(chunk_ids))
+        # Updated chunks: retire their old label first
+        self.remove_chunks([chunk_id for chunk_id in chunk_ids if chunk_id in self.chunk_id_to_id])
+        
+        # Allocate new internal IDs
+        internal_ids = np.arange(self.next_label, self.next_label + len(chunk_ids), dtype=np.int64)
+        self.next_label += len(chunk_ids)
         
-        # Add to index
-        self.index.add_items(vectors, internal_ids)
+        self.index.add(vectors, internal_ids)
         
         # Update mappings
-        for internal_id, chunk_id in zip(internal_ids, chunk_ids):
-            self.id_to_chunk_id[int(internal_id)] = chunk_id
-            self.chunk_id_to_id[chunk_id] = int(internal_id)
+        for internal_id, chunk_id in zip(internal_ids.tolist(), chunk_ids):
+            self.id_to_chunk_id[internal_id] = chunk_id
+            self.chunk_id_to_id[chunk_id] = internal_id
         
         logger.info(f"Added {len(vectors)} vectors to index")
     
-    def search(self, query_vector: np.ndarray, top_k: int = 5) -> Tuple[List[str], List[float]]:
+    def remove_chunks(self, chunk_ids: List[str]) -> int:
+        """
+        Mark chunks as deleted so they no longer appear in search results
+        
+        Args:
+            chunk_ids: Chunk IDs to remove (unknown ids are ignored)
+        
+        Returns:
+            Number of chunks removed
+        """
+        if self.index is None:
+            return 0
+        
+        labels = [self.chunk_id_to_id.pop(chunk_id) for chunk_id in chunk_ids if chunk_id in self.chunk_id_to_id]
+        for label in labels:
+            del self.id_to_chunk_id[label]
+        if labels:
+            self.index.delete(labels)
+            logger.info(f"Marked {len(labels)} vectors as deleted")
+        return len(labels)
+    
+    def load_vectors(self, vectors: np.ndarray, chunk_ids: List[str]):
+        """
+        Index a stored vector matrix (row i = chunk_ids[i]), e.g. the snapshot's mmapped vectors
+        
+        The exact backend searches the matrix in place, without copying or
+        building anything; other backends insert the rows.
+        """
+        self.id_to_chunk_id = dict(enumerate(chunk_ids))
+        self.chunk_id_to_id = {chunk_id: label for label, chunk_id in self.id_to_chunk_id.items()}
+        self.next_label = len(chunk_ids)
+        
+        name = self.resolve_backend(len(chunk_ids))
+        self.index = self._new_backend(name)
+        if name == 'exact' and self.normalize:
+            self.index.attach(vectors)
+        else:
+            self.index.build(len(chunk_ids))
+            for start in range(0, len(chunk_ids), 10000):
+                self.index.add(np.asarray(vectors[start:start + 10000], dtype=np.float32),
+                               np.arange(start, min(start + 10000, len(chunk_ids)), dtype=np.int64))
+        self.apply_ef_tuning(self.ef_tuning)
+        logger.info(f"Loaded {len(chunk_ids)} stored vectors into the {name} backend")
+    
+    def search(self, query_vector: np.ndarray, top_k: int = 5,
+               filter: Optional[AbstractSet[str]] = None) -> Tuple[List[str], List[float]]:
         """
         Search for similar vectors
         
         Args:
             query_vector: Query embedding vector
             top_k: Number of results to return
+            filter: Optional set of allowed chunk ids (see search_batch)
         
         Returns:
             (chunk_ids, distances) tuple
@@ -173,27 +302,101 @@ class VectorEngine:
              # Retornar vacío si no hay índice todavía
             return [], []
         
-        # Convert float16 to float32 for search
-        if query_vector.dtype == np.float16:
-            query_vector = query_vector.astype(np.float32)
-        
-        # Reshape for HNSW
-        query_vector = query_vector.reshape(1, -1)
-        
-        # Search
         try:
-            labels, distances = self.index.knn_query(query_vector, k=min(top_k, len(self.id_to_chunk_id)))
-            
-            # Convert internal IDs to chunk IDs
-            chunk_ids = [self.id_to_chunk_id[int(label)] for label in labels[0]]
-            scores = [float(1.0 - dist) for dist in distances[0]]  # Convert distance to similarity
-            
-            return chunk_ids, scores
+            ids, scores = self.search_batch(query_vector.reshape(1, -1), top_k, filter=filter, num_threads=1)
         except Exception as e:
             logger.error(f"Error in vector search: {e}")
             return [], []
+        
+        found = [i for i, chunk_id in enumerate(ids[0]) if chunk_id is not None]
+        return [ids[0][i] for i in found], [float(scores[0][i]) for i in found]
+    
+    def search_batch(self, queries: np.ndarray, k: int = 5,
+                     filter: Optional[Union[Callable[[str], bool], AbstractSet[str]]] = None,
+                     num_threads: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search many query vectors in one knn_query call (parallel across queries)
+        
+        Args:
+            queries: Query embeddings (Q x dimension), float16 or float32
+            k: Results per query
+            filter: Optional chunk restriction: a set of allowed chunk ids
+                    (e.g. MP4Storage.select_chunk_ids) or a predicate on chunk_id
+            num_threads: Worker threads (default hnsw.num_threads)
+        
+        Returns:
+            (chunk_ids, scores): object array (Q x k) and float32 similarities
+            (Q x k), row-aligned with queries. Rows with fewer than k hits are
+            padded with None / NaN.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries.reshape(1, -1)
+        
+        ids = np.full((len(queries), k), None, dtype=object)
+        scores = np.full((len(queries), k), np.nan, dtype=np.float32)
+        if self.index is None or not self.id_to_chunk_id or len(queries) == 0 or k == 0:
+            return ids, scores
+        
+        allowed = None if filter is None else self._allowed_labels(filter)
+        threads = self.num_threads if num_threads is None else num_threads
+        labels, distances = self.index.search_batch(queries, k, allowed=allowed, num_threads=threads)
+        
+        found = labels >= 0
+        id_map = self.id_to_chunk_id
+        ids[found] = [id_map[label] for label in labels[found].tolist()]
+        scores[found] = 1.0 - distances[found]  # Convert distance to similarity
+        return ids, scores
+    
+    def _allowed_labels(self, filter) -> np.ndarray:
+        """Live labels admitted by a chunk-id set or predicate"""
+        if callable(filter):
+            labels = [label for label, chunk_id in self.id_to_chunk_id.items() if filter(chunk_id)]
+        else:
+            id_map = self.chunk_id_to_id
+            labels = [id_map[chunk_id] for chunk_id in filter if chunk_id in id_map]
+        return np.array(labels, dtype=np.int64)
+    
+    def search_queries(self, queries: List[str], top_k: int = 5,
+                       filter: Optional[Callable[[str], bool]] = None) -> List[List[Dict]]:
+        """
+        Embed several text queries in one batch and search them together
+        
+        Returns:
+            One search_with_mvr-style result list per query
+        """
+        if not queries:
+            return []
+        ids, scores = self.search_batch(self.embed_batch(queries), top_k, filter=filter)
+        return [
+            [{'chunk_id': chunk_id, 'score': float(score)}
+             for chunk_id, score in zip(row_ids, row_scores) if chunk_id is not None]
+            for row_ids, row_scores in zip(ids, scores)
+        ]
 
-    def search_with_mvr(self, query: str, top_k: int = 5) -> List[Dict]:
+    def search_fused(self, queries: np.ndarray, top_k: int = 5,
+                     filter: Optional[Union[Callable[[str], bool], AbstractSet[str]]] = None,
+                     per_query_k: Optional[int] = None, rrf_k: int = RRF_K,
+                     weights: Optional[List[float]] = None) -> List[Dict]:
+        """
+        Multi-query retrieval: one batched ANN search, merged with reciprocal rank fusion
+        
+        Args:
+            queries: Embeddings of the query and its alternative phrasings (Q x dimension)
+            top_k: Fused results to return
+            filter: Chunk restriction, as in search_batch
+            per_query_k: Depth of each ranked list (default top_k)
+            rrf_k: RRF rank offset
+            weights: Per-query weights, e.g. lower for expansions
+        
+        Returns:
+            reciprocal_rank_fusion result dicts
+        """
+        ids, scores = self.search_batch(queries, max(top_k, per_query_k or top_k), filter=filter)
+        return reciprocal_rank_fusion(ids, scores, top_k, rrf_k=rrf_k, weights=weights)
+    
+    def search_with_mvr(self, query: str, top_k: int = 5,
+                        filter: Optional[AbstractSet[str]] = None) -> List[Dict]:
         """
         v9: Search using Multi-Vector Retrieval if query is string
         Falls back to standard search if MVR system is not available
@@ -202,7 +405,7 @@ class VectorEngine:
         query_vector = self.embed_text(query)
         
         # Búsqueda estándar
-        chunk_ids, scores = self.search(query_vector, top_k=top_k)
+        chunk_ids, scores = self.search(query_vector, top_k=top_k, filter=filter)
         
         # Formatear resultados para el servidor V6
         results = []
@@ -214,9 +417,216 @@ class VectorEngine:
             
         return results
     
+    def tune_ef_search(self, recall_target: float = 0.95, k: int = 10, sample_size: int = 200,
+                       candidates: Optional[List[int]] = None, seed: int = 0) -> Dict:
+        """
+        Pick the smallest ef_search that reaches a recall@k target
+        
+        Stored corpus vectors are sampled as queries; ground truth is exact
+        brute force over every live vector (in blocks, to bound memory).
+        Each query's own label is excluded from both result lists. The
+        chosen ef is applied to the index.
+        
+        Args:
+            recall_target: Required mean recall@k (0-1)
+            k: Recall cut-off
+            sample_size: Number of sampled queries
+            candidates: ef values to try, ascending (default EF_CANDIDATES)
+            seed: Sampling seed
+        
+        Returns:
+            Tuning report (stored in the snapshot as 'hnsw_tuning')
+        """
+        if not isinstance(self.index, HNSWBackend):
+            raise ValueError("ef_search tuning only applies to the hnsw backend")
+        if len(self.id_to_chunk_id) <= k:
+            raise ValueError("Index too small to tune ef_search")
+        
+        labels = np.fromiter(self.id_to_chunk_id, dtype=np.int64, count=len(self.id_to_chunk_id))
+        rng = np.random.default_rng(seed)
+        sample = rng.choice(labels, size=min(sample_size, len(labels)), replace=False)
+        queries = self.index.get_vectors(sample)
+        exact = self._exact_neighbours(queries, sample, labels, k)
+        
+        candidates = sorted(c for c in (candidates or EF_CANDIDATES) if c >= k)
+        curve = []
+        chosen = None
+        for ef in candidates:
+            start = time.perf_counter()
+            found, _ = self.index.search_batch(queries, k + 1, num_threads=self.num_threads, ef=ef)
+            elapsed = time.perf_counter() - start
+            hits = sum(len(set(row[row != own][:k].tolist()) & truth)
+                       for row, own, truth in zip(found, sample, exact))
+            recall = hits / (k * len(sample))
+            curve.append({'ef': ef, 'recall': round(recall, 4),
+                          'query_ms': round(elapsed * 1000 / len(sample), 4)})
+            if recall >= recall_target:
+                chosen = curve[-1]
+                break
+        
+        if chosen is None:
+            # Target not reachable with the candidates: use the best one tried
+            chosen = curve[-1]
+            logger.warning(f"ef_search tuning: recall@{k} target {recall_target} not reached "
+                           f"(best {chosen['recall']} at ef={chosen['ef']})")
+        
+        report = {
+            'ef_search': chosen['ef'],
+            'recall': chosen['recall'],
+            'recall_target': recall_target,
+            'k': k,
+            'sample_size': len(sample),
+            'num_vectors': len(labels),
+            'M': self.M,
+            'ef_construction': self.ef_construction,
+            'curve': curve,
+            'tuned_at': datetime.now().isoformat(),
+        }
+        self.apply_ef_tuning(report)
+        logger.info(f"ef_search tuned to {chosen['ef']} (recall@{k}={chosen['recall']})")
+        return report
+    
+    def _exact_neighbours(self, queries: np.ndarray, query_labels: np.ndarray,
+                          labels: np.ndarray, k: int, block_rows: int = 16384) -> List[set]:
+        """Exact top-k labels per query (self excluded), scanning the stored vectors in blocks"""
+        best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        best_labels = np.full((len(queries), k), -1, dtype=np.int64)
+        for start in range(0, len(labels), block_rows):
+            block = labels[start:start + block_rows]
+            scores = queries @ self.index.get_vectors(block).T
+            scores[query_labels[:, None] == block[None, :]] = -np.inf
+            merged_scores = np.concatenate([best_scores, scores], axis=1)
+            merged_labels = np.concatenate([best_labels, np.broadcast_to(block, scores.shape)], axis=1)
+            top = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(merged_scores, top, axis=1)
+            best_labels = np.take_along_axis(merged_labels, top, axis=1)
+        return [set(row.tolist()) for row in best_labels]
+    
+    def apply_ef_tuning(self, tuning: Optional[Dict]) -> bool:
+        """
+        Use the ef_search from a tuning report (e.g. snapshot metadata)
+        
+        Returns:
+            True if the report was applied
+        """
+        ef = (tuning or {}).get('ef_search')
+        if not isinstance(ef, int) or ef <= 0:
+            return False
+        self.ef_search = ef
+        self.ef_tuning = tuning
+        if isinstance(self.index, HNSWBackend):
+            self.index.set_ef(ef)
+        return True
+    
+    def save_index(self, path: str):
+        """
+        Save the index straight to a file that load_index can reopen
+        
+        Args:
+            path: Destination file (usually the snapshot's .hnsw sidecar)
+        """
+        if self.index is None:
+            raise ValueError("Index not initialized. Call create_index first.")
+        
+        self.index.save(path)
+        logger.info(f"{self.index.name} index saved to {path}")
+    
+    def serialize_id_map(self) -> bytes:
+        """
+        Serialize label -> chunk_id mappings as a compact binary array
+        
+        Returns:
+            Header + int64 labels + uint32 string offsets + utf-8 chunk id heap
+        """
+        labels = np.fromiter(sorted(self.id_to_chunk_id), dtype='<i8', count=len(self.id_to_chunk_id))
+        encoded = [self.id_to_chunk_id[int(label)].encode('utf-8') for label in labels]
+        
+        offsets = np.zeros(len(encoded) + 1, dtype='<u4')
+        if encoded:
+            np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        
+        header = ID_MAP_HEADER.pack(ID_MAP_MAGIC, ID_MAP_VERSION, 0, len(labels))
+        header += ID_MAP_ALLOCATOR.pack(self.next_label)
+        return header + labels.tobytes() + offsets.tobytes() + b''.join(encoded)
+    
+    def _load_id_map(self, data) -> bool:
+        """
+        Load mappings written by serialize_id_map
+        
+        Args:
+            data: bytes or memoryview (e.g. a slice of the snapshot mmap)
+        
+        Returns:
+            False if data is not a binary id map
+        """
+        if len(data) < ID_MAP_HEADER.size:
+            return False
+        
+        magic, version, _, count = ID_MAP_HEADER.unpack_from(data, 0)
+        if magic != ID_MAP_MAGIC:
+            return False
+        if version > ID_MAP_VERSION:
+            raise ValueError(f"Unsupported id map version: {version}")
+        
+        pos = ID_MAP_HEADER.size
+        next_label = None
+        if version >= 2:
+            next_label = ID_MAP_ALLOCATOR.unpack_from(data, pos)[0]
+            pos += ID_MAP_ALLOCATOR.size
+        labels = np.frombuffer(data, dtype='<i8', count=count, offset=pos)
+        pos += labels.nbytes
+        offsets = np.frombuffer(data, dtype='<u4', count=count + 1, offset=pos)
+        pos += offsets.nbytes
+        heap = bytes(data[pos:pos + int(offsets[-1])])
+        
+        self.id_to_chunk_id = {}
+        self.chunk_id_to_id = {}
+        for i, label in enumerate(labels.tolist()):
+            chunk_id = heap[offsets[i]:offsets[i + 1]].decode('utf-8')
+            self.id_to_chunk_id[label] = chunk_id
+            self.chunk_id_to_id[chunk_id] = label
+        
+        # Version 1 maps predate the allocator: continue after the highest label
+        self._restore_allocator(next_label)
+        return True
+    
+    def _restore_allocator(self, next_label: Optional[int] = None):
+        """Resume label allocation after a load"""
+        highest = max(self.id_to_chunk_id, default=-1) + 1
+        self.next_label = max(next_label or 0, highest)
+    
+    def load_index(self, path: str, id_map, num_elements: int):
+        """
+        Load the index directly from a file, without intermediate copies
+        
+        The backend is recognized from the file (HNSW graph or exact .npy matrix).
+        
+        Args:
+            path: Index file written by save_index
+            id_map: Binary mappings from serialize_id_map (bytes or memoryview)
+            num_elements: Number of elements in index
+        """
+        if not self._load_id_map(id_map):
+            raise ValueError("Invalid id map: missing MCPL header")
+        
+        self._open_backend(path, num_elements)
+        
+        logger.info(f"Loaded {self.index.name} index with {len(self.id_to_chunk_id)} vectors from {path}")
+    
+    def _open_backend(self, path: str, num_elements: int):
+        """Load a saved backend and sync it with the id map just loaded"""
+        configs = {'hnsw': self.hnsw_config, 'exact': self.exact_config}
+        self.index = load_backend(path, self.dimension, configs, num_elements)
+        if isinstance(self.index, HNSWBackend):
+            self.index.live = len(self.id_to_chunk_id)
+        self.apply_ef_tuning(self.ef_tuning)
+    
     def serialize_index(self) -> bytes:
         """
-        Serialize HNSW index to bytes
+        Serialize HNSW index to bytes (legacy single-blob format)
+        
+        Prefer save_index() + serialize_id_map(), which avoid holding the
+        whole graph in memory and can be loaded with load_index().
         
         Returns:
             Serialized index as bytes
@@ -232,7 +642,7 @@ class VectorEngine:
             tmp_path = tmp.name
         
         try:
-            self.index.save_index(tmp_path)
+            self.index.save(tmp_path)
             
             with open(tmp_path, 'rb') as f:
                 index_bytes = f.read()
@@ -254,19 +664,21 @@ class VectorEngine:
     
     def load_index_from_bytes(self, data: bytes, num_elements: int):
         """
-        Load HNSW index from bytes
+        Load HNSW index from bytes (legacy single-blob format)
         
         Args:
-            data: Serialized index data
+            data: Serialized index data (bytes or memoryview)
             num_elements: Number of elements in index
         """
         import tempfile
         import os
         
+        data = memoryview(data)
+        
         # Extract separator
         separator = int.from_bytes(data[:8], 'big')
         
-        # Extract index bytes and mappings
+        # Extract index bytes and mappings (views, no copies)
         index_bytes = data[8:8+separator]
         mappings_bytes = data[8+separator:]
         
@@ -274,6 +686,7 @@ class VectorEngine:
         mappings = pickle.loads(mappings_bytes)
         self.id_to_chunk_id = mappings['id_to_chunk_id']
         self.chunk_id_to_id = mappings['chunk_id_to_id']
+        self._restore_allocator()
         
         # Load index from temporary file
         with tempfile.NamedTemporaryFile(delete=False) as tmp:
@@ -281,11 +694,12 @@ class VectorEngine:
             tmp_path = tmp.name
         
         try:
-            self.index = hnswlib.Index(space='cosine', dim=self.dimension)
-            self.index.load_index(tmp_path, max_elements=num_elements)
-            self.index.set_ef(self.ef_search)
+            self._open_backend(tmp_path, num_elements)
+            # The exact backend maps its file; keep a private copy before the temp file goes
+            if isinstance(self.index, ExactBackend):
+                self.index.attach(np.array(self.index.vectors), self.index.live_mask)
             
-            logger.info(f"Loaded HNSW index with {len(self.id_to_chunk_id)} vectors")
+            logger.info(f"Loaded {self.index.name} index with {len(self.id_to_chunk_id)} vectors")
             
         finally:
             if os.path.exists(tmp_path):
@@ -299,9 +713,11 @@ class VectorEngine:
         return {
             'status': 'ready',
             'num_vectors': len(self.id_to_chunk_id),
+            'next_label': self.next_label,
             'dimension': self.dimension,
-            'ef_construction': self.ef_construction,
-            'M': self.M,
-            'ef_search': self.ef_search,
-            'model': self.model_name
+            **self.index.get_stats(),
+            'ef_tuned': self.ef_tuning is not None,
+            'num_threads': self.num_threads,
+            'model': self.model_name,
+            'embedding_service': self.embedding_service.get_stats()
         }
@@ -18,12 +18,15 @@ import time
 import asyncio
 from typing import Dict, Any, List, Optional
 from datetime import datetime
+from dataclasses import asdict
 
 from pretty_logger import logger, Colors, get_logger
 # logger ya está instanciado pero permitimos re-instanciar si es necesario
 
 # Import v5 components (but not MCPServerV5 class itself)
 from storage.mp4_storage import MP4Storage
+from storage.source_text import get_source_text_cache
+from storage.chunk_filter import ChunkFilter
 # VectorEngine se importará lazy más adelante para evitar problemas circulares
 VectorEngine = None
 
@@ -81,6 +84,12 @@ def safe_jepa_flow(step: str, message: str):
     else:
         logger.info(f"[JEPA] {step}: {message}")
 
+# Tools that embed text and therefore wait for the embedding model warmup
+EMBEDDING_TOOLS = {
+    'get_context', 'smart_query', 'skills_tool', 'ground_project_context',
+    'audit_jepa', 'sync_world_model', 'process_advanced', 'tune_ef_search',
+}
+
 class MCPServerV6:
     """
     MCP Server v6 - Session Memory + Contextual Resolution
@@ -106,6 +115,8 @@ class MCPServerV6:
                 if v6_config_path.exists():
                     with open(v6_config_path, 'r') as f:
                         v6_json = json.load(f)
+                    # Secciones anidadas (integrity, embedding, ...) se leen del JSON original
+                    self._raw_config = v6_json
                     
                     # Mapear configuración V6 a AdvancedConfig
                     return AdvancedConfig(
@@ -169,6 +180,7 @@ class MCPServerV6:
         
         # Inicializar VectorEngine más tarde para evitar problemas de importación circular
         self.vector_engine = None  # Se inicializará después
+        self.embedding_service = None  # Modelo compartido por todos los componentes
         self._vector_engine_initialized = False
         
         # Advanced features
@@ -201,8 +213,12 @@ class MCPServerV6:
         self.start_time = time.time()
         self.audit_log = []
         
+        # VectorEngine must exist before the snapshot's HNSW index is loaded into it
+        self._initialize_vector_engine()
+        
         # Load v6 storage or copy from v5
         self._initialize_v6_storage()
+        self._initialize_integrity_scanner()
         
         # Initialize v6-specific components
         if V6_COMPONENTS_AVAILABLE:
@@ -212,9 +228,6 @@ class MCPServerV6:
         else:
             logger.warning("V6 components not available - running in compatibility mode")
         
-        # Inicializar VectorEngine después para evitar problemas de importación circular
-        self._initialize_vector_engine()
-        
         logger.info("="*80)
         logger.info("MCP Server v6 ready")
         logger.info("="*80)
@@ -231,10 +244,11 @@ class MCPServerV6:
             self._config_cache[key_path] = value
             return value
         
-        # Si es JSON, usar acceso anidado
-        if isinstance(self.config, dict):
+        # Si es JSON (o AdvancedConfig con v6_config.json), usar acceso anidado
+        raw_config = self.config if isinstance(self.config, dict) else getattr(self, '_raw_config', None)
+        if isinstance(raw_config, dict):
             keys = key_path.split('.')
-            value = self.config
+            value = raw_config
             try:
                 for key in keys:
                     value = value[key]
@@ -256,10 +270,19 @@ class MCPServerV6:
         try:
             # Importación lazy de VectorEngine
             from storage.vector_engine import VectorEngine
+            from storage.embedding_service import get_embedding_service
             
-            # VectorEngine expects a dict
-            engine_config = self.config if isinstance(self.config, dict) else self.config.__dict__
-            self.vector_engine = VectorEngine(engine_config)
+            # VectorEngine expects a dict with the JSON 'embedding'/'hnsw' sections
+            engine_config = self.config if isinstance(self.config, dict) else getattr(self, '_raw_config', {})
+            cache_config = engine_config.get('embedding', {}).get('cache', {})
+            if cache_config.get('disk_path') and not os.path.isabs(cache_config['disk_path']):
+                cache_config['disk_path'] = str(mcp_hub_root / cache_config['disk_path'])
+            self.embedding_service = get_embedding_service(engine_config)
+            self.vector_engine = VectorEngine(engine_config, embedding_service=self.embedding_service)
+            self.embedding_service.attach('vector_engine', 'VectorEngine')
+            # Load + warm the model in the background while storage and components initialize
+            if self.embedding_service.start_warmup():
+                logger.info("Embedding model warmup started in background")
             self._vector_engine_initialized = True
             logger.info("VectorEngine initialized successfully")
             
@@ -289,20 +312,13 @@ class MCPServerV6:
         
         if self.storage.load_snapshot():
             logger.info("Loaded existing v6 snapshot")
-            hnsw_offset, hnsw_size = self.storage.get_hnsw_blob_offset()
-            if hnsw_size > 0:
-                try:
-                    with open(self.storage.mp4_path, 'rb') as f:
-                        f.seek(hnsw_offset)
-                        hnsw_blob = f.read(hnsw_size)
-                    # FIX: load_index_from_bytes requiere num_elements (total de chunks)
-                    self.vector_engine.load_index_from_bytes(hnsw_blob, len(self.storage.chunks))
+            try:
+                if self._load_hnsw_index():
                     logger.info("HNSW index loaded from v6 MP4")
                     return  # Éxito, salir temprano
-                except Exception as e:
-                    logger.error(f"Error loading HNSW index from v6: {e}")
-            else:
                 logger.warning("No HNSW index in v6 MP4")
+            except Exception as e:
+                logger.error(f"Error loading HNSW index from v6: {e}")
         else:
             logger.warning("Failed to load v6 snapshot")
         
@@ -335,19 +351,13 @@ class MCPServerV6:
             # Intentar cargar el snapshot copiado
             if self.storage.load_snapshot():
                 logger.info("Loaded snapshot from v5 copy")
-                hnsw_offset, hnsw_size = self.storage.get_hnsw_blob_offset()
-                if hnsw_size > 0:
-                    try:
-                        with open(self.storage.mp4_path, 'rb') as f:
-                            f.seek(hnsw_offset)
-                            hnsw_blob = f.read(hnsw_size)
-                        # FIX: También aquí necesita num_elements
-                        self.vector_engine.load_index_from_bytes(hnsw_blob, len(self.storage.chunks))
+                try:
+                    if self._load_hnsw_index():
                         logger.info("HNSW index loaded from copied v5 data")
-                    except Exception as e:
-                        logger.error(f"Error loading HNSW from copied v5: {e}")
-                else:
-                    logger.warning("No HNSW index in copied v5 data")
+                    else:
+                        logger.warning("No HNSW index in copied v5 data")
+                except Exception as e:
+                    logger.error(f"Error loading HNSW from copied v5: {e}")
             else:
                 logger.error("Failed to load snapshot from copied v5 data")
         else:
@@ -355,6 +365,79 @@ class MCPServerV6:
             # Inicializar storage vacío
             self.storage.initialize_empty_storage()
     
+    def _initialize_integrity_scanner(self):
+        """Start background staleness checks for the loaded snapshot's source files"""
+        self.integrity_scanner = None
+        if not self._get_config_value('integrity.enabled', True) or not getattr(self, 'storage', None):
+            return
+        
+        try:
+            from storage.integrity import IntegrityScanner
+            self.integrity_scanner = IntegrityScanner(
+                self.storage,
+                scan_interval=self._get_config_value('integrity.scan_interval_seconds', 300),
+                full_verify_min_interval=self._get_config_value('integrity.full_verify_min_interval_seconds', 3600)
+            )
+            self.integrity_scanner.start()
+        except Exception as e:
+            logger.warning(f"Integrity scanner not available: {e}")
+            self.integrity_scanner = None
+    
+    def _load_hnsw_index(self) -> bool:
+        """
+        Load the snapshot's ANN index into the VectorEngine
+        
+        With the exact backend the mmapped snapshot vectors are searched in
+        place. Otherwise sidecar snapshots are loaded by hnswlib straight from the .hnsw file,
+        with the id map read from a zero-copy view of the mmapped MP4.
+        Legacy snapshots go through the single-blob loader.
+        
+        Returns:
+            True if an index was loaded
+        """
+        if self.vector_engine is None:
+            logger.warning("VectorEngine not available - HNSW index not loaded")
+            return False
+        
+        # Exact backend (ann.backend / small corpora): search the mmapped snapshot vectors directly
+        if self.vector_engine.resolve_backend(len(self.storage.chunks)) == 'exact':
+            vectors = self.storage.get_vector_matrix()
+            if vectors is not None:
+                self.vector_engine.load_vectors(vectors, list(self.storage.iter_chunk_ids()))
+                return True
+            logger.info("Snapshot vectors not directly searchable, loading the HNSW index instead")
+        
+        hnsw_view = self.storage.get_hnsw_blob_view()
+        if hnsw_view is None:
+            return False
+        
+        try:
+            num_elements = len(self.storage.chunks)
+            index_path = self.storage.get_hnsw_index_path()
+            if index_path is not None:
+                self.vector_engine.load_index(str(index_path), hnsw_view, num_elements)
+            else:
+                self.vector_engine.load_index_from_bytes(hnsw_view, num_elements)
+            
+            # ef_search tuned for this snapshot (tune_ef_search) overrides the config value
+            if self._get_config_value('hnsw.auto_ef', True):
+                if self.vector_engine.apply_ef_tuning(self.storage.metadata.get('hnsw_tuning')):
+                    logger.info(f"Using tuned ef_search={self.vector_engine.ef_search} from snapshot")
+            return True
+        finally:
+            # Release the export so the mmap can be closed later
+            hnsw_view.release()
+    
+    def _attach_to_embedding_service(self, name: str, component: Any):
+        """Registrar un componente en el servicio de embeddings compartido"""
+        if self.embedding_service is None:
+            return
+        engine = getattr(component, 'vector_engine', None)
+        if getattr(engine, 'embedding_service', None) is self.embedding_service:
+            self.embedding_service.attach(name, type(component).__name__)
+        else:
+            logger.warning(f"{name} is not using the shared embedding service (separate model)")
+
     def _initialize_v6_components(self):
         """Initialize v6-specific components (sessions, indexing, etc.)"""
         logger.header("AGI-CONTEXT-VORTEX - Core v9", "Contextual Intelligence (JEPA World Model Activated)")
@@ -426,6 +509,7 @@ class MCPServerV6:
             vector_engine=self.vector_engine,
             token_manager=self.token_manager
         )
+        self._attach_to_embedding_service('skills_manager', self.skills_manager)
         self.memory_handler = MemoryHandler(
             self._get_config_value('memory_tool', {}),
             token_manager=self.token_manager
@@ -437,6 +521,7 @@ class MCPServerV6:
             vector_engine=self.vector_engine,
             token_manager=self.token_manager
         )
+        self._attach_to_embedding_service('project_grounding', self.project_grounding)
     
         # v9: JEPA Factual Auditor - Ensure absolute path
         audit_config = self._get_config_value('factual_audit', {})
@@ -447,6 +532,7 @@ class MCPServerV6:
             audit_config,
             vector_engine=self.vector_engine
         )
+        self._attach_to_embedding_service('factual_auditor', self.factual_auditor)
         safe_jepa_flow("WORLD-MODEL", f"JEPA Contextual Shield {Colors.GREEN_NEON}ACTIVE{Colors.RESET}")
         logger.info("JEPA World Model loaded for anti-hallucination")
 
@@ -473,7 +559,22 @@ class MCPServerV6:
                         'query': {'type': 'string'},
                         'top_k': {'type': 'integer', 'default': 5},
                         'min_score': {'type': 'number', 'default': 0.5},
-                        'session_id': {'type': 'string', 'description': 'Optional session ID for v6'}
+                        'session_id': {'type': 'string', 'description': 'Optional session ID for v6'},
+                        'stale_policy': {
+                            'type': 'string',
+                            'enum': ['flag', 'filter', 'ignore'],
+                            'description': 'How to treat chunks whose source file changed since the snapshot'
+                        },
+                        'path_prefix': {'type': 'string', 'description': 'Only chunks under this file subtree'},
+                        'extensions': {'type': 'array', 'items': {'type': 'string'},
+                                       'description': 'Only chunks from files with these extensions'},
+                        'language': {'type': 'string', 'description': 'Only chunks in this language (python, markdown, ...)'},
+                        'section': {'type': 'string', 'description': 'Only chunks whose section title contains this text'},
+                        'debug': {'type': 'boolean', 'description': 'Return per-stage timings in _meta.timings_ms'},
+                        'fan_out': {'type': 'integer',
+                                    'description': 'Also search this many query expansions and fuse the rankings (RRF); 0 = original query only'},
+                        'wait_timeout_s': {'type': 'number',
+                                           'description': 'Max seconds to wait for the embedding model warmup (0 = answer immediately)'}
                     },
                     'required': ['query']
                 }
@@ -634,6 +735,29 @@ class MCPServerV6:
                     'description': 'Rebuild and synchronize JEPA World Model from project context',
                     'inputSchema': {'type': 'object'}
                 },
+                {
+                    'name': 'verify_integrity',
+                    'description': 'Full SHA-256 verification of indexed chunks against their source files (rate-limited)',
+                    'inputSchema': {
+                        'type': 'object',
+                        'properties': {
+                            'max_chunks': {'type': 'integer', 'description': 'Optional cap on chunks verified'}
+                        }
+                    }
+                },
+                {
+                    'name': 'tune_ef_search',
+                    'description': 'Pick the smallest HNSW ef_search meeting a recall@k target and store it in the snapshot (run after major reindexing)',
+                    'inputSchema': {
+                        'type': 'object',
+                        'properties': {
+                            'recall_target': {'type': 'number', 'description': 'Required recall@k vs exact search (default 0.95)'},
+                            'k': {'type': 'integer', 'description': 'Recall cut-off (default 10)'},
+                            'sample_size': {'type': 'integer', 'description': 'Corpus vectors sampled as queries (default 200)'},
+                            'persist': {'type': 'boolean', 'default': True, 'description': 'Write the result into the snapshot'}
+                        }
+                    }
+                },
                 {
                     'name': 'ping',
                     'description': 'Simple ping test to verify MCP connectivity',
@@ -814,6 +938,11 @@ class MCPServerV6:
             args_str = json.dumps(args, default=str)
             logger.v9_flow("TOOL-ARGS", f"📥 Payload: {tool_color}{args_str[:150]}...{Colors.RESET}")
         
+        if tool in EMBEDDING_TOOLS:
+            warming = self._wait_for_embeddings(tool, args)
+            if warming:
+                return warming
+        
         # v6 tools
         if V6_COMPONENTS_AVAILABLE:
             v6_tools = {
@@ -827,6 +956,8 @@ class MCPServerV6:
                 'skills_tool': self._handle_skills_tool,
                 'ground_project_context': self._handle_ground_project_context,
                 'ping': self._handle_ping,
+                'verify_integrity': self._handle_verify_integrity,
+                'tune_ef_search': self._handle_tune_ef_search,
                 'get_system_status': self._handle_get_system_status,
                 'expand_query': self._handle_expand_query,
                 'chunk_document': self._handle_chunk_document,
@@ -905,6 +1036,43 @@ class MCPServerV6:
         }
         return result
     
+    def _wait_for_embeddings(self, tool: str, args: Dict) -> Optional[Dict]:
+        """
+        Wait for the embedding warmup before running a tool that embeds
+        
+        Waits up to args['wait_timeout_s'] (default embedding.warmup.wait_timeout_s);
+        returns a fast 'warming up' response if the model is still not ready,
+        or None when the tool can run.
+        """
+        service = self.embedding_service
+        if service is None or service.ready or service.state == 'idle':
+            return None
+        if service.state == 'failed' and service.start_warmup():
+            logger.info("Retrying embedding model warmup after a failure")
+        
+        timeout = args.pop('wait_timeout_s', None)
+        if timeout is None:
+            timeout = self._get_config_value('embedding.warmup.wait_timeout_s', 5)
+        if service.wait_ready(max(0.0, float(timeout))):
+            return None
+        
+        readiness = service.readiness()
+        if readiness['state'] == 'failed':
+            text = f"Embedding model failed to load: {readiness['error']}"
+        else:
+            text = f"Embedding model is warming up ({readiness['state']}); retry {tool} shortly"
+        return {
+            'content': [{'type': 'text', 'text': text}],
+            '_meta': {'warming_up': readiness['state'] != 'failed', 'error': readiness['state'] == 'failed',
+                      'readiness': readiness}
+        }
+    
+    def get_readiness(self) -> Dict:
+        """Readiness of the embedding model (for health checks)"""
+        if self.embedding_service is None:
+            return {'state': 'unavailable', 'ready': False}
+        return self.embedding_service.readiness()
+    
     def _get_context(self, args: Dict) -> Dict:
         """
         Enhanced get_context with session support
@@ -1252,130 +1420,183 @@ class MCPServerV6:
         return result
     
     def _get_context_direct(self, args: Dict) -> Dict:
-        """Direct context retrieval (v5 logic inline)"""
+        """
+        Direct context retrieval as a single-pass staged pipeline
+        
+        expand -> embed (once) -> search -> hydrate -> score/calibrate (once) -> pack
+        
+        Every stage is timed; with args['debug'] (or retrieval.debug_timings)
+        the per-stage timings are returned in _meta['timings_ms'].
+        
+        Multi-query retrieval: with fan_out > 0 (args or retrieval.multi_query.fan_out)
+        the query and its top fan_out expansions are embedded in one batch,
+        searched in one batched ANN call and merged with reciprocal rank fusion.
+        """
         query = args.get('query', '')
         top_k = args.get('top_k', self._get_config_value('retrieval.top_k', 8))
         min_score = args.get('min_score', self._get_config_value('retrieval.min_score', 0.75))
-        
-        expanded_queries = []
-        calibration_entries = []
+        debug = args.get('debug')
+        if debug is None:
+            debug = self._get_config_value('retrieval.debug_timings', False)
+        fan_out = args.get('fan_out')
+        if fan_out is None:
+            fan_out = self._get_config_value('retrieval.multi_query.fan_out', 0)
+        
+        timings: Dict[str, float] = {}
+        start_time = time.perf_counter()
+        self.query_count += 1
+        logger.info(f"Query #{self.query_count}: {query[:100]}")
         # v9 Interactivo: Inicio de flujo
         logger.v9_flow("GROUNDING", f"Analizando query: {query[:40]}...")
         
-        # Retrieval logic (v9 MVR)
-        results = self.vector_engine.search_with_mvr(query, top_k=top_k) if self.vector_engine else []
-        
-        # v9 Dynamic Confidence Calibration
-        calibrated_results = []
-        if ADVANCED_AVAILABLE and self.confidence_calibrator:
-            logger.v9_flow("CALIBRATION", f"Calibrando confianza para {len(results)} resultados...")
-            for res in results:
-                raw_score = res.get('score', 0.0)
-                calibrated = self.confidence_calibrator.calibrate_confidence(
-                    raw_score=raw_score,
-                    context={'query': query, 'chunk_id': res.get('chunk_id')}
-                )
-                res['raw_score'] = raw_score
-                res['score'] = calibrated.calibrated_score
-                res['confidence_level'] = calibrated.confidence_level.value
-                res['uncertainty'] = calibrated.uncertainty_estimate
-                
-                # Reportar al flujo interactivo si es relevante
-                if calibrated.calibrated_score > min_score:
-                    calibrated_results.append(res)
-            
-            logger.v9_flow("CALIBRATION-RESULT", f"Filtro dinámico: {len(results)} -> {len(calibrated_results)} resultados válidos")
-        else:
-            # Fallback a filtrado estático si no hay calibrador
-            calibrated_results = [r for r in results if r['score'] >= min_score]
-        
-        # Query Expansion (v9 logic)
+        # 1. Expand: alternative phrasings (reported in _meta)
+        stage_start = time.perf_counter()
         expanded_queries = []
         if ADVANCED_AVAILABLE and self.query_expander:
             logger.v9_flow("EXPANSION", "Expandiendo query semánticamente...")
-            expansion_result = self.query_expander.expand(query)
-            expanded_queries = expansion_result.get('expansions', [])
-            # ... resto de lógica de expansión ...
-        
-        start_time = time.time()
-        self.query_count += 1
-        
-        logger.info(f"Query #{self.query_count}: {query[:100]}")
+            expanded_queries = self.query_expander.expand(query).get('expansions', [])
+        timings['expand'] = time.perf_counter() - stage_start
+        
+        # 2. Embed once: the query, plus its top fan_out expansions in the same batch
+        stage_start = time.perf_counter()
+        queries = [query] + [q for q in expanded_queries if q != query][:max(0, int(fan_out))]
+        query_vectors = None
+        if self.vector_engine:
+            if len(queries) > 1:
+                query_vectors = self.vector_engine.embed_batch(queries)
+            else:
+                query_vectors = self.vector_engine.embed_query(query)
+        timings['embed'] = time.perf_counter() - stage_start
+        
+        # 3. Search, with the metadata filter (path_prefix / extensions / language / section) inside the ANN query
+        stage_start = time.perf_counter()
+        chunk_filter = ChunkFilter.from_args(args)
+        allowed_ids = self.storage.select_chunk_ids(chunk_filter) if chunk_filter else None
+        chunk_ids, scores = [], []
+        fused = None
+        if query_vectors is not None and len(queries) > 1:
+            # One batched ANN call for all phrasings, merged with reciprocal rank fusion
+            expansion_weight = self._get_config_value('retrieval.multi_query.expansion_weight', 1.0)
+            fused = self.vector_engine.search_fused(
+                query_vectors, top_k, filter=allowed_ids,
+                per_query_k=self._get_config_value('retrieval.multi_query.candidates_per_query', top_k),
+                rrf_k=self._get_config_value('retrieval.multi_query.rrf_k', 60),
+                weights=[1.0] + [expansion_weight] * (len(queries) - 1)
+            )
+            chunk_ids = [hit['chunk_id'] for hit in fused]
+            scores = [hit['score'] for hit in fused]
+        elif query_vectors is not None:
+            chunk_ids, scores = self.vector_engine.search(query_vectors, top_k, filter=allowed_ids)
+        timings['search'] = time.perf_counter() - stage_start
+        
+        # 4. Hydrate: chunk metadata, staleness and text (one open per distinct source file)
+        stage_start = time.perf_counter()
+        hits = [
+            (chunk_id, score, chunk)
+            for chunk_id, score, chunk in zip(chunk_ids, scores, self.storage.get_chunks(chunk_ids))
+            if chunk and score >= min_score
+        ]
         
-        query_vector = self.vector_engine.embed_text(query)
-        chunk_ids, scores = self.vector_engine.search(query_vector, top_k)
+        # Stale chunks (source changed since snapshot): 'flag', 'filter' or 'ignore'
+        stale_policy = args.get('stale_policy', self._get_config_value('integrity.stale_policy', 'flag'))
+        stale_filtered = 0
+        if stale_policy == 'filter':
+            fresh_hits = [hit for hit in hits if not self.storage.is_stale(hit[2])]
+            stale_filtered = len(hits) - len(fresh_hits)
+            hits = fresh_hits
+        texts = get_source_text_cache().get_chunk_texts([chunk for _, _, chunk in hits])
         
         results = []
-        for chunk_id, score in zip(chunk_ids, scores):
-            if score < min_score:
-                continue
-            
-            chunk = next((c for c in self.storage.chunks if c.chunk_id == chunk_id), None)
-            if chunk:
-                results.append({
-                    'chunk_id': chunk_id,
-                    'file': chunk.file_path,
-                    'start_line': chunk.start_line,
-                    'end_line': chunk.end_line,
-                    'text': chunk.get_text(),
-                    'score': score,
-                    'section': chunk.section
-                })
-        
-        # Confidence calibration
+        for (chunk_id, score, chunk), text in zip(hits, texts):
+            results.append({
+                'chunk_id': chunk_id,
+                'file': chunk.file_path,
+                'start_line': chunk.start_line,
+                'end_line': chunk.end_line,
+                'text': text,
+                'score': score,
+                'section': chunk.section,
+                'stale': stale_policy == 'flag' and self.storage.is_stale(chunk)
+            })
+        timings['hydrate'] = time.perf_counter() - stage_start
+        
+        # 5. Score/calibrate each result once
+        stage_start = time.perf_counter()
+        calibration_entries = []
         if ADVANCED_AVAILABLE and self.confidence_calibrator and results:
+            logger.v9_flow("CALIBRATION", f"Calibrando confianza para {len(results)} resultados...")
             try:
-                for r in results[:3]:
+                for r in results:
                     cs = self.confidence_calibrator.calibrate_confidence(
                         float(r['score']),
-                        context={'chunk_id': r['chunk_id'], 'file': r['file']}
+                        context={'query': query, 'chunk_id': r['chunk_id'], 'file': r['file']}
                     )
+                    r['calibrated_score'] = cs.calibrated_score
+                    r['confidence_level'] = getattr(cs.confidence_level, 'value', str(cs.confidence_level))
+                    r['uncertainty'] = cs.uncertainty_estimate
                     calibration_entries.append({
                         'chunk_id': r['chunk_id'],
                         'raw_score': cs.raw_score,
                         'calibrated_score': cs.calibrated_score,
-                        'confidence_level': getattr(cs.confidence_level, 'value', str(cs.confidence_level)),
+                        'confidence_level': r['confidence_level'],
                     })
             except Exception as e:
                 logger.warning(f"Confidence calibration failed: {e}")
+        timings['calibrate'] = time.perf_counter() - stage_start
         
-        elapsed = time.time() - start_time
-        
-        if not results or (results and results[0]['score'] < min_score):
+        # 6. Pack the response
+        stage_start = time.perf_counter()
+        # RRF orders by fused rank, so the best similarity is not necessarily first
+        if not results or max(r['score'] for r in results) < min_score:
             response_text = "No sufficient information found in memory for this query."
             abstained = True
         else:
             response_text = self._format_context_response(query, results)
             abstained = False
         
+        meta = {
+            'query': query,
+            'results_count': len(results),
+            'abstained': abstained,
+            'provenance': [
+                {
+                    'chunk_id': r['chunk_id'],
+                    'file': r['file'],
+                    'lines': f"{r['start_line']}-{r['end_line']}",
+                    'score': round(r['score'], 3),
+                    'stale': r['stale']
+                }
+                for r in results
+            ],
+            'stale_filtered': stale_filtered,
+            'filter': {
+                **{key: value for key, value in asdict(chunk_filter).items() if value},
+                'matching_chunks': len(allowed_ids),
+            } if chunk_filter else None,
+            'expanded_queries': expanded_queries,
+            'multi_query': {
+                'fan_out': len(queries) - 1,
+                'queries': queries[1:],
+                'rrf_scores': {hit['chunk_id']: round(hit['rrf_score'], 5) for hit in fused},
+            } if fused is not None else None,
+            'confidence_calibration': {
+                'enabled': bool(calibration_entries),
+                'entries': calibration_entries,
+            },
+        }
+        timings['pack'] = time.perf_counter() - stage_start
+        
+        elapsed = time.perf_counter() - start_time
+        meta['time_ms'] = round(elapsed * 1000, 2)
+        if debug:
+            meta['timings_ms'] = {stage: round(seconds * 1000, 3) for stage, seconds in timings.items()}
+        
         # Logging de auditoría -- migrado desde V5
         self._log_query(query, results, abstained, elapsed)
         
-        # Logging verbose de la herramienta
-        result = {
-            'content': [{'type': 'text', 'text': response_text}],
-            '_meta': {
-                'query': query,
-                'results_count': len(results),
-                'abstained': abstained,
-                'time_ms': round(elapsed * 1000, 2),
-                'provenance': [
-                    {
-                        'chunk_id': r['chunk_id'],
-                        'file': r['file'],
-                        'lines': f"{r['start_line']}-{r['end_line']}",
-                        'score': round(r['score'], 3)
-                    }
-                    for r in results
-                ],
-                'expanded_queries': expanded_queries,
-                'confidence_calibration': {
-                    'enabled': bool(calibration_entries),
-                    'entries': calibration_entries,
-                },
-            }
-        }
+        result = {'content': [{'type': 'text', 'text': response_text}], '_meta': meta}
         
+        # Logging verbose de la herramienta
         self._log_tool_execution('_get_context_direct', args, result)
         
         return result
@@ -1397,8 +1618,7 @@ class MCPServerV6:
         found_evidence = []
         total_score = 0.0
         
-        for eid in evidence_ids:
-            chunk = next((c for c in self.storage.chunks if c.chunk_id == eid), None)
+        for chunk in self.storage.get_chunks(evidence_ids):
             if chunk:
                 found_evidence.append(chunk)
                 # Calcular similitud simple entre candidato y chunk
@@ -1471,7 +1691,8 @@ class MCPServerV6:
             'avg_response_time_ms': round(avg_response_time, 2),
             'abstention_rate': round(abstention_rate * 100, 1),
             'recent_queries': len(recent_queries),
-            'session_count': len(self.sessions) if hasattr(self, 'sessions') else 0
+            'session_count': len(self.sessions) if hasattr(self, 'sessions') else 0,
+            'stale_files': len(self.storage.stale_files)
         }
         
         # Formatear texto completo
@@ -1487,6 +1708,7 @@ class MCPServerV6:
         text += f"Avg Response Time: {full_stats['avg_response_time_ms']}ms\n"
         text += f"Abstention Rate: {full_stats['abstention_rate']}%\n"
         text += f"Recent Queries: {full_stats['recent_queries']}\n"
+        text += f"Stale Source Files: {full_stats['stale_files']}\n"
         
         result = {
             'content': [{'type': 'text', 'text': text}],
@@ -1553,6 +1775,28 @@ class MCPServerV6:
         except Exception as e:
             return {'content': [{'type': 'text', 'text': f"Error en grounding: {str(e)}"}], '_meta': {'error': True}}
 
+    def _handle_verify_integrity(self, args: Dict) -> Dict:
+        """Explicit full integrity verification (maintenance operation)"""
+        if not getattr(self, 'integrity_scanner', None):
+            return {'content': [{'type': 'text', 'text': "Integrity scanner not available."}], '_meta': {'error': True}}
+        
+        result = self.integrity_scanner.verify_full(max_chunks=args.get('max_chunks'))
+        return {'content': [{'type': 'text', 'text': json.dumps(result, indent=2)}], '_meta': result}
+
+    def _handle_tune_ef_search(self, args: Dict) -> Dict:
+        """Recompute ef_search against a recall target and store it in the snapshot (maintenance operation)"""
+        if self.vector_engine is None or self.vector_engine.index is None:
+            return {'content': [{'type': 'text', 'text': "HNSW index not loaded."}], '_meta': {'error': True}}
+        
+        report = self.vector_engine.tune_ef_search(
+            recall_target=args.get('recall_target', self._get_config_value('hnsw.ef_tuning.recall_target', 0.95)),
+            k=args.get('k', self._get_config_value('hnsw.ef_tuning.k', 10)),
+            sample_size=args.get('sample_size', self._get_config_value('hnsw.ef_tuning.sample_size', 200))
+        )
+        if args.get('persist', True):
+            report['persisted'] = self.storage.update_metadata({'hnsw_tuning': report})
+        return {'content': [{'type': 'text', 'text': json.dumps(report, indent=2)}], '_meta': report}
+
     def _handle_ping(self, args: Dict) -> Dict:
         """Simple ping handler"""
         return {'content': [{'type': 'text', 'text': 'pong - AGI-Context-Vortex v9.0 is operational!'}]}
@@ -1564,6 +1808,7 @@ class MCPServerV6:
             'uptime': time.time() - getattr(self, '_start_time', time.time()),
             'advanced_features': ADVANCED_AVAILABLE,
             'v6_components': V6_COMPONENTS_AVAILABLE,
+            'embedding_readiness': self.get_readiness(),
             'index_stats': self.code_indexer.get_stats() if self.code_indexer else {},
             'token_budget': self.token_manager.available_tokens if hasattr(self, 'token_manager') else 0
         }
@@ -1754,7 +1999,7 @@ class MCPServerV6:
             'results_count': len(results),
             'abstained': abstained,
             'elapsed_ms': round(elapsed * 1000, 2),
-            'top_score': results[0]['score'] if results else 0.0,
+            'top_score': max(r['score'] for r in results) if results else 0.0,
             'session_id': getattr(self, '_current_session_id', None),  # Tracking de sesión si existe
             'validation_info': next((r.get('validation_passed') for r in results if 'validation_passed' in r), None)
         }
@@ -0,0 +1,35 @@
+"""
+Tests de ChunkFilter: subárbol de rutas, extensiones/lenguajes y sección
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "core"))
+
+from storage.chunk_filter import ChunkFilter
+
+
+def test_path_prefix_matches_whole_components():
+    match = ChunkFilter(path_prefix='docs/api').compile()
+
+    assert match('docs/api/index.md', '')
+    assert match('C:\\repo\\Docs\\API\\x.md', '')
+    assert match('/srv/repo/docs/api', '')
+    assert not match('docs/api_v2/index.md', '')
+    assert not match('x/docs/apiary.md', '')
+    assert not match('mydocs/api/x.md', '')
+
+
+def test_extensions_languages_and_section():
+    match = ChunkFilter(extensions=('md',), languages=('python',), section='Install').compile()
+
+    assert match('a/readme.MD', 'Installation')
+    assert match('a/setup.py', 'install steps')
+    assert not match('a/setup.py', 'Usage')
+    assert not match('a/app.js', 'Install')
+
+
+def test_from_args_without_filters_is_none():
+    assert ChunkFilter.from_args({'query': 'x', 'extensions': None, 'section': ''}) is None
+    assert ChunkFilter.from_args({'language': 'python'}).languages == ('python',)
@@ -0,0 +1,61 @@
+"""
+Tests de ChunkTable: codificación columnar, vistas por fila y cabecera
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "core"))
+
+from storage.chunk_table import ChunkTable, ChunkView
+from storage.mp4_storage import VirtualChunk
+
+
+def _chunks():
+    return [VirtualChunk(chunk_id=f"doc.md:{i}", file_path="docs/ñandú.md" if i % 2 else "doc.md",
+                         start_line=i * 10, end_line=i * 10 + 9, vector_offset=i * 1536,
+                         vector_size=1536, section=f"S{i}", summary="", text_hash=f"h{i}")
+            for i in range(5)]
+
+
+def test_round_trip_matches_chunks():
+    chunks = _chunks()
+    table = ChunkTable(memoryview(ChunkTable.encode(chunks)))
+
+    assert len(table) == 5
+    assert [view.to_dict() for view in table] == [chunk.to_dict() for chunk in chunks]
+    assert list(table.iter_strings('file_path')) == [c.file_path for c in chunks]
+    assert table[-1].chunk_id == "doc.md:4"
+    assert [view.row for view in table[1:3]] == [1, 2]
+    with pytest.raises(IndexError):
+        table[5]
+
+
+def test_repeated_strings_stored_once():
+    chunks = _chunks()
+    table = ChunkTable(ChunkTable.encode(chunks))
+
+    # Two distinct paths, one empty summary
+    paths = {tuple(ref) for ref in table.string_refs['file_path'].tolist()}
+    assert len(paths) == 2
+    assert len({tuple(ref) for ref in table.string_refs['summary'].tolist()}) == 1
+
+
+def test_materialize_outlives_release():
+    table = ChunkTable(ChunkTable.encode(_chunks()))
+    view = table[2]
+    assert isinstance(view, ChunkView)
+    chunk = view.materialize()
+    table.release()
+
+    assert type(chunk) is VirtualChunk
+    assert (chunk.chunk_id, chunk.start_line, chunk.vector_offset) == ("doc.md:2", 20, 3072)
+
+
+def test_rejects_foreign_buffers():
+    with pytest.raises(ValueError):
+        ChunkTable(b'MCPT')
+    with pytest.raises(ValueError):
+        ChunkTable(b'JSON' + bytes(20))
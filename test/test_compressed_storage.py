@@ -0,0 +1,136 @@
+"""
+Tests de búsqueda en el dominio comprimido (PQ/ADC, int8 y float16 frente a float32) y blobs LZ4 por bloques
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "core"))
+
+pytest.importorskip("lz4")
+pytest.importorskip("sklearn")
+
+from storage.compressed_storage import (BlockCompressedBlob, Int8Scorer, ProductQuantizer, VectorCompressor,
+                                        recall_at_k)
+
+
+def _data(count=2000, dimension=64, queries=20):
+    rng = np.random.default_rng(3)
+    centers = rng.normal(size=(32, dimension))
+    vectors = (centers[rng.integers(0, 32, count)] + 0.3 * rng.normal(size=(count, dimension))).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors, vectors[rng.integers(0, count, queries)] + 0.05 * rng.normal(size=(queries, dimension)).astype(np.float32)
+
+
+@pytest.mark.parametrize("config, min_recall", [
+    ({'precision': 'float16'}, 0.99),
+    ({'precision': 'int8'}, 0.9),
+    ({'precision': 'float32', 'use_pq': True, 'pq_subvectors': 16, 'pq_clusters': 64}, 0.25),
+])
+def test_recall_report(config, min_recall):
+    vectors, queries = _data()
+    compressor = VectorCompressor(config)
+    blob, metadata = compressor.compress_vectors(vectors)
+
+    report = compressor.recall_report(vectors, blob, metadata, queries, k=10)
+
+    assert report['queries'] == len(queries)
+    assert report['recall_at_k'] >= min_recall
+
+
+def test_searcher_matches_search_compressed():
+    vectors, queries = _data()
+    compressor = VectorCompressor({'precision': 'int8'})
+    blob, metadata = compressor.compress_vectors(vectors)
+
+    search = compressor.compressed_searcher(blob, metadata)
+    for query in queries[:5]:
+        assert np.array_equal(search(query, 10), compressor.search_compressed(blob, metadata, query, 10))
+
+
+def test_recall_at_k():
+    assert recall_at_k(np.array([[1, 2], [3, 4]]), [np.array([2, 9]), np.array([3, 4])]) == pytest.approx(0.75)
+
+
+def test_pq_adc_scores_match_decoded_vectors():
+    vectors, queries = _data(count=500)
+    pq = ProductQuantizer.train(vectors, subvectors=8, clusters=32)
+    codes = pq.encode(vectors)
+
+    assert codes.shape == (500, 8) and codes.dtype == np.uint8
+    np.testing.assert_allclose(pq.score(queries[0], codes), pq.decode(codes) @ queries[0], rtol=1e-4, atol=1e-5)
+
+    # Reranking the whole set with exact vectors gives the exact top-k
+    rows, scores = pq.search(queries[0], codes, top_k=5, rerank_vectors=vectors, rerank_k=len(vectors))
+    assert np.array_equal(rows, np.argsort(-(vectors @ queries[0]))[:5])
+    np.testing.assert_allclose(scores, vectors[rows] @ queries[0], rtol=1e-5)
+
+
+def test_pq_codebook_round_trip():
+    vectors, queries = _data(count=300)
+    pq = ProductQuantizer.train(vectors, subvectors=4, clusters=16)
+    loaded = ProductQuantizer.from_bytes(memoryview(pq.to_bytes()))
+
+    assert np.array_equal(loaded.codebooks, pq.codebooks)
+    assert np.array_equal(loaded.encode(vectors), pq.encode(vectors))
+    with pytest.raises(ValueError):
+        ProductQuantizer.from_bytes(b'XXXX' + pq.to_bytes()[4:])
+    with pytest.raises(ValueError):
+        ProductQuantizer.train(vectors, subvectors=7)
+
+
+def test_int8_quantization_bounds_error_per_dimension():
+    rng = np.random.default_rng(5)
+    # Dimensions with very different ranges, plus a constant one
+    vectors = rng.normal(size=(400, 32)).astype(np.float32) * np.linspace(0.01, 10, 32, dtype=np.float32)
+    vectors[:, 0] = 2.5
+    codes, scale, offset = Int8Scorer.quantize(vectors)
+
+    assert codes.dtype == np.int8
+    error = np.abs(codes * scale + offset - vectors).max(axis=0)
+    np.testing.assert_array_less(error, scale / 2 + 1e-5)
+
+
+def test_int8_scorer_tracks_float32_scores():
+    vectors, queries = _data(count=1000)
+    scorer = Int8Scorer(*Int8Scorer.quantize(vectors))
+
+    for query in queries[:5]:
+        exact = vectors @ query
+        np.testing.assert_allclose(scorer.score(query), exact, atol=0.05)
+        rows, scores = scorer.search(query, top_k=10)
+        assert np.all(np.diff(scores) <= 0)
+        assert len(set(rows.tolist()) & set(np.argsort(-exact)[:10].tolist())) >= 8
+
+
+def test_block_blob_reads_single_rows():
+    vectors, _ = _data(count=1000)
+    raw = vectors.tobytes()
+    blob = BlockCompressedBlob(memoryview(BlockCompressedBlob.encode(raw, 64 * 4, block_bytes=4096)))
+
+    assert blob.rows == 1000 and blob.num_blocks == 63
+    rows = [999, 3, 4, 500]
+    got = blob.read_rows(rows).view(np.float32)
+    assert np.array_equal(got, vectors[rows])
+    # Rows 3 and 4 share a block: three blocks decoded, none twice
+    assert blob.get_stats()['misses'] == 3
+    blob.read_rows([5])
+    assert blob.stats['hits'] == 1
+    assert blob.read_all() == raw
+    with pytest.raises(IndexError):
+        blob.read_rows([1000])
+
+
+def test_block_blob_round_trip_through_compressor():
+    vectors, _ = _data(count=300)
+    compressor = VectorCompressor({'precision': 'float16', 'lz4_block_bytes': 1024})
+    blob, metadata = compressor.compress_vectors(vectors)
+
+    assert 'lz4_blocks' in metadata['compression_steps']
+    restored = compressor.decompress_vectors(blob, metadata)
+    np.testing.assert_allclose(restored, vectors, atol=1e-3)
+    rows = BlockCompressedBlob(blob).read_rows([7, 250])
+    np.testing.assert_array_equal(compressor.decode_rows(rows, metadata), restored[[7, 250]])
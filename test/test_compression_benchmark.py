@@ -0,0 +1,42 @@
+"""
+Tests del benchmark de compresión: informe por códec sobre un conjunto sintético
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "core"))
+
+pytest.importorskip("lz4")
+pytest.importorskip("sklearn")
+
+from storage.compression_benchmark import format_table, run_benchmark, synthetic_embeddings
+
+
+def test_report_per_codec(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    report = run_benchmark(synthetic_embeddings(600, 96), num_queries=20, k=10,
+                           configs=['float32', 'float16_+_lz4', 'int8', 'pq48'])
+
+    assert report['dataset'] == {'vectors': 600, 'dimension': 96, 'float32_bytes': 600 * 96 * 4,
+                                 'queries': 20, 'k': 10}
+    results = {row['config']: row for row in report['results']}
+    assert list(results) == ['float32', 'float16_+_lz4', 'int8', 'pq48']
+    assert results['float32']['recall_at_10'] == 1.0
+    assert results['float16_+_lz4']['recall_at_10'] >= 0.95
+    assert results['int8']['ratio_vs_float32'] == pytest.approx(0.25, abs=0.01)
+    assert results['pq48']['blob_bytes'] == 600 * 48
+    # Benchmark snapshots are removed afterwards
+    assert not list(tmp_path.rglob("bench_*.mp4"))
+
+    table = format_table(report).splitlines()
+    assert len(table) == 5 and table[0].startswith('config')
+
+
+def test_pq_skipped_when_dimension_does_not_split(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    report = run_benchmark(synthetic_embeddings(200, 72), num_queries=5, configs=['float16', 'pq48'])
+
+    assert [row['config'] for row in report['results']] == ['float16']
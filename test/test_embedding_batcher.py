@@ -0,0 +1,74 @@
+"""
+Tests del EmbeddingBatcher: agrupación de peticiones concurrentes y orden de resultados
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "core"))
+
+from storage.embedding_batcher import EmbeddingBatcher
+
+
+def _encode(texts):
+    return np.array([[float(text)] for text in texts], dtype=np.float32)
+
+
+def test_requests_queued_while_busy_share_one_call():
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def encode(texts):
+        calls.append(list(texts))
+        started.set()
+        release.wait(5)
+        return _encode(texts)
+
+    batcher = EmbeddingBatcher(encode, max_wait_ms=1, max_batch_size=32)
+    first = batcher.submit(["1"])
+    assert started.wait(5)
+    # The model is busy: these pile up and are encoded together
+    waiting = [batcher.submit(["2", "3"]), batcher.submit(["4"]), batcher.submit(["5", "6"])]
+    release.set()
+
+    assert first.result(5).tolist() == [[1.0]]
+    assert [future.result(5)[:, 0].tolist() for future in waiting] == [[2, 3], [4], [5, 6]]
+    assert calls == [["1"], ["2", "3", "4", "5", "6"]]
+    assert batcher.get_stats()['max_batch'] == 5
+    batcher.stop()
+
+
+def test_batch_size_caps_a_call():
+    calls = []
+    release = threading.Event()
+
+    def encode(texts):
+        calls.append(len(texts))
+        release.wait(5)
+        return _encode(texts)
+
+    batcher = EmbeddingBatcher(encode, max_wait_ms=1, max_batch_size=4)
+    futures = [batcher.submit([str(i), str(i)]) for i in range(5)]
+    release.set()
+
+    assert [future.result(5)[0, 0] for future in futures] == [0, 1, 2, 3, 4]
+    assert max(calls) <= 4 and sum(calls) == 10
+    batcher.stop()
+
+
+def test_errors_reach_every_caller():
+    def encode(texts):
+        raise RuntimeError("model crashed")
+
+    batcher = EmbeddingBatcher(encode, max_wait_ms=1)
+    with pytest.raises(RuntimeError, match="model crashed"):
+        batcher.encode(["1"], timeout=5)
+    # The worker survives a failed batch
+    batcher.encode_fn = _encode
+    assert batcher.encode(["7"], timeout=5).tolist() == [[7.0]]
+    batcher.stop()
@@ -0,0 +1,82 @@
+"""
+Tests del EmbeddingCache: LRU en memoria, capa SQLite persistente y claves por modelo
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "core"))
+
+from storage.embedding_cache import EmbeddingCache
+
+
+def _vectors(count, dimension=4):
+    return np.arange(count * dimension, dtype=np.float32).reshape(count, dimension)
+
+
+def test_memory_lru_evicts_oldest():
+    cache = EmbeddingCache(memory_items=2)
+    cache.put_many("m", True, ["a", "b"], _vectors(2))
+    cache.get_many("m", True, ["a"])
+    cache.put_many("m", True, ["c"], _vectors(1))
+
+    found = cache.get_many("m", True, ["a", "b", "c"])
+    assert [vector is not None for vector in found] == [True, False, True]
+    np.testing.assert_array_equal(found[0], _vectors(2)[0])
+    assert cache.get_stats()['memory_items'] == 2
+
+
+def test_keys_include_model_and_normalize():
+    cache = EmbeddingCache()
+    cache.put_many("m", True, ["a"], _vectors(1))
+
+    assert cache.get_many("m", False, ["a"]) == [None]
+    assert cache.get_many("other", True, ["a"]) == [None]
+    assert cache.get_many("m", True, ["a"])[0] is not None
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = tmp_path / "cache" / "embeddings.sqlite"
+    first = EmbeddingCache(memory_items=10, disk_path=str(path))
+    first.put_many("m", True, ["a", "b", "a"], _vectors(3))
+    first.close()
+
+    second = EmbeddingCache(memory_items=10, disk_path=str(path))
+    found = second.get_many("m", True, ["b", "zzz", "a", "b"])
+    np.testing.assert_array_equal(found[0], _vectors(3)[1])
+    assert found[1] is None
+    # The last write for a repeated text wins
+    np.testing.assert_array_equal(found[2], _vectors(3)[2])
+    stats = second.get_stats()
+    assert (stats['disk_hits'], stats['misses'], stats['disk_items']) == (3, 1, 2)
+
+    # Disk hits are promoted to memory
+    second.get_many("m", True, ["a"])
+    assert second.stats['memory_hits'] == 1
+    second.close()
+
+
+def test_service_serves_repeats_from_cache(tmp_path, monkeypatch):
+    import storage.embedding_service as embedding_service
+    from storage.embedding_service import EmbeddingService
+
+    encoded = []
+
+    class Model:
+        def encode(self, texts, batch_size=32, convert_to_numpy=True, show_progress_bar=False):
+            encoded.extend(texts)
+            return np.stack([np.full(4, len(text), dtype=np.float32) for text in texts])
+
+    monkeypatch.setattr(embedding_service, 'load_model', lambda *args, **kwargs: Model())
+    service = EmbeddingService({'embedding': {'dimension': 4, 'dtype': 'float32', 'normalize': False,
+                                              'micro_batching': {'enabled': False},
+                                              'cache': {'disk_path': str(tmp_path / "e.sqlite")}}})
+
+    first = service.encode(["aa", "b", "aa"])
+    second = service.encode(["b", "ccc"])
+    assert encoded == ["aa", "b", "ccc"]
+    np.testing.assert_array_equal(first[:, 0], [2, 1, 2])
+    np.testing.assert_array_equal(second[:, 0], [1, 3])
+    service.cache.close()
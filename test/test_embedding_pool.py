@@ -0,0 +1,86 @@
+"""
+Tests del EmbeddingPool: procesos de trabajo con un modelo falso y resultados por memoria compartida
+"""
+
+import multiprocessing as mp
+import sys
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "core"))
+
+import storage.inference_backends as inference_backends
+from storage.embedding_pool import EmbeddingPool
+
+pytestmark = pytest.mark.skipif('fork' not in mp.get_all_start_methods(),
+                                reason="workers inherit the fake model through fork")
+
+DIMENSION = 6
+
+
+def _vector(text):
+    return np.random.default_rng(zlib.crc32(text.encode())).normal(size=DIMENSION).astype(np.float32)
+
+
+class FakeModel:
+    def get_sentence_embedding_dimension(self):
+        return DIMENSION
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, show_progress_bar=False):
+        return np.stack([_vector(text) for text in texts])
+
+
+def _fake_load_model(model_name, backend='torch', device='cpu'):
+    if model_name == 'broken':
+        raise OSError("no such model")
+    return FakeModel()
+
+
+@pytest.fixture
+def pool_factory(monkeypatch):
+    # Patched before the fork, so every worker loads the fake model
+    monkeypatch.setattr(inference_backends, 'load_model', _fake_load_model)
+    pools = []
+
+    def make(model_name='fake', **kwargs):
+        pool = EmbeddingPool(model_name, start_method='fork', **kwargs)
+        pools.append(pool)
+        pool.start()
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.close()
+
+
+def test_interactive_and_bulk_jobs_keep_input_order(pool_factory):
+    pool = pool_factory(workers=2, reserved_interactive=1, bulk_chunk=4)
+    assert pool.wait_ready(30)
+    assert pool.dimension == DIMENSION
+
+    texts = [f"{'x' * (i % 7)} texto {i}" for i in range(10)]
+    expected = np.stack([_vector(text) for text in texts])
+    np.testing.assert_array_equal(pool.encode(texts[:3]), expected[:3])
+    np.testing.assert_array_equal(pool.encode(texts, bulk=True, timeout=30), expected)
+    assert pool.encode([]).shape == (0, DIMENSION)
+
+    stats = pool.get_stats()
+    assert (stats['interactive_jobs'], stats['bulk_jobs'], stats['texts']) == (1, 3, 13)
+    assert stats['bulk_limit'] == 1
+
+    pool.close()
+    assert not pool.ready
+    with pytest.raises(RuntimeError):
+        pool.encode(["after close"])
+
+
+def test_workers_that_cannot_load_fail_the_pool(pool_factory):
+    pool = pool_factory('broken', workers=1)
+
+    assert not pool.wait_ready(30)
+    assert "no such model" in pool.error
+    with pytest.raises(RuntimeError):
+        pool.encode(["hola"])
@@ -0,0 +1,215 @@
+"""
+Tests del EmbeddingService compartido, con un modelo falso en lugar de SentenceTransformer
+"""
+
+import sys
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "core"))
+
+import storage.embedding_service as embedding_service
+from storage.embedding_service import EmbeddingService, get_embedding_service
+from storage.inference_backends import PROBE_TEXTS, embedding_agreement
+from storage.vector_engine import VectorEngine
+
+DIMENSION = 8
+
+
+def _vector(text):
+    return np.random.default_rng(zlib.crc32(text.encode())).normal(size=DIMENSION).astype(np.float32)
+
+
+class FakeModel:
+    """Deterministic stand-in for SentenceTransformer that records its calls"""
+    max_seq_length = 128
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, show_progress_bar=False):
+        self.calls.append(list(texts))
+        return np.stack([_vector(text) for text in texts])
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Replace load_model; returns the list of (model_name, backend) loads"""
+    calls = []
+
+    def load_model(model_name, backend='torch', device='cpu'):
+        calls.append((model_name, backend))
+        return FakeModel()
+
+    monkeypatch.setattr(embedding_service, 'load_model', load_model)
+    return calls
+
+
+def _config(**embedding):
+    return {'embedding': {'dimension': DIMENSION, 'dtype': 'float32', 'cache': {'enabled': False},
+                          'micro_batching': {'enabled': False}, **embedding}}
+
+
+def test_one_service_per_process(loads, monkeypatch):
+    monkeypatch.setattr(embedding_service, '_embedding_service', None)
+    service = get_embedding_service(_config())
+    assert get_embedding_service({'embedding': {'dimension': 99}}) is service
+
+    engines = [VectorEngine(_config()) for _ in range(3)]
+    assert all(engine.embedding_service is service for engine in engines)
+    assert engines[0].dimension == DIMENSION
+
+    engines[0].embed_text("hola")
+    engines[1].embed_batch(["uno", "dos"])
+    assert engines[2].model is service.model
+    assert len(loads) == 1
+
+    service.attach('vector_engine', 'VectorEngine')
+    assert service.get_stats()['components'] == ['vector_engine']
+
+
+def test_encode_normalizes_and_casts(loads):
+    service = EmbeddingService(_config(dtype='float16'))
+    vectors = service.encode(["a", "b"])
+    single = service.encode("a")
+
+    assert vectors.dtype == np.float16 and vectors.shape == (2, DIMENSION)
+    np.testing.assert_allclose(np.linalg.norm(vectors.astype(np.float32), axis=1), 1.0, atol=1e-3)
+    assert single.shape == (DIMENSION,)
+    np.testing.assert_array_equal(single, vectors[0])
+
+
+def test_bulk_encode_buckets_by_length_in_input_order(loads):
+    service = EmbeddingService(_config(normalize=False, bucket_token_budget=256, batch_size=4))
+    rng = np.random.default_rng(0)
+    texts = [f"{i:03d}" + "x" * int(rng.integers(0, 400)) for i in range(60)]
+
+    vectors = service.encode(texts)
+
+    np.testing.assert_array_equal(vectors, np.stack([_vector(text) for text in texts]))
+    bounds = [32, 64, 128]
+    for batch in service.model.calls:
+        tokens = [min(len(text) // 4 + 2, 128) for text in batch]
+        buckets = {next(b for b in bounds if t <= b) for t in tokens}
+        assert len(buckets) == 1
+        assert len(batch) <= 256 // buckets.pop()
+    assert sorted(text for batch in service.model.calls for text in batch) == sorted(texts)
+
+
+def test_progress_bar_is_optional(loads):
+    service = EmbeddingService(_config(batch_size=2))
+    assert service.encode(["a", "bb", "ccc"], show_progress_bar=True).shape == (3, DIMENSION)
+
+
+class NoisyModel(FakeModel):
+    """Backend whose vectors drift from the fp32 reference"""
+
+    def __init__(self, noise):
+        super().__init__()
+        self.noise = noise
+
+    def encode(self, texts, **kwargs):
+        vectors = super().encode(texts, **kwargs)
+        return vectors + self.noise * np.random.default_rng(1).normal(size=vectors.shape).astype(np.float32)
+
+
+def _backend_loader(monkeypatch, noise=None):
+    """load_model where 'onnx' adds noise (or is missing when noise is None)"""
+    calls = []
+
+    def load_model(model_name, backend='torch', device='cpu'):
+        calls.append(backend)
+        if backend == 'torch':
+            return FakeModel()
+        if noise is None:
+            raise ImportError("onnxruntime not installed")
+        return NoisyModel(noise)
+
+    monkeypatch.setattr(embedding_service, 'load_model', load_model)
+    return calls
+
+
+def test_backend_accepted_when_it_agrees_with_fp32(monkeypatch):
+    calls = _backend_loader(monkeypatch, noise=1e-4)
+    service = EmbeddingService(_config(backend='onnx', model='m'))
+
+    assert isinstance(service.model, NoisyModel)
+    assert calls == ['torch', 'onnx']
+    assert service.backend_report['status'] == 'accepted'
+    assert service.backend_report['min_cosine'] >= 0.99
+    assert service.cache_model_key == 'm#onnx'
+
+
+def test_backend_rejected_falls_back_to_fp32(monkeypatch):
+    calls = _backend_loader(monkeypatch, noise=1.0)
+    service = EmbeddingService(_config(backend='onnx', model='m'))
+
+    assert type(service.model) is FakeModel
+    assert calls == ['torch', 'onnx', 'torch']
+    assert service.backend == 'torch'
+    assert service.backend_report['status'] == 'rejected'
+    assert service.cache_model_key == 'm'
+
+
+def test_unavailable_backend_falls_back_to_fp32(monkeypatch):
+    _backend_loader(monkeypatch)
+    service = EmbeddingService(_config(backend='onnx', backend_check=False))
+
+    assert type(service.model) is FakeModel
+    assert service.backend_report['status'] == 'unavailable'
+    assert service.get_stats()['backend'] == 'torch'
+
+
+def test_embedding_agreement():
+    reference = np.array([[1.0, 0.0], [0.0, 2.0]])
+    report = embedding_agreement(reference, np.array([[1.0, 0.0], [1.0, 1.0]]))
+    assert report == {'min_cosine': round(float(np.sqrt(0.5)), 5),
+                      'mean_cosine': round(float((1 + np.sqrt(0.5)) / 2), 5), 'texts': 2}
+
+
+def test_warmup_moves_idle_to_ready(loads):
+    service = EmbeddingService(_config())
+    assert service.readiness()['state'] == 'idle'
+    assert not service.wait_ready(0)
+
+    assert service.start_warmup()
+    assert service.wait_ready(5)
+    assert service.ready and service.readiness()['error'] is None
+    assert service.model.calls == [list(PROBE_TEXTS)]
+    assert {'loading_s', 'warming_s'} <= set(service.readiness()['timings'])
+    assert not service.start_warmup()
+    assert len(loads) == 1
+
+
+def test_failed_warmup_can_be_retried(monkeypatch):
+    attempts = []
+
+    def load_model(model_name, backend='torch', device='cpu'):
+        attempts.append(model_name)
+        if len(attempts) == 1:
+            raise OSError("model download failed")
+        return FakeModel()
+
+    monkeypatch.setattr(embedding_service, 'load_model', load_model)
+    service = EmbeddingService(_config())
+
+    assert service.start_warmup()
+    assert not service.wait_ready(5)
+    assert service.readiness()['state'] == 'failed'
+    assert "download failed" in service.readiness()['error']
+
+    assert service.start_warmup()
+    assert service.wait_ready(5)
+    assert len(attempts) == 2
+
+
+def test_lazy_load_without_warmup(loads):
+    service = EmbeddingService(_config(warmup={'enabled': False}))
+    assert not service.start_warmup()
+
+    service.encode("hola")
+    assert service.ready
+    assert service.wait_ready(0)
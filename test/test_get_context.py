@@ -0,0 +1,152 @@
+"""
+Tests del pipeline de get_context: cada etapa una sola vez, con motor y almacenamiento falsos
+"""
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "core"))
+
+v6 = pytest.importorskip("v6")
+
+from storage.mp4_storage import VirtualChunk
+from storage.source_text import get_source_text_cache
+
+
+class FakeEngine:
+    """Records embed/search calls; chunk scores come from a fixed table"""
+
+    def __init__(self, scores):
+        self.scores = scores
+        self.calls = []
+
+    def embed_query(self, query):
+        self.calls.append(('embed_query', query))
+        return np.ones(4, dtype=np.float32)
+
+    def embed_batch(self, texts):
+        self.calls.append(('embed_batch', list(texts)))
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+    def search(self, vector, top_k, filter=None):
+        self.calls.append(('search', top_k, filter))
+        ranked = [(cid, s) for cid, s in self.scores.items() if filter is None or cid in filter][:top_k]
+        return [cid for cid, _ in ranked], [s for _, s in ranked]
+
+
+    def search_fused(self, vectors, top_k, filter=None, per_query_k=None, rrf_k=60, weights=None):
+        self.calls.append(('search_fused', len(vectors), per_query_k, weights))
+        return [{'chunk_id': cid, 'rrf_score': 1.0 / (rrf_k + rank + 1), 'score': score, 'hits': len(vectors)}
+                for rank, (cid, score) in enumerate(list(self.scores.items())[:top_k])]
+
+
+class FakeStorage:
+    def __init__(self, chunks, stale=()):
+        self.chunks = {chunk.chunk_id: chunk for chunk in chunks}
+        self.stale_files = set(stale)
+
+    def get_chunks(self, chunk_ids):
+        return [self.chunks.get(cid) for cid in chunk_ids]
+
+    def is_stale(self, chunk):
+        return chunk.file_path in self.stale_files
+
+    def select_chunk_ids(self, chunk_filter):
+        return frozenset(cid for cid, chunk in self.chunks.items()
+                         if chunk_filter.compile()(chunk.file_path, chunk.section))
+
+
+class FakeCalibrator:
+    def __init__(self):
+        self.calls = []
+
+    def calibrate_confidence(self, score, context=None):
+        self.calls.append(context['chunk_id'])
+        return SimpleNamespace(raw_score=score, calibrated_score=score / 2,
+                               confidence_level=SimpleNamespace(value='high'), uncertainty_estimate=0.1)
+
+
+def _server(tmp_path, scores, stale=(), expansions=(), config=None):
+    docs = tmp_path / "docs"
+    docs.mkdir(exist_ok=True)
+    chunks = []
+    for i, chunk_id in enumerate(scores):
+        path = docs / f"{chunk_id}.md"
+        path.write_text(f"texto de {chunk_id}\n", encoding='utf-8')
+        chunks.append(VirtualChunk(chunk_id=chunk_id, file_path=str(path), start_line=0, end_line=0,
+                                   vector_offset=0, vector_size=0, section=f"S{i}"))
+    get_source_text_cache().invalidate()
+
+    server = v6.MCPServerV6.__new__(v6.MCPServerV6)
+    server.config = config or {}
+    server._config_cache = {}
+    server.verbose = False
+    server.query_count = 0
+    server.audit_log = []
+    server.vector_engine = FakeEngine(scores)
+    server.storage = FakeStorage(chunks, stale={str(docs / f"{cid}.md") for cid in stale})
+    server.query_expander = SimpleNamespace(expand=lambda query: {'expansions': list(expansions)})
+    server.confidence_calibrator = FakeCalibrator()
+    return server
+
+
+def test_each_stage_runs_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(v6, 'ADVANCED_AVAILABLE', True)
+    server = _server(tmp_path, {'a': 0.95, 'b': 0.9, 'low': 0.2}, expansions=['otra forma'])
+
+    result = server._get_context_direct({'query': 'hola', 'top_k': 5, 'min_score': 0.5, 'debug': True})
+    meta = result['_meta']
+
+    assert server.vector_engine.calls == [('embed_query', 'hola'), ('search', 5, None)]
+    assert server.confidence_calibrator.calls == ['a', 'b']
+    assert [p['chunk_id'] for p in meta['provenance']] == ['a', 'b']
+    assert [e['calibrated_score'] for e in meta['confidence_calibration']['entries']] == [0.475, 0.45]
+    assert meta['expanded_queries'] == ['otra forma'] and meta['multi_query'] is None
+    assert list(meta['timings_ms']) == ['expand', 'embed', 'search', 'hydrate', 'calibrate', 'pack']
+    assert not meta['abstained']
+    assert "texto de a" in result['content'][0]['text']
+    assert len(server.audit_log) == 1
+
+
+def test_filter_and_stale_policy(tmp_path, monkeypatch):
+    monkeypatch.setattr(v6, 'ADVANCED_AVAILABLE', False)
+    server = _server(tmp_path, {'a': 0.95, 'b': 0.9, 'c': 0.85}, stale=['b'])
+
+    flagged = server._get_context_direct({'query': 'q', 'min_score': 0.5})['_meta']
+    assert [p['stale'] for p in flagged['provenance']] == [False, True, False]
+    assert 'timings_ms' not in flagged
+
+    filtered = server._get_context_direct({'query': 'q', 'min_score': 0.5, 'stale_policy': 'filter',
+                                           'section': 'S2'})['_meta']
+    assert server.vector_engine.calls[-1] == ('search', 8, frozenset({'c'}))
+    assert [p['chunk_id'] for p in filtered['provenance']] == ['c']
+    assert filtered['filter']['matching_chunks'] == 1
+
+
+def test_abstains_without_results_or_engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(v6, 'ADVANCED_AVAILABLE', False)
+    server = _server(tmp_path, {'a': 0.3})
+    assert server._get_context_direct({'query': 'q'})['_meta']['abstained']
+
+    server.vector_engine = None
+    meta = server._get_context_direct({'query': 'q'})['_meta']
+    assert meta['abstained'] and meta['results_count'] == 0
+
+
+def test_fan_out_embeds_and_searches_in_one_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(v6, 'ADVANCED_AVAILABLE', True)
+    config = {'retrieval': {'multi_query': {'expansion_weight': 0.5, 'candidates_per_query': 20}}}
+    server = _server(tmp_path, {'a': 0.95, 'b': 0.9}, expansions=['hola', 'saludo', 'buenas', 'hey'],
+                     config=config)
+
+    meta = server._get_context_direct({'query': 'hola', 'top_k': 2, 'min_score': 0.5, 'fan_out': 2})['_meta']
+
+    assert server.vector_engine.calls == [('embed_batch', ['hola', 'saludo', 'buenas']),
+                                          ('search_fused', 3, 20, [1.0, 0.5, 0.5])]
+    assert meta['multi_query']['queries'] == ['saludo', 'buenas']
+    assert list(meta['multi_query']['rrf_scores']) == ['a', 'b']
+    assert [p['chunk_id'] for p in meta['provenance']] == ['a', 'b']
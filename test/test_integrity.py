@@ -0,0 +1,96 @@
+"""
+Tests del IntegrityScanner: huellas rápidas, archivos sospechosos y verify_full
+"""
+
+import os
+import sys
+import time
+import hashlib
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "core"))
+
+from storage.integrity import IntegrityScanner, fingerprint_sources
+from storage.source_text import get_source_text_cache
+
+
+def _snapshot(path, lines, lines_per_chunk=100):
+    """Fake loaded storage: chunks of the file with their text_hash and the source fingerprints"""
+    path.write_text("\n".join(lines) + "\n", encoding='utf-8')
+    get_source_text_cache().invalidate()
+    chunks = []
+    for start in range(0, len(lines), lines_per_chunk):
+        chunk = SimpleNamespace(file_path=str(path), start_line=start, end_line=start + lines_per_chunk - 1)
+        text = get_source_text_cache().get_chunk_texts([chunk])[0]
+        chunk.text_hash = hashlib.sha256(text.encode()).hexdigest()
+        chunks.append(chunk)
+    return SimpleNamespace(chunks=chunks, stale_files=frozenset(),
+                           metadata={'source_fingerprints': fingerprint_sources([str(path)])})
+
+
+def _big_lines():
+    # ~280 KB: the middle of the file is outside the fast hash samples
+    return [f"line {i:06d} " + "x" * 60 for i in range(4000)]
+
+
+def test_touch_stays_suspect_until_verified(tmp_path):
+    path = tmp_path / "big.py"
+    storage = _snapshot(path, _big_lines())
+    scanner = IntegrityScanner(storage, throttle_seconds=0, full_verify_min_interval=0)
+    assert scanner.check_once()['stale_files'] == 0
+
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    scanner.check_once()
+    assert storage.stale_files == {str(path)}
+    assert scanner.get_stats()['suspect_files'] == 1
+
+    report = scanner.verify_full()
+    assert report['mismatched_chunks'] == 0 and report['suspect_files_cleared'] == 1
+    assert scanner.check_once()['stale_files'] == 0
+
+
+def test_same_size_edit_in_the_middle_is_stale(tmp_path):
+    path = tmp_path / "big.py"
+    lines = _big_lines()
+    storage = _snapshot(path, lines)
+    scanner = IntegrityScanner(storage, throttle_seconds=0, full_verify_min_interval=0)
+
+    stat = os.stat(path)
+    lines[2000] = lines[2000].replace('x', 'y')
+    path.write_text("\n".join(lines) + "\n", encoding='utf-8')
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert os.stat(path).st_size == stat.st_size
+
+    scanner.check_once()
+    assert storage.stale_files == {str(path)}
+    assert scanner.verify_full()['mismatched_chunks'] == 1
+    scanner.check_once()
+    assert storage.stale_files == {str(path)}
+    assert scanner.get_stats()['suspect_files'] == 0
+
+
+def test_scanner_and_verify_full_run_concurrently(tmp_path):
+    path = tmp_path / "big.py"
+    storage = _snapshot(path, _big_lines())
+    scanner = IntegrityScanner(storage, throttle_seconds=0, full_verify_min_interval=0)
+    errors = []
+
+    def scan():
+        try:
+            for i in range(200):
+                stat = os.stat(path)
+                os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+                scanner.check_once()
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=scan)
+    thread.start()
+    deadline = time.time() + 30
+    while thread.is_alive() and time.time() < deadline:
+        scanner.verify_full()
+    thread.join()
+    assert not errors
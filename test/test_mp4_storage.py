@@ -0,0 +1,210 @@
+"""
+Tests de MP4Storage: recorrido de cajas, tabla de chunks columnar, índice por fila, sidecar HNSW y update_metadata
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "core"))
+
+import storage.mp4_storage as mp4_storage
+from storage.mp4_storage import MP4Storage, VirtualChunk
+from storage.snapshot_builder import SnapshotBuilder
+from storage.vector_engine import VectorEngine
+
+
+def _build(tmp_path, monkeypatch, count=50):
+    pytest.importorskip("hnswlib")
+    monkeypatch.chdir(tmp_path)
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(count, 384)).astype(np.float32)
+    chunks = [VirtualChunk(chunk_id=f"c{i}", file_path=f"docs/f{i % 5}.md", start_line=i, end_line=i + 1,
+                           vector_offset=0, vector_size=0, section=f"S{i % 3}") for i in range(count)]
+    engine = VectorEngine({'embedding': {'dimension': 384, 'dtype': 'float32', 'cache': {'enabled': False}},
+                           'ann': {'backend': 'hnsw'}})
+    storage = MP4Storage("snap.mp4")
+    SnapshotBuilder(engine, storage, batch_size=32, progress_callback=None,
+                    embed_fn=lambda batch: vectors[int(batch[0]):int(batch[-1]) + 1]).build(
+        chunks, [str(i) for i in range(count)])
+    storage.close()
+    loaded = MP4Storage("snap.mp4")
+    assert loaded.load_snapshot()
+    return loaded
+
+
+def test_columnar_chunks_and_row_index(tmp_path, monkeypatch):
+    storage = _build(tmp_path, monkeypatch)
+
+    assert len(storage.chunks) == 50
+    assert storage.get_row("c7") == 7
+    chunk = storage.get_chunk("c7")
+    assert (chunk.chunk_id, chunk.file_path, chunk.start_line, chunk.section) == ("c7", "docs/f2.md", 7, "S1")
+    assert storage.get_chunk("missing") is None
+    assert list(storage.iter_chunk_ids())[:3] == ["c0", "c1", "c2"]
+    storage.close()
+
+
+def test_update_metadata_keeps_live_views(tmp_path, monkeypatch):
+    storage = _build(tmp_path, monkeypatch)
+    old_chunks = storage.chunks
+    storage.stale_files = frozenset({"docs/f1.md"})
+
+    assert storage.update_metadata({'hnsw_tuning': {'ef_search': 80}})
+
+    # Views taken before the rewrite still read the previous mapping
+    assert old_chunks[3].chunk_id == "c3"
+    assert storage.metadata['hnsw_tuning'] == {'ef_search': 80}
+    assert storage.get_chunk("c3").file_path == "docs/f3.md"
+    assert storage.stale_files == {"docs/f1.md"}
+
+    reopened = MP4Storage("snap.mp4")
+    assert reopened.load_snapshot()
+    assert reopened.metadata['hnsw_tuning'] == {'ef_search': 80}
+    reopened.close()
+    storage.close()
+
+
+def test_update_metadata_deferred_while_mapped(tmp_path, monkeypatch):
+    storage = _build(tmp_path, monkeypatch)
+    real_replace = os.replace
+
+    def windows_replace(src, dst):
+        if Path(dst) == storage.mp4_path:
+            raise PermissionError("file is mapped")
+        real_replace(src, dst)
+
+    monkeypatch.setattr(mp4_storage.os, 'replace', windows_replace)
+    assert not storage.update_metadata({'hnsw_tuning': {'ef_search': 90}})
+    assert storage.metadata['hnsw_tuning'] == {'ef_search': 90}
+    assert storage.get_chunk("c4").chunk_id == "c4"
+    storage.close()
+
+    monkeypatch.setattr(mp4_storage.os, 'replace', real_replace)
+    reopened = MP4Storage("snap.mp4")
+    assert reopened.load_snapshot()
+    assert reopened.metadata['hnsw_tuning'] == {'ef_search': 90}
+    assert not Path("data/snap.mp4.pending").exists()
+    reopened.close()
+
+
+def test_iter_boxes_walks_headers_only():
+    import io
+    import struct
+    from storage.mp4_storage import iter_boxes
+
+    data = (struct.pack('>I4s', 12, b'ftyp') + b'abcd'
+            + struct.pack('>I4sQ', 1, b'mdat', 16 + 3) + b'xyz'
+            + struct.pack('>I4s', 0, b'free') + b'tail')
+    boxes = list(iter_boxes(io.BytesIO(data), 0, len(data)))
+
+    assert boxes == [(b'ftyp', 0, 8, 4), (b'mdat', 12, 28, 3), (b'free', 31, 39, 4)]
+    with pytest.raises(ValueError):
+        list(iter_boxes(io.BytesIO(data[:20]), 0, 20))
+
+
+def test_box_table_ignores_box_names_inside_payloads(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    chunks = [VirtualChunk(chunk_id="c0", file_path="a.md", start_line=0, end_line=0,
+                           vector_offset=0, vector_size=0)]
+    vectors_blob = b'\x00\x00\x00\x10mcpi' + b'mdat' * 4
+    storage = MP4Storage("boxes.mp4")
+    storage.create_snapshot(chunks, vectors_blob, b'HNSW', {'vector_dimension': 4})
+    storage.close()
+
+    loaded = MP4Storage("boxes.mp4")
+    assert loaded.load_snapshot()
+    offset, size = loaded.get_vector_blob_offset()
+    assert bytes(loaded.mmap_data[offset:offset + size]) == vectors_blob
+    view = loaded.get_hnsw_blob_view()
+    assert bytes(view) == b'HNSW'
+    view.release()
+    loaded.close()
+
+
+def test_legacy_json_chunk_list(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    chunk = VirtualChunk(chunk_id="legacy", file_path="a.md", start_line=2, end_line=4,
+                         vector_offset=0, vector_size=0)
+    storage = MP4Storage("legacy.mp4")
+    # Snapshots before the mcpt box kept the chunk list in the index JSON
+    storage._write_mp4_structure({'version': '5.0.0', 'chunks': [chunk.to_dict()]}, b'', b'')
+    storage.close()
+
+    loaded = MP4Storage("legacy.mp4")
+    assert loaded.load_snapshot()
+    assert loaded.get_chunk("legacy").end_line == 4
+    loaded.close()
+
+
+def _vectors(count=50):
+    # Same vectors _build indexes
+    return np.random.default_rng(1).normal(size=(count, 384)).astype(np.float32)
+
+
+def _engine():
+    return VectorEngine({'embedding': {'dimension': 384, 'dtype': 'float32', 'cache': {'enabled': False}},
+                         'ann': {'backend': 'hnsw'}})
+
+
+def test_hnsw_sidecar_loads_with_id_map(tmp_path, monkeypatch):
+    storage = _build(tmp_path, monkeypatch)
+    path = storage.get_hnsw_index_path()
+    assert path is not None and path.exists()
+
+    engine = _engine()
+    id_map = storage.get_hnsw_blob_view()
+    engine.load_index(str(path), id_map, len(storage.chunks))
+    id_map.release()
+    ids, _ = engine.search(_vectors()[7], top_k=1)
+    assert ids == ["c7"]
+
+    with pytest.raises(ValueError):
+        engine.load_index(str(path), b'not an id map', len(storage.chunks))
+
+    # A sidecar from another build is ignored rather than trusted
+    with open(path, 'ab') as f:
+        f.write(b'\x00')
+    assert storage.get_hnsw_index_path() is None
+    storage.close()
+
+
+def test_legacy_hnsw_blob_round_trip(tmp_path):
+    pytest.importorskip("hnswlib")
+    vectors = _vectors(20)
+    engine = _engine()
+    engine.create_index(20)
+    engine.add_vectors(vectors, [f"c{i}" for i in range(20)])
+
+    loaded = _engine()
+    loaded.load_index_from_bytes(engine.serialize_index(), 20)
+    assert loaded.search(vectors[3], top_k=1)[0] == ["c3"]
+    assert loaded.next_label == 20
+
+
+def test_get_chunks_resolves_ids_in_order(tmp_path, monkeypatch):
+    storage = _build(tmp_path, monkeypatch)
+
+    found = storage.get_chunks(["c9", "missing", "c0", "c9"])
+    assert [c.chunk_id if c is not None else None for c in found] == ["c9", None, "c0", "c9"]
+    assert storage.get_row("missing") is None
+    assert all(storage.get_row(chunk.chunk_id) == row for row, chunk in enumerate(storage.chunks))
+    storage.close()
+
+
+def test_row_index_over_legacy_chunk_list(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    chunks = [VirtualChunk(chunk_id=f"l{i}", file_path="a.md", start_line=i, end_line=i,
+                           vector_offset=0, vector_size=0) for i in range(3)]
+    storage = MP4Storage("legacy.mp4")
+    storage._write_mp4_structure({'version': '5.0.0', 'chunks': [c.to_dict() for c in chunks]}, b'', b'')
+    storage.close()
+
+    loaded = MP4Storage("legacy.mp4")
+    assert loaded.load_snapshot()
+    assert loaded.get_row("l2") == 2
+    assert [c.start_line for c in loaded.get_chunks(["l1", "l0"])] == [1, 0]
+    loaded.close()
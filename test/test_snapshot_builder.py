@@ -0,0 +1,69 @@
+"""
+Test de ida y vuelta del SnapshotBuilder: build -> load para los backends hnsw y exact
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "core"))
+
+from storage.mp4_storage import MP4Storage, VirtualChunk
+from storage.snapshot_builder import SnapshotBuilder, chunk_source_files
+from storage.vector_engine import VectorEngine
+
+
+def _config(backend):
+    return {
+        'embedding': {'dtype': 'float32', 'cache': {'enabled': False}},
+        'ann': {'backend': backend, 'exact_max_vectors': 20000},
+    }
+
+
+@pytest.mark.parametrize("build_backend", ["hnsw", "auto"])
+@pytest.mark.parametrize("load_backend", ["hnsw", "exact"])
+def test_build_load_round_trip(tmp_path, monkeypatch, build_backend, load_backend):
+    pytest.importorskip("hnswlib")
+    monkeypatch.chdir(tmp_path)
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(500, 384)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    chunks = [VirtualChunk(chunk_id=f"c{i}", file_path='', start_line=0, end_line=0,
+                           vector_offset=0, vector_size=0) for i in range(len(vectors))]
+    texts = [str(i) for i in range(len(vectors))]
+
+    engine = VectorEngine(_config(build_backend))
+    storage = MP4Storage("roundtrip.mp4")
+    report = SnapshotBuilder(engine, storage, batch_size=128, progress_callback=None,
+                             embed_fn=lambda batch: vectors[int(batch[0]):int(batch[-1]) + 1]).build(chunks, texts)
+    assert report['backend'] == ('hnsw' if build_backend == 'hnsw' else 'exact')
+    storage.close()
+
+    # Load through the sidecar (the path compressed storage and ann.backend=hnsw take)
+    loaded = MP4Storage("roundtrip.mp4")
+    assert loaded.load_snapshot()
+    index_path = loaded.get_hnsw_index_path()
+    assert index_path is not None
+    reader = VectorEngine(_config(load_backend))
+    view = loaded.get_hnsw_blob_view()
+    try:
+        reader.load_index(str(index_path), view, len(loaded.chunks))
+    finally:
+        view.release()
+
+    ids, scores = reader.search(vectors[123], top_k=3)
+    assert ids[0] == "c123"
+    assert scores[0] == pytest.approx(1.0, abs=1e-3)
+    loaded.close()
+
+
+def test_chunk_source_files_line_windows(tmp_path):
+    (tmp_path / "doc.md").write_text("# Title\nline1\nline2\nline3\n", encoding='utf-8')
+
+    chunks = chunk_source_files(str(tmp_path), lines_per_chunk=2)
+
+    assert [chunk.get_text() for chunk in chunks] == ["# Title\nline1", "line2\nline3"]
+    assert [chunk.section for chunk in chunks] == ["Title", "Title"]
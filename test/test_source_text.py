@@ -0,0 +1,61 @@
+"""
+Tests de SourceTextCache: rangos de líneas, lecturas agrupadas e invalidación
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "core"))
+
+from storage.source_text import SourceTextCache
+
+
+def _write(path, text):
+    path.write_bytes(text.encode('utf-8'))
+    return str(path)
+
+
+def test_line_ranges_match_readlines(tmp_path):
+    text = "# Título\r\nuno\n\ndos\ntres\n"
+    path = _write(tmp_path / "a.md", text)
+    lines = open(path, encoding='utf-8').readlines()
+    cache = SourceTextCache()
+
+    for start, end in [(0, 0), (1, 3), (2, 2), (3, 10), (7, 9), (-1, 1)]:
+        expected = ''.join(lines[max(start, 0):end + 1]).strip()
+        assert cache.get_text(path, start, end) == expected
+
+
+def test_batch_reads_each_file_once(tmp_path):
+    a = _write(tmp_path / "a.md", "a0\na1\na2\n")
+    b = _write(tmp_path / "b.md", "b0\nb1\n")
+    cache = SourceTextCache()
+
+    texts = cache.get_texts([(a, 2, 2), (b, 0, 0), (a, 0, 1), (str(tmp_path / "nope.md"), 0, 1)])
+    assert texts == ["a2", "b0", "a0\na1", ""]
+    assert cache.stats['reads'] == 2
+
+    assert cache.get_text(a, 1, 1) == "a1"
+    assert cache.stats['reads'] == 2 and cache.stats['hits'] == 1
+
+
+def test_changed_file_is_reindexed(tmp_path):
+    path = _write(tmp_path / "a.md", "old\n")
+    cache = SourceTextCache()
+    assert cache.get_text(path, 0, 0) == "old"
+
+    _write(tmp_path / "a.md", "new line\nsecond\n")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert cache.get_text(path, 1, 1) == "second"
+    assert cache.stats['invalidations'] == 1
+
+
+def test_evicted_contents_served_by_seek(tmp_path):
+    path = _write(tmp_path / "big.md", "".join(f"line {i}\n" for i in range(100)))
+    cache = SourceTextCache(max_bytes=16)
+
+    assert cache.get_text(path, 5, 6) == "line 5\nline 6"
+    assert cache.get_text(path, 99, 99) == "line 99"
+    assert cache.get_stats()['files_cached'] == 0
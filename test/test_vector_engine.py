@@ -0,0 +1,283 @@
+"""
+Tests del VectorEngine: índice creciente, asignación de etiquetas, mapa de ids MCPL y búsquedas
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "core"))
+
+from storage.ann_backends import ExactBackend, HNSWBackend, select_backend
+from storage.embedding_service import EmbeddingService
+from storage.vector_engine import ID_MAP_HEADER, ID_MAP_MAGIC, VectorEngine, reciprocal_rank_fusion
+
+DIMENSION = 32
+
+
+def _engine(backend='hnsw', **hnsw):
+    config = {'embedding': {'dimension': DIMENSION, 'dtype': 'float32', 'cache': {'enabled': False}},
+              'ann': {'backend': backend}, 'hnsw': hnsw}
+    return VectorEngine(config, EmbeddingService(config))
+
+
+def _vectors(count, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, DIMENSION)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _top1(engine, vector):
+    ids, _ = engine.search(vector, top_k=1)
+    return ids[0] if ids else None
+
+
+def test_index_grows_and_labels_are_never_reused():
+    pytest.importorskip("hnswlib")
+    vectors = _vectors(60)
+    engine = _engine()
+    engine.create_index(10)
+
+    engine.add_vectors(vectors[:30], [f"c{i}" for i in range(30)])
+    engine.add_vectors(vectors[30:], [f"c{i}" for i in range(30, 60)])
+    assert engine.index.get_stats()['capacity'] >= 60
+    assert _top1(engine, vectors[45]) == "c45"
+
+    assert engine.remove_chunks(["c45", "c1", "unknown"]) == 2
+    assert _top1(engine, vectors[45]) != "c45"
+    assert engine.get_stats()['num_vectors'] == 58
+
+    # Re-adding a chunk (or updating one) takes a fresh label
+    engine.add_vectors(vectors[[45, 2]], ["c45", "c2"])
+    assert engine.chunk_id_to_id["c45"] == 60 and engine.chunk_id_to_id["c2"] == 61
+    assert engine.next_label == 62
+    assert _top1(engine, vectors[45]) == "c45"
+    assert len(engine.id_to_chunk_id) == 59
+
+    with pytest.raises(ValueError):
+        engine.add_vectors(vectors[:2], ["only-one"])
+
+
+def test_id_map_round_trip_keeps_allocator():
+    pytest.importorskip("hnswlib")
+    engine = _engine()
+    engine.create_index(5)
+    engine.add_vectors(_vectors(5), ["a", "b", "c", "d", "ñ"])
+    engine.remove_chunks(["d", "ñ"])
+
+    loaded = _engine()
+    assert loaded._load_id_map(memoryview(engine.serialize_id_map()))
+    assert loaded.id_to_chunk_id == {0: "a", 1: "b", 2: "c"}
+    assert loaded.chunk_id_to_id == {"a": 0, "b": 1, "c": 2}
+    # Labels of deleted chunks stay retired after a reload
+    assert loaded.next_label == 5
+
+
+def test_version_1_id_map_resumes_after_highest_label():
+    engine = _engine()
+    engine.id_to_chunk_id = {0: "a", 7: "b"}
+    engine.next_label = 9
+    data = engine.serialize_id_map()
+    # Version 1: same layout without the allocator field
+    magic, _, reserved, count = ID_MAP_HEADER.unpack_from(data, 0)
+    v1 = ID_MAP_HEADER.pack(magic, 1, reserved, count) + data[ID_MAP_HEADER.size + 8:]
+
+    loaded = _engine()
+    assert loaded._load_id_map(v1)
+    assert loaded.id_to_chunk_id == {0: "a", 7: "b"}
+    assert loaded.next_label == 8
+
+    assert not loaded._load_id_map(b'\x80\x04pickle')
+    with pytest.raises(ValueError):
+        loaded._load_id_map(ID_MAP_HEADER.pack(ID_MAP_MAGIC, 99, 0, 0))
+
+
+def test_search_batch_matches_single_searches():
+    pytest.importorskip("hnswlib")
+    vectors = _vectors(200)
+    engine = _engine()
+    engine.create_index(200)
+    engine.add_vectors(vectors, [f"c{i}" for i in range(200)])
+    queries = _vectors(8, seed=1)
+
+    ids, scores = engine.search_batch(queries, k=5)
+    assert ids.shape == scores.shape == (8, 5)
+    for query, row_ids, row_scores in zip(queries, ids, scores):
+        single_ids, single_scores = engine.search(query, top_k=5)
+        assert list(row_ids) == single_ids
+        np.testing.assert_allclose(row_scores, single_scores, atol=1e-3)
+        assert np.all(np.diff(row_scores) <= 1e-6)
+
+    # float16 queries (the engine's storage dtype) are accepted as is
+    half_ids, _ = engine.search_batch(vectors[:4].astype(np.float16), k=1)
+    assert half_ids[:, 0].tolist() == ["c0", "c1", "c2", "c3"]
+    assert engine.search_queries([], top_k=5) == []
+    empty_ids, _ = engine.search_batch(np.zeros((0, DIMENSION), dtype=np.float32), k=5)
+    assert empty_ids.shape == (0, 5)
+
+
+def test_search_batch_pads_short_rows():
+    pytest.importorskip("hnswlib")
+    engine = _engine()
+    engine.create_index(3)
+    engine.add_vectors(_vectors(3), ["a", "b", "c"])
+
+    ids, scores = engine.search_batch(_vectors(2, seed=1), k=5)
+    assert [sorted(row[:3]) for row in ids.tolist()] == [["a", "b", "c"]] * 2
+    assert ids[:, 3:].tolist() == [[None, None]] * 2
+    assert np.isnan(scores[:, 3:]).all()
+
+
+@pytest.mark.parametrize("exact_max, path", [(2000, 'filtered_exact'), (10, 'filtered_hnsw')])
+def test_filtered_search_only_returns_allowed_chunks(exact_max, path):
+    pytest.importorskip("hnswlib")
+    vectors = _vectors(400)
+    engine = _engine(filter_exact_max=exact_max)
+    engine.create_index(400)
+    engine.add_vectors(vectors, [f"c{i}" for i in range(400)])
+    allowed = {f"c{i}" for i in range(0, 400, 4)}
+    queries = _vectors(5, seed=1)
+
+    ids, scores = engine.search_batch(queries, k=5, filter=allowed)
+    assert set(ids.ravel().tolist()) <= allowed
+    assert engine.index.get_stats()['filtered_searches'][path] == 5
+    # Same hits as brute force over the allowed rows
+    rows = np.arange(0, 400, 4)
+    exact = np.argsort(-(queries @ vectors[rows].T), axis=1)[:, :5]
+    assert ids.tolist() == [[f"c{rows[j]}" for j in row] for row in exact]
+
+    by_predicate, _ = engine.search_batch(queries, k=5, filter=lambda chunk_id: chunk_id in allowed)
+    assert by_predicate.tolist() == ids.tolist()
+    assert engine.search(queries[0], top_k=3, filter={"c1", "missing"})[0] == ["c1"]
+
+
+def test_tune_ef_search_reaches_target_and_applies_it():
+    pytest.importorskip("hnswlib")
+    engine = _engine(M=8, ef_construction=64)
+    engine.create_index(2000)
+    engine.add_vectors(_vectors(2000), [f"c{i}" for i in range(2000)])
+
+    report = engine.tune_ef_search(recall_target=0.9, k=10, sample_size=50)
+
+    assert report['recall'] >= 0.9 and report['sample_size'] == 50
+    assert [point['ef'] for point in report['curve']][-1] == report['ef_search']
+    assert all(point['recall'] < 0.9 for point in report['curve'][:-1])
+    assert engine.index.ef_search == engine.ef_search == report['ef_search']
+
+    # A rebuilt index keeps the tuned ef
+    engine.create_index(10)
+    assert engine.index.ef_search == report['ef_search']
+
+
+def test_apply_ef_tuning_validates_report():
+    pytest.importorskip("hnswlib")
+    engine = _engine(ef_search=50)
+    engine.create_index(20)
+
+    assert not engine.apply_ef_tuning(None)
+    assert not engine.apply_ef_tuning({'ef_search': 0})
+    assert engine.apply_ef_tuning({'ef_search': 128})
+    assert engine.index.ef_search == 128
+
+    with pytest.raises(ValueError):
+        engine.tune_ef_search()
+    exact = _engine(backend='exact')
+    exact.create_index(20)
+    with pytest.raises(ValueError):
+        exact.tune_ef_search()
+
+
+def test_exact_backend_is_brute_force(tmp_path):
+    vectors = _vectors(300)
+    engine = _engine(backend='exact')
+    engine.create_index(100)
+    engine.add_vectors(vectors, [f"c{i}" for i in range(300)])
+    # Several blocks, so the per-block top-k merge is exercised
+    engine.index.block_rows = 64
+    engine.remove_chunks(["c5"])
+    queries = _vectors(4, seed=1)
+
+    ids, scores = engine.search_batch(queries, k=10)
+    similarities = queries @ vectors.T
+    similarities[:, 5] = -np.inf
+    expected = np.argsort(-similarities, axis=1)[:, :10]
+    assert ids.tolist() == [[f"c{i}" for i in row] for row in expected]
+    np.testing.assert_allclose(scores, np.take_along_axis(similarities, expected, axis=1), atol=1e-5)
+
+    # save_index writes a .npy that load_index recognizes
+    path = str(tmp_path / "index.bin")
+    engine.save_index(path)
+    loaded = _engine(backend='hnsw')
+    loaded.load_index(path, engine.serialize_id_map(), 300)
+    assert isinstance(loaded.index, ExactBackend)
+    assert loaded.index.get_stats()['storage'] == 'mmap'
+    assert loaded.search_batch(queries, k=10)[0].tolist() == ids.tolist()
+
+
+def test_auto_backend_by_corpus_size():
+    pytest.importorskip("hnswlib")
+    engine = _engine(backend='auto')
+    engine.exact_max_vectors = 100
+
+    engine.create_index(100)
+    assert isinstance(engine.index, ExactBackend)
+    engine.create_index(101)
+    assert isinstance(engine.index, HNSWBackend)
+    assert select_backend('exact', 10 ** 9) == 'exact'
+    with pytest.raises(ValueError):
+        select_backend('faiss', 10)
+
+
+def test_exact_backend_searches_stored_matrix_in_place():
+    stored = _vectors(50).astype(np.float16)
+    stored.flags.writeable = False
+    engine = _engine(backend='exact')
+    engine.load_vectors(stored, [f"c{i}" for i in range(50)])
+
+    assert engine.index.vectors is stored
+    assert engine.search(stored[7].astype(np.float32), top_k=1)[0] == ["c7"]
+
+    # Adding copies the read-only matrix into a writable float32 one
+    engine.add_vectors(_vectors(1, seed=2), ["new"])
+    assert engine.index.vectors is not stored and engine.index.vectors.dtype == np.float32
+    assert engine.search(_vectors(1, seed=2)[0], top_k=1)[0] == ["new"]
+
+
+def test_reciprocal_rank_fusion():
+    ids = np.array([["a", "b", "c"], ["b", "d", None]], dtype=object)
+    scores = np.array([[0.9, 0.8, 0.7], [0.95, 0.6, np.nan]], dtype=np.float32)
+
+    fused = reciprocal_rank_fusion(ids, scores, top_k=10, rrf_k=0)
+    assert [hit['chunk_id'] for hit in fused] == ["b", "a", "d", "c"]
+    assert fused[0] == {'chunk_id': "b", 'rrf_score': pytest.approx(1 / 2 + 1), 'score': pytest.approx(0.95),
+                        'hits': 2}
+    assert fused[1]['hits'] == 1
+
+    # Down-weighting the second list lets the first one's top hit win
+    weighted = reciprocal_rank_fusion(ids, scores, top_k=2, rrf_k=0, weights=[1.0, 0.25])
+    assert [hit['chunk_id'] for hit in weighted] == ["a", "b"]
+
+    # Equal fused scores: higher similarity first
+    tied = reciprocal_rank_fusion(np.array([["x"], ["y"]], dtype=object),
+                                  np.array([[0.5], [0.7]], dtype=np.float32), top_k=2)
+    assert [hit['chunk_id'] for hit in tied] == ["y", "x"]
+
+
+def test_search_fused_merges_phrasings():
+    engine = _engine(backend='exact')
+    vectors = _vectors(50)
+    engine.create_index(50)
+    engine.add_vectors(vectors, [f"c{i}" for i in range(50)])
+
+    fused = engine.search_fused(vectors[[3, 3, 9]], top_k=3, per_query_k=5)
+    assert fused[0]['chunk_id'] == "c3"
+    assert fused[0]['hits'] == 2 and fused[0]['score'] == pytest.approx(1.0, abs=1e-5)
+    # Agreement between phrasings outranks a single list's second hit
+    assert "c9" not in [hit['chunk_id'] for hit in fused]
+
+    weighted = engine.search_fused(vectors[[3, 3, 9]], top_k=3, weights=[0.1, 0.1, 1.0])
+    assert weighted[0]['chunk_id'] == "c9"
+
+    only_odd = engine.search_fused(vectors[[3, 9]], top_k=3, filter=lambda chunk_id: int(chunk_id[1:]) % 2)
+    assert all(int(hit['chunk_id'][1:]) % 2 for hit in only_odd)